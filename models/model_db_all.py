@@ -6,12 +6,16 @@ Source of truth hierarchy: 1) Live PGDB → 2) `models/models_*.py` → 3) `data
 ```python
 # app/models.py
 
-from flask_sqlalchemy import SQLAlchemy
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.dialects.postgresql import TSVECTOR
 from datetime import datetime
 
-db = SQLAlchemy()
+# The one SQLAlchemy instance (utils/database.py): the app factory and
+# create_cli_app() both bind it, so CLI tools and routes share models
+from utils.database import db
+
+# Inline preview kept on documents; full text lives in document_contents
+SNIPPET_LENGTH = 300
 
 class Document(db.Model):
     """Documents in the RAG system"""
@@ -19,9 +23,16 @@ class Document(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(500), nullable=False)
-    content = db.Column(db.Text, nullable=False)
     file_path = db.Column(db.String(1000))
     
+    # Content preview; the full text is loaded lazily via .content
+    snippet = db.Column(db.String(SNIPPET_LENGTH))
+    content_length = db.Column(db.Integer)
+    content_row = db.relationship(
+        'DocumentContent', uselist=False, lazy='select',
+        cascade='all, delete-orphan', passive_deletes=True
+    )
+    
     # For semantic search
     embedding = db.Column(Vector(384))  # sentence-transformers dimension
     
@@ -30,23 +41,95 @@ class Document(db.Model):
     
     # Metadata
     category = db.Column(db.String(100))  # 'code', 'ml_concept', 'general', etc.
+    type = db.Column(db.String(50))  # 'code' or 'prose' (utils/enrichment.py)
+    topic = db.Column(db.String(100))  # dominant topic, NULL when unclear
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Full-text search index
+    # Near-duplicate variants point at their group's canonical document
+    # (utils/near_duplicates.py); NULL for canonical and independent documents
+    canonical_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='SET NULL'), index=True)
+    
+    # Full-text search index, ANN index, newest-first listings (keyset pagination)
     __table_args__ = (
         db.Index('idx_ts_vector', ts_vector, postgresql_using='gin'),
         db.Index('idx_embedding', embedding, postgresql_using='ivfflat'),
+        db.Index('idx_documents_created_at', created_at, id),
+        db.Index('idx_documents_category_created_at', category, created_at, id),
+        db.Index('idx_documents_type_topic', type, topic),
+    )
+    
+    @property
+    def content(self):
+        """Full text (one extra query on first access)."""
+        return self.content_row.content if self.content_row is not None else None
+    
+    @content.setter
+    def content(self, value):
+        if self.content_row is None:
+            self.content_row = DocumentContent(content=value)
+        else:
+            self.content_row.content = value
+        self.snippet = ' '.join(value[:SNIPPET_LENGTH * 2].split())[:SNIPPET_LENGTH]
+        self.content_length = len(value)
+
+class DocumentContent(db.Model):
+    """Full document text, kept off the hot documents table"""
+    __tablename__ = 'document_contents'
+    
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+
+class DocumentSignature(db.Model):
+    """MinHash signature of a document's shingles (utils/near_duplicates.py)"""
+    __tablename__ = 'document_signatures'
+    
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    minhash = db.Column(db.LargeBinary, nullable=False)  # 128 x uint32, little-endian
+
+class DocumentLshBand(db.Model):
+    """LSH band buckets: documents sharing a bucket are near-duplicate candidates"""
+    __tablename__ = 'document_lsh_bands'
+    
+    band = db.Column(db.SmallInteger, primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    
+    __table_args__ = (
+        db.Index('idx_document_lsh_bands_document', document_id),
     )
 
 class SearchQuery(db.Model):
     """Track search queries for analytics"""
     __tablename__ = 'search_queries'
     
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     query = db.Column(db.String(1000), nullable=False)
     results_count = db.Column(db.Integer)
     execution_time = db.Column(db.Float)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    source = db.Column(db.String(20), default='ui')  # 'ui' or 'api'
+    stage_timings = db.Column(db.JSON)  # {stage: ms} - embedding, vector, keyword, ...
+    # Part of the primary key: the table is range-partitioned by month on
+    # created_at (utils/search_partitions.py)
+    created_at = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
+    
+    # Newest-first history listing (keyset pagination)
+    __table_args__ = (
+        db.Index('idx_search_queries_created_at', created_at, id),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+class SearchQueryDaily(db.Model):
+    """Per-day search summaries, kept after raw partitions are dropped"""
+    __tablename__ = 'search_query_daily'
+    
+    day = db.Column(db.Date, primary_key=True)
+    normalized_query = db.Column(db.Text, primary_key=True)  # trimmed, lowercased, single-spaced
+    source = db.Column(db.String(20), primary_key=True)      # 'ui' or 'api'
+    searches = db.Column(db.Integer, nullable=False)
+    total_execution_time = db.Column(db.Float, nullable=False, default=0.0)
+    max_execution_time = db.Column(db.Float)
+    total_results = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class ModelSubmission(db.Model):
     """Track model-generated code submissions"""
@@ -65,7 +148,32 @@ class ModelSubmission(db.Model):
     # Security analysis
     security_issues = db.Column(db.JSON)  # SQL injection attempts, etc.
     
+    # Grading queue
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, running, completed, failed
+    priority = db.Column(db.Integer, default=0, nullable=False)  # higher is graded first
+    queued_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    queue_wait_time = db.Column(db.Float)  # seconds from queued to started
+    grading_time = db.Column(db.Float)     # seconds from started to completed
+    error = db.Column(db.Text)             # set when status is 'failed'
+    
+    # Result reuse: same normalized code graded against the same corpus
+    code_hash = db.Column(db.String(64))       # sha256 of normalized AST
+    corpus_version = db.Column(db.String(50))  # grading fixture version, e.g. 'd12-t3'
+    cache_hit = db.Column(db.Boolean, default=False, nullable=False)
+    cacheable = db.Column(db.Boolean, default=False, nullable=False)  # no case hit a sandbox/worker error
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Queue claim order, result reuse lookups, time-range scans and
+    # newest-first history listings (keyset pagination), overall and per model
+    __table_args__ = (
+        db.Index('idx_submissions_queue', status, priority.desc(), queued_at),
+        db.Index('idx_submissions_code_hash', code_hash, corpus_version),
+        db.Index('idx_submissions_created_at', created_at, id),
+        db.Index('idx_submissions_model_created_at', model_name, created_at, id),
+    )
 
 class TestCase(db.Model):
     """Predefined test cases for grading"""
@@ -78,6 +186,25 @@ class TestCase(db.Model):
     category = db.Column(db.String(100))    # 'keyword_heavy', 'semantic', 'hybrid'
     description = db.Column(db.Text)        # Why this test matters
 
+class CorpusVersion(db.Model):
+    """Change counters for cached data derived from the corpus"""
+    __tablename__ = 'corpus_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)  # 'documents', 'test_cases'
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StatCounter(db.Model):
+    """Incrementally maintained dashboard aggregates (utils/stat_counters.py)"""
+    __tablename__ = 'stat_counters'
+    
+    scope = db.Column(db.String(50), primary_key=True)  # 'documents', 'documents_by_category', ...
+    key = db.Column(db.String(100), primary_key=True)  # 'total', category name, model name
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)  # running sum for averages
+    max_value = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class User(db.Model):
     """Users"""
     __tablename__ = 'users'
@@ -2,51 +2,69 @@
 Admin panel routes.
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app
-from sqlalchemy import func
-from app.models import Document, SearchQuery, ModelSubmission, db
-from app.core.upload import delete_document, reindex_document, get_upload_statistics
+import os
+
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app, g, abort, send_from_directory
+from sqlalchemy.orm import defer
+from app.models import Document
+from app.core.upload import delete_document, reindex_document
+from utils.db_routing import replica_reads
+from utils.latency import search_latency, SEARCH_STAGES
+from utils.profiler import profiler, memory_tracker, PROFILE_MODES
+from utils.pagination import InvalidCursor, keyset_paginate
+from utils.stat_counters import counter_keys, read_stats
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/')
+@replica_reads
 def index():
     """
     Admin dashboard overview.
     """
-    stats = get_upload_statistics()
+    counters = read_stats()
+    documents = counters['documents']
     
-    # Additional stats
-    stats['total_searches'] = SearchQuery.query.count()
-    stats['total_submissions'] = ModelSubmission.query.count()
-    stats['avg_search_time'] = db.session.query(
-        func.avg(SearchQuery.execution_time)
-    ).scalar() or 0
+    stats = {
+        'total_documents': documents['total'],
+        'by_category': documents['by_category'],
+        'has_embeddings': documents['with_embedding'],
+        'has_ts_vector': documents['with_ts_vector'],
+        'total_searches': counters['searches']['total'],
+        'total_submissions': counters['submissions']['total'],
+        'avg_search_time': counters['searches']['avg_time']
+    }
     
     return render_template('admin/dashboard.html', stats=stats)
 
 @admin_bp.route('/documents')
+@replica_reads
 def documents():
     """
     Document management interface.
     """
-    page = request.args.get('page', 1, type=int)
     per_page = 50
     
     # Filter by category if specified
     category_filter = request.args.get('category', None)
     
-    query = Document.query
+    # Listing columns only; ts_vector can be large
+    query = Document.query.options(defer(Document.ts_vector))
     if category_filter:
         query = query.filter_by(category=category_filter)
     
-    documents = query.order_by(
-        Document.created_at.desc()
-    ).paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        documents = keyset_paginate(
+            query, Document,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=per_page
+        )
+    except InvalidCursor:
+        abort(400)
     
-    # Get categories for filter
-    categories = db.session.query(Document.category).distinct().all()
-    category_names = [c[0] for c in categories]
+    # Categories for filter, from the maintained counters
+    category_names = counter_keys('documents_by_category')
     
     return render_template(
         'admin/documents.html',
@@ -99,44 +117,36 @@ def reindex_all():
     return redirect(url_for('admin.index'))
 
 @admin_bp.route('/stats')
+@replica_reads
 def stats():
     """
     Detailed statistics page.
     """
-    # Document stats
-    doc_stats = {
-        'total': Document.query.count(),
-        'by_category': dict(db.session.query(
-            Document.category,
-            func.count(Document.id)
-        ).group_by(Document.category).all())
-    }
-    
-    # Search stats
-    search_stats = {
-        'total': SearchQuery.query.count(),
-        'avg_time': db.session.query(func.avg(SearchQuery.execution_time)).scalar() or 0,
-        'avg_results': db.session.query(func.avg(SearchQuery.results_count)).scalar() or 0
-    }
-    
-    # Submission stats
-    submission_stats = {
-        'total': ModelSubmission.query.count(),
-        'passed': ModelSubmission.query.filter_by(passed=True).count(),
-        'avg_score': db.session.query(func.avg(ModelSubmission.score)).scalar() or 0,
-        'by_model': dict(db.session.query(
-            ModelSubmission.model_name,
-            func.count(ModelSubmission.id)
-        ).group_by(ModelSubmission.model_name).all())
-    }
+    counters = read_stats()
     
     return render_template(
         'admin/stats.html',
-        doc_stats=doc_stats,
-        search_stats=search_stats,
-        submission_stats=submission_stats
+        doc_stats=counters['documents'],
+        search_stats=counters['searches'],
+        submission_stats=counters['submissions'],
+        latency_stats=_latency_stats()
     )
 
+@admin_bp.route('/api/search-latency')
+def api_search_latency():
+    """
+    Per-stage search latency percentiles (JSON) for this worker process.
+    """
+    return jsonify({
+        'stages': _latency_stats(),
+        'units': 'ms'
+    })
+
+def _latency_stats():
+    """Latency snapshot ordered by pipeline stage."""
+    snapshot = search_latency.snapshot()
+    return {stage: snapshot[stage] for stage in SEARCH_STAGES if stage in snapshot}
+
 @admin_bp.route('/clear-cache', methods=['POST'])
 def clear_cache():
     """
@@ -145,4 +155,122 @@ def clear_cache():
     from app.core.embeddings import clear_embedding_cache
     clear_embedding_cache()
     flash('Embedding cache cleared', 'success')
-    return redirect(url_for('admin.index'))
\ No newline at end of file
+    return redirect(url_for('admin.index'))
+
+@admin_bp.before_app_request
+def start_request_profile():
+    """Start profiling this request if its endpoint is armed."""
+    g.profile_session = profiler.start(request.endpoint)
+
+@admin_bp.teardown_app_request
+def stop_request_profile(error=None):
+    """Finish and save the profile started for this request."""
+    session = g.pop('profile_session', None)
+    if session is not None:
+        profiler.stop(session, status_code=500 if error else None)
+
+def _require_profiling():
+    """Profiling is off unless PROFILING_ENABLED is set."""
+    if not profiler.enabled:
+        abort(404)
+
+@admin_bp.route('/profiling')
+def profiling():
+    """
+    Request profiler and memory tracker.
+    """
+    _require_profiling()
+    
+    endpoints = sorted(
+        name for name in current_app.view_functions
+        if name != 'static'
+    )
+    
+    return render_template(
+        'admin/profiling.html',
+        endpoints=endpoints,
+        modes=PROFILE_MODES,
+        armed=profiler.armed(),
+        recent=profiler.recent,
+        profiles=profiler.list_profiles(),
+        memory=memory_tracker.diff()
+    )
+
+@admin_bp.route('/profiling/arm', methods=['POST'])
+def profiling_arm():
+    """
+    Profile the next N requests to an endpoint.
+    """
+    _require_profiling()
+    
+    endpoint = request.form.get('endpoint', '')
+    count = request.form.get('count', 10, type=int)
+    mode = request.form.get('mode', 'sampling')
+    
+    if endpoint not in current_app.view_functions:
+        flash(f'Unknown endpoint: {endpoint}', 'error')
+        return redirect(url_for('admin.profiling'))
+    
+    try:
+        profiler.arm(endpoint, count, mode)
+        flash(f'Profiling next {count} requests to {endpoint} ({mode})', 'success')
+    except ValueError as e:
+        flash(str(e), 'error')
+    
+    return redirect(url_for('admin.profiling'))
+
+@admin_bp.route('/profiling/disarm', methods=['POST'])
+def profiling_disarm():
+    """
+    Cancel pending profiles.
+    """
+    _require_profiling()
+    profiler.disarm(request.form.get('endpoint') or None)
+    flash('Profiling disarmed', 'success')
+    return redirect(url_for('admin.profiling'))
+
+@admin_bp.route('/profiling/download/<path:filename>')
+def profiling_download(filename):
+    """
+    Download a saved profile (.prof or .folded).
+    """
+    _require_profiling()
+    return send_from_directory(
+        os.path.abspath(profiler.profile_dir),
+        filename,
+        as_attachment=True
+    )
+
+@admin_bp.route('/profiling/memory', methods=['POST'])
+def profiling_memory():
+    """
+    Control tracemalloc: start (baseline), snapshot, or stop.
+    """
+    _require_profiling()
+    action = request.form.get('action', '')
+    
+    try:
+        if action == 'start':
+            memory_tracker.start()
+            flash('Memory tracing started, baseline taken', 'success')
+        elif action == 'snapshot':
+            memory_tracker.snapshot()
+            flash('Snapshot taken', 'success')
+        elif action == 'stop':
+            memory_tracker.stop()
+            flash('Memory tracing stopped', 'success')
+        else:
+            flash(f'Unknown action: {action}', 'error')
+    except ValueError as e:
+        flash(str(e), 'error')
+    
+    return redirect(url_for('admin.profiling'))
+
+@admin_bp.route('/api/profiling/memory-diff')
+def api_memory_diff():
+    """
+    Memory growth since the baseline snapshot (JSON).
+    """
+    _require_profiling()
+    limit = request.args.get('limit', 25, type=int)
+    return jsonify(memory_tracker.diff(limit=limit))
@@ -2,12 +2,19 @@
 Main application routes: Home, Search, Upload
 """
 
-from flask import Blueprint, render_template, request, jsonify, current_app, flash, redirect, url_for
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, jsonify, current_app, flash, redirect, url_for, abort
+from sqlalchemy.orm import joinedload
+import time
 
-from app.models import Document, SearchQuery, db
-from app.core.search import hybrid_search
+from app.models import Document, SearchQuery
+from utils.admission import BATCH, INTERACTIVE, admission
+from utils.db_routing import replica_reads
+from utils.latency import search_latency, stage_timer
+from utils.pagination import InvalidCursor, keyset_paginate
+from utils.search_analytics import search_analytics
+from utils.search_pipeline import staged_hybrid_search
+from utils.stat_counters import read_stats
+from utils.tracing import span
 from app.core.upload import (
     process_uploaded_file,
     process_batch_upload,
@@ -18,13 +25,13 @@ from app.core.upload import (
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
+@replica_reads
 def index():
     """
     Home page with overview and quick search.
     """
-    # Get quick stats
-    total_docs = Document.query.count()
-    total_searches = SearchQuery.query.count()
+    # Get quick stats (maintained counters, one query)
+    stats = read_stats()
     
     # Recent searches (last 5)
     recent_searches = SearchQuery.query.order_by(
@@ -38,13 +45,15 @@ def index():
     
     return render_template(
         'index.html',
-        total_docs=total_docs,
-        total_searches=total_searches,
+        total_docs=stats['documents']['total'],
+        total_searches=stats['searches']['total'],
+        total_submissions=stats['submissions']['total'],
         recent_searches=recent_searches,
         recent_docs=recent_docs
     )
 
 @main_bp.route('/search', methods=['GET', 'POST'])
+@replica_reads
 def search():
     """
     Search interface using production hybrid search.
@@ -57,31 +66,27 @@ def search():
             flash('Please enter a search query', 'warning')
             return redirect(url_for('main.search'))
         
-        # Track execution time
-        start_time = datetime.utcnow()
+        # Perform hybrid search, timing each stage
+        timings = {}
+        start_time = time.perf_counter()
+        with admission.slot('search', INTERACTIVE):
+            results = staged_hybrid_search(
+                query, limit=limit, timings=timings,
+                collapse_variants=current_app.config.get('SEARCH_COLLAPSE_VARIANTS', True)
+            )
+        execution_time = time.perf_counter() - start_time
         
-        # Perform hybrid search
-        results = hybrid_search(query, limit=limit)
+        with stage_timer(timings, 'rendering'):
+            page = render_template(
+                'search/results.html',
+                query=query,
+                results=results,
+                execution_time=execution_time,
+                results_count=len(results)
+            )
         
-        # Calculate execution time
-        execution_time = (datetime.utcnow() - start_time).total_seconds()
-        
-        # Log search query
-        search_query = SearchQuery(
-            query=query,
-            results_count=len(results),
-            execution_time=execution_time
-        )
-        db.session.add(search_query)
-        db.session.commit()
-        
-        return render_template(
-            'search/results.html',
-            query=query,
-            results=results,
-            execution_time=execution_time,
-            results_count=len(results)
-        )
+        _record_search(query, results, start_time, timings, source='ui')
+        return page
     
     # GET request - show search form
     # Get query history for sidebar
@@ -95,16 +100,22 @@ def search():
     )
 
 @main_bp.route('/search/history')
+@replica_reads
 def search_history():
     """
     View search query history.
     """
-    page = request.args.get('page', 1, type=int)
     per_page = 20
     
-    queries = SearchQuery.query.order_by(
-        SearchQuery.created_at.desc()
-    ).paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        queries = keyset_paginate(
+            SearchQuery.query, SearchQuery,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=per_page
+        )
+    except InvalidCursor:
+        abort(400)
     
     return render_template(
         'search/history.html',
@@ -137,7 +148,8 @@ def handle_ajax_upload():
     files = request.files.getlist('files')
     upload_dir = current_app.config.get('UPLOAD_FOLDER', 'uploads')
     
-    successful, errors = process_batch_upload(files, upload_dir)
+    with span('process_batch_upload', files=len(files)):
+        successful, errors = process_batch_upload(files, upload_dir)
     
     return jsonify({
         'success': len(successful),
@@ -174,7 +186,8 @@ def handle_form_upload():
     category = request.form.get('category', None)
     
     try:
-        doc = process_uploaded_file(file, upload_dir, title=title, category=category)
+        with span('process_uploaded_file', filename=file.filename):
+            doc = process_uploaded_file(file, upload_dir, title=title, category=category)
         flash(f'Successfully uploaded: {doc.title}', 'success')
         return redirect(url_for('main.document_detail', doc_id=doc.id))
     except ValueError as e:
@@ -182,11 +195,13 @@ def handle_form_upload():
         return redirect(url_for('main.upload'))
 
 @main_bp.route('/document/<int:doc_id>')
+@replica_reads
 def document_detail(doc_id):
     """
     View document details.
     """
-    doc = Document.query.get_or_404(doc_id)
+    # The only page that shows full text: fetch it in the same round trip
+    doc = Document.query.options(joinedload(Document.content_row)).get_or_404(doc_id)
     
     return render_template(
         'search/document_detail.html',
@@ -194,27 +209,53 @@ def document_detail(doc_id):
     )
 
 @main_bp.route('/api/search')
+@replica_reads
 def api_search():
     """
     API endpoint for search (JSON response).
     """
     query = request.args.get('q', '').strip()
     limit = request.args.get('limit', 10, type=int)
+    collapse = request.args.get(
+        'collapse', current_app.config.get('SEARCH_COLLAPSE_VARIANTS', True),
+        type=lambda value: value.lower() in ('1', 'true', 'yes')
+    )
     
     if not query:
         return jsonify({'error': 'Query parameter "q" is required'}), 400
     
-    results = hybrid_search(query, limit=limit)
+    timings = {}
+    start_time = time.perf_counter()
+    with admission.slot('search', BATCH):
+        results = staged_hybrid_search(query, limit=limit, timings=timings, collapse_variants=collapse)
     
-    return jsonify({
-        'query': query,
-        'results': [
-            {
-                'id': doc.id,
-                'title': doc.title,
-                'content': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                'category': doc.category
-            }
-            for doc in results
-        ]
-    })
\ No newline at end of file
+    with stage_timer(timings, 'rendering'):
+        response = jsonify({
+            'query': query,
+            'results': [
+                {
+                    'id': doc.id,
+                    'title': doc.title,
+                    'content': doc.snippet,
+                    'content_length': doc.content_length,
+                    'canonical_id': doc.canonical_id,
+                    'category': doc.category
+                }
+                for doc in results
+            ]
+        })
+    
+    _record_search(query, results, start_time, timings, source='api')
+    return response
+
+def _record_search(query, results, start_time, timings, source):
+    """Feed stage latencies to the histograms and queue the analytics row."""
+    timings['total'] = (time.perf_counter() - start_time) * 1000
+    search_latency.observe_all(timings)
+    
+    # execution_time keeps its original meaning: search time in seconds
+    execution_time = (timings['total'] - timings.get('rendering', 0.0)) / 1000
+    search_analytics.record(
+        query, len(results), execution_time,
+        source=source, stage_timings=timings
+    )
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Metrics routes: Prometheus-style /metrics endpoint and request hooks.
+"""
+
+import time
+
+from flask import Blueprint, Response, g, request
+
+from app.models import ModelSubmission, db
+from utils.admission import admission
+from utils.db_routing import db_router
+from utils.metrics import metrics
+from utils.search_analytics import search_analytics
+from utils.tracing import tracer
+
+metrics_bp = Blueprint('metrics', __name__)
+
+http_requests = metrics.counter(
+    'http_requests_total',
+    'HTTP requests by blueprint route, method and status'
+)
+http_latency = metrics.histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by blueprint route'
+)
+
+
+@metrics_bp.before_app_request
+def start_request_timer():
+    """Stamp the request start time."""
+    g.metrics_start = time.perf_counter()
+
+
+@metrics_bp.after_app_request
+def record_request(response):
+    """Count the request and record its latency."""
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+
+    labels = {
+        'blueprint': request.blueprint or '',
+        'endpoint': request.endpoint or 'unmatched',
+    }
+    http_latency.observe((time.perf_counter() - start) * 1000, labels)
+    http_requests.inc(dict(labels, method=request.method, status=response.status_code))
+    return response
+
+
+@metrics_bp.route('/metrics')
+def metrics_endpoint():
+    """
+    Metrics in Prometheus text exposition format.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _db_pool_usage():
+    """Connection pool usage per engine (primary and, if configured, replica)."""
+    return [
+        ({'engine': engine, 'state': state}, value)
+        for engine, states in db_router.stats()['engines'].items()
+        for state, value in states.items()
+    ]
+
+
+def _replica_lag():
+    """Last measured replica lag in seconds (absent without a replica)."""
+    return db_router.stats()['replica_lag']
+
+
+def _admission_queue_depth():
+    """Requests waiting for an admission slot by limiter and priority."""
+    return [
+        ({'limiter': name, 'priority': priority}, count)
+        for name, limiter in admission.stats().items()
+        for priority, count in limiter['queued'].items()
+    ]
+
+
+def _admission_in_flight():
+    """Requests holding an admission slot by limiter."""
+    return [({'limiter': name}, limiter['in_flight']) for name, limiter in admission.stats().items()]
+
+
+def _embedding_cache(field):
+    """Read one field of the query-embedding LRU cache info."""
+    def read():
+        from app.core.embeddings import generate_embedding_cached
+        return getattr(generate_embedding_cached.cache_info(), field)
+    return read
+
+
+def _ingestion_in_progress():
+    """Uploads currently being processed by this worker."""
+    return tracer.active('process_uploaded_file') + tracer.active('process_batch_upload')
+
+
+def _grading_queue_depth():
+    """Pending and running submissions (shared queue, same in every worker)."""
+    rows = db.session.query(
+        ModelSubmission.status, db.func.count(ModelSubmission.id)
+    ).filter(
+        ModelSubmission.status.in_(('pending', 'running'))
+    ).group_by(ModelSubmission.status).all()
+    return [({'status': status}, count) for status, count in rows]
+
+
+metrics.callback('db_pool_connections', 'Database connection pool usage by engine and state', _db_pool_usage)
+metrics.callback('db_replica_lag_seconds', 'Read replica replay lag', _replica_lag)
+metrics.callback('admission_queue_depth', 'Requests waiting for an admission slot', _admission_queue_depth)
+metrics.callback('admission_in_flight', 'Requests holding an admission slot', _admission_in_flight)
+metrics.callback('embedding_cache_hits_total', 'Query embedding cache hits', _embedding_cache('hits'), 'counter')
+metrics.callback('embedding_cache_misses_total', 'Query embedding cache misses', _embedding_cache('misses'), 'counter')
+metrics.callback('embedding_cache_size', 'Query embeddings currently cached', _embedding_cache('currsize'))
+metrics.callback('ingestion_queue_depth', 'Uploads in progress in this worker', _ingestion_in_progress)
+metrics.callback(
+    'search_analytics_queue_depth',
+    'Search analytics rows waiting to be written',
+    lambda: search_analytics.stats()['queue_depth']
+)
+metrics.callback(
+    'search_analytics_dropped_total',
+    'Search analytics rows dropped because the queue was full',
+    lambda: search_analytics.stats()['dropped'],
+    'counter'
+)
+metrics.callback('grading_queue_depth', 'Submissions waiting for or in grading', _grading_queue_depth)
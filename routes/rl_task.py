@@ -2,37 +2,63 @@
 RL Task routes: Overview, Submit, Results, History
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app
-from datetime import datetime
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app, Response, stream_with_context, abort
+from datetime import datetime, timedelta
+import json
+import time
 
-from app.models import ModelSubmission, TestCase, db
+from sqlalchemy.orm import defer
+
+from app.models import ModelSubmission, db
 from app.rl_task.task_definition import get_task_prompt
-from app.core.grader import grade_submission
+from utils.admission import BATCH, INTERACTIVE, Overloaded, admission
+from utils.db_routing import replica_reads
+from utils.grading_queue import FINAL_STATUSES, QueueFullError, grading_queue, submission_status
+from utils.pagination import InvalidCursor, keyset_paginate
+from utils.stat_counters import counter_keys, read_stats
 
 rl_task_bp = Blueprint('rl_task', __name__)
 
+# Score series bucket sizes (PostgreSQL date_trunc units)
+SCORE_SERIES_RESOLUTIONS = ('hour', 'day', 'week', 'month')
+SCORE_SERIES_MAX_BUCKETS = 500
+
+def _truncate(value, resolution):
+    """Start of the bucket containing value (matches date_trunc)."""
+    if resolution == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == 'day':
+        return day
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def _shift_buckets(value, resolution, count):
+    """Move a bucket start by count buckets (negative: back in time)."""
+    if resolution == 'month':
+        months = value.year * 12 + value.month - 1 + count
+        return value.replace(year=months // 12, month=months % 12 + 1)
+    step = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}[resolution]
+    return value + step * count
+
 @rl_task_bp.route('/')
+@replica_reads
 def overview():
     """
     Task description and overview.
     """
     task_prompt = get_task_prompt()
     
-    # Get some statistics
-    total_submissions = ModelSubmission.query.count()
-    passed_submissions = ModelSubmission.query.filter_by(passed=True).count()
-    
-    # Get best score
-    best_submission = ModelSubmission.query.order_by(
-        ModelSubmission.score.desc()
-    ).first()
+    # Get some statistics (maintained counters)
+    submission_stats = read_stats()['submissions']
     
     return render_template(
         'rl_task/overview.html',
         task_prompt=task_prompt,
-        total_submissions=total_submissions,
-        passed_submissions=passed_submissions,
-        best_score=best_submission.score if best_submission else 0
+        total_submissions=submission_stats['total'],
+        passed_submissions=submission_stats['passed'],
+        best_score=submission_stats['best_score']
     )
 
 @rl_task_bp.route('/submit', methods=['GET', 'POST'])
@@ -56,33 +82,23 @@ def submit():
             return redirect(url_for('rl_task.submit'))
         
         try:
-            # Get test cases
-            test_cases = TestCase.query.all()
-            
-            # Grade submission
-            result = grade_submission(code, test_cases)
-            
-            # Save submission
-            submission = ModelSubmission(
-                model_name=model_name,
-                code=code,
-                score=result['score'],
-                passed=result['passed'],
-                test_results=result['test_results'],
-                execution_time=result['execution_time']
-            )
+            # Queue for background grading; results page polls for status
+            with admission.slot('grading', INTERACTIVE):
+                submission = grading_queue.enqueue(code, model_name)
             
-            if 'security_issues' in result:
-                submission.security_issues = result['security_issues']
-            
-            db.session.add(submission)
-            db.session.commit()
-            
-            flash('Submission graded successfully!', 'success')
+            flash('Submission queued for grading', 'success')
             return redirect(url_for('rl_task.results', submission_id=submission.id))
         
+        except Overloaded as e:
+            flash(f'Server busy. Please try again in {e.retry_after} seconds.', 'error')
+            return redirect(url_for('rl_task.submit'))
+        
+        except QueueFullError as e:
+            flash(f'{str(e)}. Please try again shortly.', 'error')
+            return redirect(url_for('rl_task.submit'))
+        
         except Exception as e:
-            flash(f'Grading failed: {str(e)}', 'error')
+            flash(f'Submission failed: {str(e)}', 'error')
             return redirect(url_for('rl_task.submit'))
     
     # GET request - show submission form
@@ -104,46 +120,140 @@ def results(submission_id):
     return render_template(
         'rl_task/results.html',
         submission=submission,
-        reference_code=reference_code
+        reference_code=reference_code,
+        events_enabled=current_app.config.get('GRADING_EVENTS_ENABLED', False),
+        poll_interval_ms=int(current_app.config.get('GRADING_STATUS_POLL_INTERVAL', 2.0) * 1000)
     )
 
 @rl_task_bp.route('/history')
+@replica_reads
 def history():
     """
     View submission history.
     """
-    page = request.args.get('page', 1, type=int)
     per_page = 20
     
     # Filter by model if specified
     model_filter = request.args.get('model', None)
     
-    query = ModelSubmission.query
+    # Listing columns only; code and test_results can be large
+    query = ModelSubmission.query.options(
+        defer(ModelSubmission.code), defer(ModelSubmission.test_results)
+    )
     if model_filter:
         query = query.filter_by(model_name=model_filter)
     
-    submissions = query.order_by(
-        ModelSubmission.created_at.desc()
-    ).paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        submissions = keyset_paginate(
+            query, ModelSubmission,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=per_page
+        )
+    except InvalidCursor:
+        abort(400)
     
-    # Get unique model names for filter dropdown
-    models = db.session.query(ModelSubmission.model_name).distinct().all()
-    model_names = [m[0] for m in models]
+    # Model names for filter dropdown, from the maintained counters
+    model_names = counter_keys('submissions_by_model')
     
-    # Score progression data for chart
-    score_data = db.session.query(
-        ModelSubmission.created_at,
-        ModelSubmission.score,
-        ModelSubmission.model_name
-    ).order_by(ModelSubmission.created_at).all()
+    # Result cache hit rate, overall and per model, from the maintained counters
+    submission_stats = read_stats()['submissions']
+    cache_by_model = [
+        {'model_name': name, 'total': total, 'hits': hits, 'hit_rate': hits / total}
+        for name, (total, hits) in submission_stats['cache_hits_by_model'].items()
+    ]
+    total_graded = submission_stats['graded']
+    total_hits = submission_stats['cache_hits']
+    cache_stats = {
+        'total': total_graded,
+        'hits': total_hits,
+        'hit_rate': total_hits / total_graded if total_graded else 0.0,
+        'by_model': cache_by_model,
+    }
     
+    # Score chart loads incrementally from /api/score-series
     return render_template(
         'rl_task/history.html',
         submissions=submissions,
         model_names=model_names,
-        score_data=score_data
+        cache_stats=cache_stats,
+        resolutions=SCORE_SERIES_RESOLUTIONS
     )
 
+@rl_task_bp.route('/api/score-series')
+@replica_reads
+def api_score_series():
+    """
+    Score min/avg/max/count per time bucket and model, aggregated in SQL.
+    
+    Query params:
+        resolution: hour, day, week or month (default: day)
+        buckets: Number of buckets in this window (default: 60)
+        before: ISO timestamp; window ends at this bucket boundary
+            (default: end of the current bucket). Pass the previous
+            response's next_before to load the preceding window.
+        model: Optional model name filter
+    """
+    resolution = request.args.get('resolution', 'day')
+    if resolution not in SCORE_SERIES_RESOLUTIONS:
+        return jsonify({'error': f"resolution must be one of {', '.join(SCORE_SERIES_RESOLUTIONS)}"}), 400
+    
+    buckets = max(1, min(request.args.get('buckets', 60, type=int), SCORE_SERIES_MAX_BUCKETS))
+    model_filter = request.args.get('model')
+    
+    before = request.args.get('before')
+    try:
+        end = _truncate(datetime.fromisoformat(before), resolution) if before else \
+            _shift_buckets(_truncate(datetime.utcnow(), resolution), resolution, 1)
+    except ValueError:
+        return jsonify({'error': 'before must be an ISO timestamp'}), 400
+    start = _shift_buckets(end, resolution, -buckets)
+    
+    filters = [
+        ModelSubmission.score.isnot(None),
+        ModelSubmission.created_at >= start,
+        ModelSubmission.created_at < end,
+    ]
+    if model_filter:
+        filters.append(ModelSubmission.model_name == model_filter)
+    
+    bucket = db.func.date_trunc(resolution, ModelSubmission.created_at).label('bucket')
+    rows = db.session.query(
+        bucket,
+        ModelSubmission.model_name,
+        db.func.min(ModelSubmission.score),
+        db.func.avg(ModelSubmission.score),
+        db.func.max(ModelSubmission.score),
+        db.func.count(ModelSubmission.id)
+    ).filter(*filters).group_by(bucket, ModelSubmission.model_name).order_by(bucket).all()
+    
+    series = {}
+    for bucket_start, model_name, min_score, avg_score, max_score, count in rows:
+        series.setdefault(model_name or 'unknown', []).append({
+            'bucket': bucket_start.isoformat(),
+            'min': float(min_score),
+            'avg': float(avg_score),
+            'max': float(max_score),
+            'count': count,
+        })
+    
+    # Latest data before this window (backward index scan on created_at),
+    # so the next window skips empty stretches
+    earlier = db.session.query(db.func.max(ModelSubmission.created_at)).filter(
+        *filters[:1],
+        ModelSubmission.created_at < start,
+        *filters[3:]
+    ).scalar()
+    next_before = _shift_buckets(_truncate(earlier, resolution), resolution, 1) if earlier else None
+    
+    return jsonify({
+        'resolution': resolution,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': series,
+        'next_before': next_before.isoformat() if next_before else None
+    })
+
 @rl_task_bp.route('/api/run-grader', methods=['POST'])
 def api_run_grader():
     """
@@ -157,19 +267,89 @@ def api_run_grader():
         return jsonify({'error': 'Code is required'}), 400
     
     try:
-        test_cases = TestCase.query.all()
-        result = grade_submission(code, test_cases)
-        
-        return jsonify({
-            'success': True,
-            'score': result['score'],
-            'passed': result['passed'],
-            'test_results': result['test_results'],
-            'execution_time': result['execution_time']
-        })
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'priority must be an integer'}), 400
+    
+    try:
+        with admission.slot('grading', BATCH):
+            submission = grading_queue.enqueue(code, model_name, priority=priority)
+    
+    except Overloaded:
+        # Shed: 429/503 with Retry-After from the admission error handler
+        raise
+    
+    except QueueFullError as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
     
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+    
+    status_url = url_for('rl_task.api_submission_status', submission_id=submission.id)
+    payload = {
+        'success': True,
+        'submission_id': submission.id,
+        'status': submission.status,
+        'status_url': status_url,
+        'results_url': url_for('rl_task.results', submission_id=submission.id),
+    }
+    if current_app.config.get('GRADING_EVENTS_ENABLED', False):
+        payload['events_url'] = url_for('rl_task.api_submission_events', submission_id=submission.id)
+    response = jsonify(payload)
+    response.headers['Location'] = status_url
+    return response, 202
+
+@rl_task_bp.route('/api/submissions/<int:submission_id>')
+def api_submission_status(submission_id):
+    """
+    Grading status of a submission (for polling).
+    """
+    submission = ModelSubmission.query.get_or_404(submission_id)
+    status = submission_status(submission)
+    
+    if submission.status in FINAL_STATUSES:
+        status['test_results'] = submission.test_results
+        status['security_issues'] = submission.security_issues
+    
+    return jsonify(status)
+
+@rl_task_bp.route('/api/submissions/<int:submission_id>/events')
+def api_submission_events(submission_id):
+    """
+    Server-sent events stream of status changes, closed once grading finishes.
+    
+    Only with GRADING_EVENTS_ENABLED (async/gevent deployments): a stream
+    holds its worker for its whole duration, so it is also cut after
+    GRADING_EVENTS_TIMEOUT seconds and the browser reconnects.
+    """
+    if not current_app.config.get('GRADING_EVENTS_ENABLED', False):
+        abort(404)
+    ModelSubmission.query.get_or_404(submission_id)
+    interval = current_app.config.get('GRADING_POLL_INTERVAL', 2.0)
+    max_duration = current_app.config.get('GRADING_EVENTS_TIMEOUT', 10)
+    retry_ms = int(current_app.config.get('GRADING_STATUS_POLL_INTERVAL', 2.0) * 1000)
+    
+    @stream_with_context
+    def generate():
+        deadline = time.monotonic() + max_duration
+        last = None
+        yield f"retry: {retry_ms}\n\n"
+        while time.monotonic() < deadline:
+            submission = db.session.get(ModelSubmission, submission_id)
+            status = submission_status(submission)
+            if status != last:
+                yield f"event: status\ndata: {json.dumps(status)}\n\n"
+                last = status
+            if submission.status in FINAL_STATUSES:
+                return
+            # Release the connection and see other transactions' commits
+            db.session.remove()
+            time.sleep(interval)
+        yield "event: timeout\ndata: {}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
\ No newline at end of file
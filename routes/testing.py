@@ -2,10 +2,21 @@
 Testing dashboard routes.
 """
 
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app, flash, redirect, url_for
 from app.models import TestCase, Document
-from app.core.search import hybrid_search, _vector_search, _keyword_search
+from app.core.search import hybrid_search
 from app.core.grader import grade_submission
+from utils.benchmark import (
+    BenchmarkConfig,
+    run_benchmark,
+    save_results,
+    latest_results,
+    load_results,
+    save_baseline,
+    compare_to_baseline,
+    DEFAULT_BASELINE
+)
+from utils import ir_eval
 import time
 
 testing_bp = Blueprint('testing', __name__)
@@ -59,76 +70,93 @@ def test_case_detail(test_id):
 @testing_bp.route('/run-all', methods=['POST'])
 def run_all_tests():
     """
-    Run all test cases with reference implementation.
+    Run all test cases with the reference ranking through the batch
+    evaluation path (see utils/ir_eval.py).
     """
-    test_cases = TestCase.query.all()
-    results = []
+    report = ir_eval.evaluate([ir_eval.PRESET_CONFIGS['hybrid']])
+    result = report['configs']['hybrid']
     
-    for tc in test_cases:
-        start_time = time.time()
-        search_results = hybrid_search(tc.query, limit=10)
-        execution_time = time.time() - start_time
-        
-        # Check if expected docs are in results
-        result_ids = [doc.id for doc in search_results]
-        expected_found = sum(1 for exp_id in tc.expected_docs if exp_id in result_ids)
-        
-        results.append({
-            'test_id': tc.id,
-            'query': tc.query,
-            'category': tc.category,
-            'expected_count': len(tc.expected_docs),
-            'found_count': expected_found,
-            'execution_time': execution_time,
-            'passed': expected_found >= len(tc.expected_docs) * 0.7  # 70% threshold
-        })
+    # Batch search has no per-query timing; spread the batch time evenly
+    per_query_time = report['search_time_s'] / report['query_count'] if report['query_count'] else 0.0
+    for query in result['queries']:
+        query['execution_time'] = per_query_time
     
     return jsonify({
-        'total_tests': len(results),
-        'passed': sum(1 for r in results if r['passed']),
-        'results': results
+        'total_tests': report['query_count'],
+        'passed': result['passed'],
+        'metrics': result['overall'],
+        'by_category': result['by_category'],
+        'search_time': report['search_time_s'],
+        'results': result['queries']
     })
 
-@testing_bp.route('/benchmark')
-def benchmark():
+@testing_bp.route('/evaluate', methods=['GET', 'POST'])
+def evaluate():
     """
-    Performance benchmarking interface.
+    Compare search configurations side by side (recall@k, MRR, nDCG, order agreement).
     """
-    # Run benchmarks for different search types
-    test_queries = [
-        "SELECT * FROM users",
-        "neural network training",
-        "python function average"
-    ]
+    specs = request.form.getlist('configs') or ['hybrid']
+    custom = request.form.get('custom', '').strip()
+    if custom:
+        specs.append(custom)
+    k = min(request.form.get('k', ir_eval.DEFAULT_K, type=int), 100)
     
-    benchmarks = {}
+    report = None
+    if request.method == 'POST':
+        try:
+            configs = [ir_eval.parse_config(spec) for spec in specs]
+            report = ir_eval.evaluate(configs, k=k)
+        except ValueError as e:
+            flash(f'Evaluation failed: {str(e)}', 'error')
     
-    for query in test_queries:
-        # Vector search
-        start = time.time()
-        vector_results = _vector_search(query, limit=50)
-        vector_time = time.time() - start
+    return render_template(
+        'testing/evaluation.html',
+        report=report,
+        presets=ir_eval.PRESET_CONFIGS,
+        metrics=ir_eval.METRICS,
+        selected=specs,
+        k=k
+    )
+
+@testing_bp.route('/benchmark', methods=['GET', 'POST'])
+def benchmark():
+    """
+    Performance benchmarking interface (see utils/benchmark.py for the CLI).
+    """
+    if request.method == 'POST':
+        if request.form.get('action') == 'baseline':
+            results = latest_results()
+            if results:
+                save_baseline(results)
+                flash('Latest run saved as baseline', 'success')
+            else:
+                flash('No benchmark run to promote', 'error')
+            return redirect(url_for('testing.benchmark'))
         
-        # Keyword search
-        start = time.time()
-        keyword_results = _keyword_search(query, limit=50)
-        keyword_time = time.time() - start
+        # Keep dashboard runs bounded; larger runs belong on the CLI
+        config = BenchmarkConfig(
+            queries=request.form.get('queries', 'default'),
+            warmup=min(request.form.get('warmup', 1, type=int), 5),
+            repetitions=min(request.form.get('repetitions', 5, type=int), 50),
+            concurrency=min(request.form.get('concurrency', 1, type=int), 16)
+        )
         
-        # Hybrid search
-        start = time.time()
-        hybrid_results = hybrid_search(query, limit=10)
-        hybrid_time = time.time() - start
+        try:
+            results = run_benchmark(current_app._get_current_object(), config)
+            save_results(results)
+            flash(f"Benchmarked {results['requests']} searches", 'success')
+        except ValueError as e:
+            flash(f'Benchmark failed: {str(e)}', 'error')
         
-        benchmarks[query] = {
-            'vector_time': vector_time,
-            'keyword_time': keyword_time,
-            'hybrid_time': hybrid_time,
-            'vector_count': len(vector_results),
-            'keyword_count': len(keyword_results),
-            'hybrid_count': len(hybrid_results)
-        }
+        return redirect(url_for('testing.benchmark'))
+    
+    results = latest_results()
+    baseline = load_results(DEFAULT_BASELINE)
+    regressions = compare_to_baseline(results, baseline) if results and baseline else None
     
     return render_template(
         'testing/benchmark.html',
-        benchmarks=benchmarks
-    )
\ No newline at end of file
+        results=results,
+        baseline=baseline,
+        regressions=regressions
+    )
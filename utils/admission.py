@@ -0,0 +1,282 @@
+"""
+Admission control and load shedding for expensive endpoints.
+
+Each limiter (search, grading) admits at most `concurrency` requests at a
+time per worker process; the rest wait in a bounded priority queue.
+Interactive UI requests are served before batch API traffic:
+
+- waiting interactive requests are always dispatched first
+- `reserved` slots are never given to batch requests, so a burst of API
+  calls cannot take every slot away from the UI
+- when the queue is full, an interactive arrival evicts the newest
+  waiting batch request instead of being turned away
+
+A request is shed instead of queued when the queue is full, when its
+estimated wait (position x average service time / concurrency) already
+exceeds `max_wait`, or when it has waited `max_wait` seconds. Shed
+requests raise Overloaded, which init_app() turns into a fast response
+with a Retry-After header: 429 for batch traffic (back off), 503 for
+interactive traffic (the service is saturated).
+
+Limits are per process: the effective limit is workers x concurrency.
+Size it against the database pool (DB_POOL_SIZE + DB_MAX_OVERFLOW) and
+the embedding model, not against request volume.
+
+Usage:
+    admission = AdmissionController()
+    admission.init_app(app)
+
+    with admission.slot('search', INTERACTIVE):
+        results = staged_hybrid_search(query)
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from flask import jsonify, render_template, request
+
+from utils.metrics import metrics
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+# Lower dispatches first
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+
+# Defaults, overridable per limiter through ADMISSION_LIMITS
+DEFAULT_LIMITS = {
+    'search': {'concurrency': 8, 'queue': 32, 'max_wait': 2.0, 'reserved': 2},
+    'grading': {'concurrency': 4, 'queue': 16, 'max_wait': 1.0, 'reserved': 1},
+}
+DEFAULT_RETRY_AFTER_MAX = 30        # seconds
+INITIAL_SERVICE_MS = 100.0          # service time estimate before any request finished
+SERVICE_EWMA_ALPHA = 0.1
+
+admission_shed = metrics.counter(
+    'admission_shed_total',
+    'Requests shed by admission control by limiter, priority and reason'
+)
+admission_wait = metrics.histogram(
+    'admission_queue_wait_seconds',
+    'Time admitted requests waited for a slot by limiter and priority'
+)
+
+
+class Overloaded(Exception):
+    """Raised by Limiter.acquire() when a request is shed."""
+
+    def __init__(self, limiter: str, priority: str, reason: str, retry_after: int):
+        super().__init__(f'{limiter} is overloaded ({reason}), retry in {retry_after}s')
+        self.limiter = limiter
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self) -> int:
+        return 429 if self.priority == BATCH else 503
+
+
+class _Waiter:
+    __slots__ = ('priority', 'event', 'state', 'reason')
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.event = threading.Event()
+        self.state = 'waiting'
+        self.reason = None
+
+
+class Limiter:
+    """Concurrency limit with a bounded two-level priority queue."""
+
+    def __init__(self, name: str, concurrency: int, queue: int, max_wait: float,
+                 reserved: int = 0, retry_after_max: int = DEFAULT_RETRY_AFTER_MAX):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue = max(0, queue)
+        self.max_wait = max_wait
+        self.reserved = min(max(0, reserved), self.concurrency - 1)
+        self.retry_after_max = retry_after_max
+
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._service_ms = INITIAL_SERVICE_MS
+
+        # Counters exposed through stats()
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = {}
+
+    def _capacity(self, priority: str) -> int:
+        return self.concurrency - self.reserved if priority == BATCH else self.concurrency
+
+    def _estimated_wait(self, position: int) -> float:
+        """Seconds until the request at this queue position (1-based) gets a slot."""
+        return position * self._service_ms / 1000 / self.concurrency
+
+    def _retry_after(self) -> int:
+        seconds = math.ceil(self._estimated_wait(len(self._heap) + 1))
+        return max(1, min(self.retry_after_max, seconds))
+
+    def _shed(self, priority: str, reason: str) -> Overloaded:
+        self.shed[(priority, reason)] = self.shed.get((priority, reason), 0) + 1
+        admission_shed.inc({'limiter': self.name, 'priority': priority, 'reason': reason})
+        return Overloaded(self.name, priority, reason, self._retry_after())
+
+    def _dispatch(self):
+        """Hand free slots to waiters, highest priority first."""
+        while self._heap:
+            _, _, waiter = self._heap[0]
+            if self.in_flight >= self._capacity(waiter.priority):
+                break
+            heapq.heappop(self._heap)
+            waiter.state = 'granted'
+            self.in_flight += 1
+            waiter.event.set()
+
+    def acquire(self, priority: str = INTERACTIVE) -> float:
+        """
+        Wait for a slot.
+
+        Returns:
+            Milliseconds spent waiting
+
+        Raises:
+            Overloaded: if the request is shed
+        """
+        rank = PRIORITIES[priority]
+        with self._lock:
+            # Nobody of equal or higher priority is waiting: take a free slot
+            if (not self._heap or self._heap[0][0] > rank) and self.in_flight < self._capacity(priority):
+                self.in_flight += 1
+                self.admitted += 1
+                return 0.0
+
+            position = 1 + sum(1 for entry in self._heap if entry[0] <= rank)
+            if self._estimated_wait(position) > self.max_wait:
+                raise self._shed(priority, 'deadline')
+
+            if len(self._heap) >= self.queue:
+                victim = max(self._heap) if self._heap else None
+                if victim is None or victim[0] <= rank:
+                    raise self._shed(priority, 'queue_full')
+                self._heap.remove(victim)
+                heapq.heapify(self._heap)
+                victim[2].state = 'shed'
+                victim[2].reason = 'evicted'
+                victim[2].event.set()
+
+            waiter = _Waiter(priority)
+            entry = (rank, next(self._seq), waiter)
+            heapq.heappush(self._heap, entry)
+
+        start = time.perf_counter()
+        waiter.event.wait(self.max_wait)
+        waited_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            if waiter.state == 'granted':
+                self.admitted += 1
+                return waited_ms
+            if waiter.state == 'waiting':
+                self._heap.remove(entry)
+                heapq.heapify(self._heap)
+                waiter.reason = 'timeout'
+            raise self._shed(priority, waiter.reason)
+
+    def release(self, service_ms: float):
+        """Free a slot and record how long the request held it."""
+        with self._lock:
+            self.in_flight -= 1
+            self._service_ms += SERVICE_EWMA_ALPHA * (service_ms - self._service_ms)
+            self._dispatch()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            queued = {name: 0 for name in PRIORITIES}
+            for _, _, waiter in self._heap:
+                queued[waiter.priority] += 1
+            return {
+                'concurrency': self.concurrency,
+                'reserved': self.reserved,
+                'queue': self.queue,
+                'max_wait': self.max_wait,
+                'in_flight': self.in_flight,
+                'queued': queued,
+                'admitted': self.admitted,
+                'shed': {f'{priority}:{reason}': count for (priority, reason), count in self.shed.items()},
+                'service_ms': round(self._service_ms, 1),
+            }
+
+
+class AdmissionController:
+    """
+    Flask extension holding one Limiter per protected resource.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.limiters: Dict[str, Limiter] = {}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Build limiters from config and register the shed response."""
+        self.app = app
+        self.enabled = app.config.get('ADMISSION_CONTROL_ENABLED', True)
+        retry_after_max = app.config.get('ADMISSION_RETRY_AFTER_MAX', DEFAULT_RETRY_AFTER_MAX)
+        overrides = app.config.get('ADMISSION_LIMITS', {})
+
+        self.limiters = {}
+        for name in set(DEFAULT_LIMITS) | set(overrides):
+            settings = dict(DEFAULT_LIMITS.get(name, {}), **overrides.get(name, {}))
+            self.limiters[name] = Limiter(name, retry_after_max=retry_after_max, **settings)
+
+        app.extensions['admission'] = self
+        app.register_error_handler(Overloaded, self._shed_response)
+
+    @contextmanager
+    def slot(self, name: str, priority: str = INTERACTIVE):
+        """Hold one of the named limiter's slots for the duration of the block."""
+        limiter = self.limiters.get(name) if self.enabled else None
+        if limiter is None:
+            yield
+            return
+
+        waited_ms = limiter.acquire(priority)
+        admission_wait.observe(waited_ms, {'limiter': name, 'priority': priority})
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            limiter.release((time.perf_counter() - start) * 1000)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+    def _shed_response(self, error: Overloaded):
+        """JSON for API clients, an error page for the UI; both carry Retry-After."""
+        if '/api/' in request.path or request.accept_mimetypes.best == 'application/json':
+            response = jsonify({
+                'success': False,
+                'error': str(error),
+                'retry_after': error.retry_after,
+            })
+        else:
+            response = render_template('errors/overloaded.html', retry_after=error.retry_after)
+        response = self.app.make_response((response, error.status_code))
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+
+
+# Shared instance, initialized by the app factory
+admission = AdmissionController()
@@ -0,0 +1,398 @@
+"""
+Async search endpoints on ASGI, alongside the Flask blueprints.
+
+The WSGI stack holds a worker thread (and a psycopg2 connection) for the
+whole of every search, although most of that time is spent waiting on
+Postgres. SearchASGI serves the search API from an event loop instead:
+
+    GET  /api/search?q=...&limit=10&collapse=1   same response as the Flask view
+    POST /api/search/batch  {"queries": [...], "limit": 10, "collapse": true}
+
+and hands every other request to the Flask app (asgiref WsgiToAsgi), so
+one server process carries the whole site.
+
+Each search runs the same stages as utils/search_pipeline.py, with the
+ranking unchanged (rrf_fuse, group_leaders), over an asyncpg pool with
+pgvector's codec, on DATABASE_REPLICA_URL when one is configured (as the
+Flask @replica_reads views) and on the primary otherwise:
+
+- the keyword leg starts immediately; the query embedding is computed in
+  a thread pool (the model is CPU-bound and not async) and the vector leg
+  starts as soon as it is ready; both legs run concurrently on separate
+  pooled connections, so 'embedding' + 'vector' and 'keyword' overlap in
+  the recorded stage timings
+- variant collapse and hydration are one primary-key query each;
+  hydration reads only the columns the API returns
+
+At most ASYNC_SEARCH_POOL_MAX / 2 searches run at once (two connections
+each while the legs overlap); up to the search limiter's queue
+(ADMISSION_LIMITS) wait up to its max_wait, and the rest are shed with
+429 + Retry-After (admission_shed_total, limiter 'search_async'). A batch
+runs ASYNC_SEARCH_BATCH_PARALLELISM of its searches at a time, each
+queued and shed like a single search. Stage latencies and search
+analytics are recorded as for the Flask routes.
+
+Deployment (asgi.py):
+    app = SearchASGI(create_app('production'))
+    uvicorn asgi:app --workers 4
+
+Compare with the sync path:
+    python utils/benchmark.py http --url http://localhost:8000 --url http://localhost:5000
+"""
+
+import asyncio
+import json
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+from utils.admission import BATCH, DEFAULT_LIMITS, Overloaded, admission_shed
+from utils.latency import search_latency, stage_timer
+from utils.search_analytics import search_analytics
+from utils.search_pipeline import CANDIDATE_LIMIT, embed_query, group_leaders, rrf_fuse
+
+# Defaults, overridable through app.config
+DEFAULT_POOL_MIN = 2
+DEFAULT_POOL_MAX = 20
+DEFAULT_EMBED_WORKERS = 2
+DEFAULT_COMMAND_TIMEOUT = 10.0    # seconds per statement
+DEFAULT_MAX_BATCH = 100           # queries per /api/search/batch request
+DEFAULT_BATCH_PARALLELISM = 4     # searches of one batch in flight at once
+MAX_BODY_BYTES = 1 << 20
+
+LIMITER_NAME = 'search_async'
+
+VECTOR_SQL = """
+    SELECT id, 1 - (embedding <=> $1) AS similarity
+    FROM documents
+    WHERE embedding IS NOT NULL
+    ORDER BY embedding <=> $1
+    LIMIT $2
+"""
+
+KEYWORD_SQL = """
+    SELECT id, ts_rank(ts_vector, plainto_tsquery('english', $1)) AS rank
+    FROM documents
+    WHERE ts_vector @@ plainto_tsquery('english', $1)
+    ORDER BY rank DESC
+    LIMIT $2
+"""
+
+CANONICAL_SQL = "SELECT id, canonical_id FROM documents WHERE id = ANY($1::int[])"
+
+HYDRATE_SQL = """
+    SELECT id, title, snippet, content_length, canonical_id, category
+    FROM documents
+    WHERE id = ANY($1::int[])
+"""
+
+
+def asyncpg_dsn(url: str) -> str:
+    """SQLAlchemy URL (postgresql+psycopg2://...) to a libpq DSN asyncpg accepts."""
+    return re.sub(r'^postgres(ql)?(\+\w+)?://', 'postgresql://', url)
+
+
+async def _init_connection(conn):
+    from pgvector.asyncpg import register_vector
+    await register_vector(conn)
+
+
+class AsyncSearch:
+    """asyncpg-backed hybrid search with the same ranking as staged_hybrid_search."""
+
+    def __init__(self, config):
+        # Searches only read (analytics rows go through search_analytics), so
+        # they belong on the read replica when there is one
+        self.dsn = asyncpg_dsn(
+            config.get('ASYNC_SEARCH_DATABASE_URL')
+            or config.get('DATABASE_REPLICA_URL')
+            or config['SQLALCHEMY_DATABASE_URI']
+        )
+        self.pool_min = config.get('ASYNC_SEARCH_POOL_MIN', DEFAULT_POOL_MIN)
+        self.pool_max = config.get('ASYNC_SEARCH_POOL_MAX', DEFAULT_POOL_MAX)
+        self.command_timeout = config.get('ASYNC_SEARCH_COMMAND_TIMEOUT', DEFAULT_COMMAND_TIMEOUT)
+        self.max_batch = config.get('ASYNC_SEARCH_MAX_BATCH', DEFAULT_MAX_BATCH)
+        self.embed_workers = config.get('ASYNC_SEARCH_EMBED_WORKERS', DEFAULT_EMBED_WORKERS)
+        self.batch_parallelism = config.get('ASYNC_SEARCH_BATCH_PARALLELISM', DEFAULT_BATCH_PARALLELISM)
+
+        limits = dict(DEFAULT_LIMITS['search'], **config.get('ADMISSION_LIMITS', {}).get('search', {}))
+        self.queue = limits['queue']
+        self.max_wait = limits['max_wait']
+
+        self.pool = None
+        self._executor = None
+        self._slots = None
+        self._waiting = 0
+
+    async def start(self):
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.pool_min,
+            max_size=self.pool_max,
+            command_timeout=self.command_timeout,
+            init=_init_connection,
+        )
+        self._executor = ThreadPoolExecutor(max_workers=self.embed_workers, thread_name_prefix='embed')
+        # Two connections per search (one per leg) while both legs run
+        self._slots = asyncio.Semaphore(max(1, self.pool_max // 2))
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _fetch(self, sql: str, *args):
+        async with self.pool.acquire() as conn:
+            return await conn.fetch(sql, *args)
+
+    async def embed(self, query: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, embed_query, query)
+
+    async def vector_candidates(self, query_embedding: Sequence[float],
+                                limit: int = CANDIDATE_LIMIT) -> List[Tuple[int, float]]:
+        rows = await self._fetch(VECTOR_SQL, query_embedding, limit)
+        return [(row['id'], float(row['similarity'])) for row in rows]
+
+    async def keyword_candidates(self, query: str, limit: int = CANDIDATE_LIMIT) -> List[Tuple[int, float]]:
+        rows = await self._fetch(KEYWORD_SQL, query, limit)
+        return [(row['id'], float(row['rank'])) for row in rows]
+
+    async def collapse_variant_groups(self, fused: Sequence[Tuple[int, float]], limit: int) -> List[Tuple[int, float]]:
+        if not fused:
+            return []
+        rows = await self._fetch(CANONICAL_SQL, [doc_id for doc_id, _ in fused])
+        return group_leaders(fused, {row['id']: row['canonical_id'] or row['id'] for row in rows}, limit)
+
+    async def hydrate(self, doc_ids: Sequence[int]) -> List[Dict]:
+        if not doc_ids:
+            return []
+        rows = await self._fetch(HYDRATE_SQL, list(doc_ids))
+        by_id = {row['id']: row for row in rows}
+        return [
+            {
+                'id': row['id'],
+                'title': row['title'],
+                'content': row['snippet'],
+                'content_length': row['content_length'],
+                'canonical_id': row['canonical_id'],
+                'category': row['category'],
+            }
+            for row in (by_id.get(doc_id) for doc_id in doc_ids) if row is not None
+        ]
+
+    async def search(self, query: str, limit: int = 10, collapse_variants: bool = False,
+                     timings: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """Hybrid search; returns API result dicts ordered by RRF score DESC."""
+        async def vector_leg():
+            with stage_timer(timings, 'embedding'):
+                query_embedding = await self.embed(query)
+            with stage_timer(timings, 'vector'):
+                return await self.vector_candidates(query_embedding)
+
+        async def keyword_leg():
+            with stage_timer(timings, 'keyword'):
+                return await self.keyword_candidates(query)
+
+        vector_results, keyword_results = await asyncio.gather(vector_leg(), keyword_leg())
+
+        with stage_timer(timings, 'fusion'):
+            fused = rrf_fuse(vector_results, keyword_results)
+            if collapse_variants:
+                fused = await self.collapse_variant_groups(fused, limit)
+
+        with stage_timer(timings, 'hydration'):
+            return await self.hydrate([doc_id for doc_id, _ in fused[:limit]])
+
+    def _check_queue(self):
+        if self._slots.locked() and self._waiting >= self.queue:
+            raise self._shed('queue_full')
+
+    async def _recorded_search(self, query: str, limit: int, collapse_variants: bool) -> List[Dict]:
+        """search() plus stage histograms and the analytics row, as the Flask routes do."""
+        timings = {}
+        start_time = time.perf_counter()
+        results = await self.search(query, limit, collapse_variants, timings)
+        timings['total'] = (time.perf_counter() - start_time) * 1000
+
+        search_latency.observe_all(timings)
+        search_analytics.record(query, len(results), timings['total'] / 1000, source='api', stage_timings=timings)
+        return results
+
+    async def _acquire_slot(self):
+        """Wait at most max_wait for a slot, behind at most `queue` others."""
+        self._check_queue()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            raise self._shed('timeout')
+        finally:
+            self._waiting -= 1
+
+    async def admitted_search(self, query: str, limit: int, collapse_variants: bool) -> List[Dict]:
+        """One search in a slot, admitted or shed by _acquire_slot()."""
+        await self._acquire_slot()
+        try:
+            return await self._recorded_search(query, limit, collapse_variants)
+        finally:
+            self._slots.release()
+
+    async def admitted_batch(self, queries: Sequence[str], limit: int, collapse_variants: bool) -> List[List[Dict]]:
+        """
+        Runs at most batch_parallelism of the searches at a time. Each one
+        queues for its slot like a single search (counted in the queue,
+        shed after max_wait), so a batch cannot hold the slots longer than
+        single searches could; if any is shed the rest are cancelled and
+        the batch is shed.
+        """
+        self._check_queue()
+        parallel = asyncio.Semaphore(self.batch_parallelism)
+
+        async def one(query):
+            async with parallel:
+                return await self.admitted_search(query, limit, collapse_variants)
+
+        tasks = [asyncio.ensure_future(one(query)) for query in queries]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def _shed(self, reason: str) -> Overloaded:
+        admission_shed.inc({'limiter': LIMITER_NAME, 'priority': BATCH, 'reason': reason})
+        return Overloaded(LIMITER_NAME, BATCH, reason, max(1, math.ceil(self.max_wait)))
+
+
+def _parse_bool(value: str) -> bool:
+    return value.lower() in ('1', 'true', 'yes')
+
+
+class SearchASGI:
+    """
+    ASGI application: async search API, everything else through Flask.
+    """
+
+    def __init__(self, flask_app):
+        from asgiref.wsgi import WsgiToAsgi
+
+        self.flask_app = flask_app
+        self.collapse_default = flask_app.config.get('SEARCH_COLLAPSE_VARIANTS', True)
+        self.search = AsyncSearch(flask_app.config)
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.routes = {
+            '/api/search': ('GET', self.api_search),
+            '/api/search/batch': ('POST', self.api_search_batch),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        route = self.routes.get(scope['path']) if scope['type'] == 'http' else None
+        if route is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        method, handler = route
+        if scope['method'] != method:
+            await _send_json(send, 405, {'error': f'Method not allowed, use {method}'}, [(b'allow', method.encode())])
+            return
+
+        try:
+            status, payload = await handler(scope, receive)
+        except Overloaded as e:
+            await _send_json(send, e.status_code, {'success': False, 'error': str(e), 'retry_after': e.retry_after},
+                             [(b'retry-after', str(e.retry_after).encode())])
+            return
+        except Exception as e:
+            self.flask_app.logger.error(f'Async search failed: {e}')
+            status, payload = 500, {'error': str(e)}
+        await _send_json(send, status, payload)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.search.start()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.search.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def api_search(self, scope, receive):
+        params = parse_qs(scope['query_string'].decode('latin-1'))
+        query = params.get('q', [''])[0].strip()
+        if not query:
+            return 400, {'error': 'Query parameter "q" is required'}
+        try:
+            limit = int(params.get('limit', ['10'])[0])
+        except ValueError:
+            limit = 10
+        collapse = _parse_bool(params['collapse'][0]) if 'collapse' in params else self.collapse_default
+
+        results = await self.search.admitted_search(query, limit, collapse)
+        return 200, {'query': query, 'results': results}
+
+    async def api_search_batch(self, scope, receive):
+        try:
+            data = json.loads(await _read_body(receive))
+        except ValueError as e:
+            return 400, {'error': f'Invalid JSON body: {e}'}
+
+        queries = data.get('queries') if isinstance(data, dict) else None
+        if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+            return 400, {'error': '"queries" must be a non-empty list of non-empty strings'}
+        if len(queries) > self.search.max_batch:
+            return 400, {'error': f'At most {self.search.max_batch} queries per batch'}
+        try:
+            limit = int(data.get('limit', 10))
+        except (TypeError, ValueError):
+            return 400, {'error': 'limit must be an integer'}
+        collapse = bool(data.get('collapse', self.collapse_default))
+
+        results = await self.search.admitted_batch([query.strip() for query in queries], limit, collapse)
+        return 200, {
+            'results': [
+                {'query': query.strip(), 'results': found}
+                for query, found in zip(queries, results)
+            ]
+        }
+
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError(f'body larger than {MAX_BODY_BYTES} bytes')
+        if not message.get('more_body'):
+            return body
+
+
+async def _send_json(send, status: int, payload, headers=()):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Search benchmark harness.
+
+Runs a query set through the staged hybrid search pipeline with warmup,
+repetitions and a configurable concurrency level, and reports per-stage
+(embedding, vector, keyword, fusion, hydration) and end-to-end latency
+percentiles. Results are saved as JSON and can be compared against a
+stored baseline to flag regressions.
+
+Usage:
+    python utils/benchmark.py run [--queries default|test_cases|FILE]
+                                  [--warmup 2] [--repetitions 10]
+                                  [--concurrency 4] [--baseline FILE]
+                                  [--save-baseline] [--threshold 0.10]
+
+    python utils/benchmark.py http --url http://localhost:8000 [--url http://localhost:5000]
+                                   [--concurrency 1,8,32,128] [--requests 200]
+
+Exit status is 1 when a regression against the baseline is detected.
+
+The http command load-tests GET /api/search on running servers (closed
+loop: `concurrency` clients each send their next request as soon as the
+previous one returns), one concurrency level at a time. Point it at the
+Flask/WSGI deployment and at the ASGI one (utils/async_search.py) to see
+where each stops scaling: throughput flattens and p95 climbs once the
+worker threads or the pools are saturated. 429/503 responses are counted
+as shed, other failures as errors; latency percentiles cover 200s only.
+The client is a thread pool, so at very high levels it can itself become
+the bottleneck; run it from another machine for those.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import numpy as np
+
+# Handle both direct execution and module imports
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import db
+
+# Same three queries the old /testing/benchmark page used
+DEFAULT_QUERIES = [
+    "SELECT * FROM users",
+    "neural network training",
+    "python function average",
+]
+
+BENCHMARK_STAGES = ('embedding', 'vector', 'keyword', 'fusion', 'hydration', 'total')
+PERCENTILES = (50, 90, 95, 99)
+
+DEFAULT_OUTPUT_DIR = 'instance/benchmarks'
+DEFAULT_BASELINE = os.path.join(DEFAULT_OUTPUT_DIR, 'baseline.json')
+
+# A percentile must be this much slower (relative and absolute) to count
+DEFAULT_THRESHOLD = 0.10
+MIN_REGRESSION_MS = 1.0
+
+
+@dataclass
+class BenchmarkConfig:
+    """Benchmark run settings."""
+
+    queries: str = 'default'  # 'default', 'test_cases', or a .txt/.json file
+    warmup: int = 1
+    repetitions: int = 5
+    concurrency: int = 1
+    limit: int = 10
+
+
+@dataclass
+class HttpBenchmarkConfig:
+    """HTTP load test settings."""
+
+    urls: List[str] = field(default_factory=list)
+    concurrency: List[int] = field(default_factory=lambda: [1, 8, 32, 128])
+    requests: int = 200       # per URL and concurrency level
+    queries: str = 'default'
+    limit: int = 10
+    timeout: float = 30.0
+
+
+def load_queries(source: str) -> List[str]:
+    """
+    Resolve a query set.
+
+    Args:
+        source: 'default', 'test_cases' (every TestCase row), or a path to a
+            text file (one query per line) or a JSON list of strings/objects
+            with a 'query' key
+
+    Returns:
+        List of query strings
+    """
+    if source == 'default':
+        return list(DEFAULT_QUERIES)
+
+    if source == 'test_cases':
+        from app.models import TestCase
+        return [tc.query for tc in TestCase.query.order_by(TestCase.id).all()]
+
+    if not os.path.exists(source):
+        raise ValueError(f"Unknown query set: {source}")
+
+    with open(source, encoding='utf-8') as f:
+        if source.endswith('.json'):
+            items = json.load(f)
+            return [item['query'] if isinstance(item, dict) else str(item) for item in items]
+        return [line.strip() for line in f if line.strip()]
+
+
+def _timed_search(app, query: str, limit: int) -> Dict[str, float]:
+    """Run one search in its own app context and return stage timings (ms)."""
+    from utils.search_pipeline import staged_hybrid_search
+
+    with app.app_context():
+        timings = {}
+        start = time.perf_counter()
+        staged_hybrid_search(query, limit=limit, timings=timings)
+        timings['total'] = (time.perf_counter() - start) * 1000
+        db.session.remove()
+    return timings
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Percentiles and moments of a list of millisecond samples."""
+    if not samples:
+        return {'count': 0}
+
+    values = np.asarray(samples, dtype=float)
+    summary = {
+        'count': int(values.size),
+        'mean_ms': float(values.mean()),
+        'min_ms': float(values.min()),
+        'max_ms': float(values.max()),
+    }
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{p}_ms'] = float(value)
+    return summary
+
+
+def run_benchmark(app, config: BenchmarkConfig) -> Dict:
+    """
+    Execute a benchmark run.
+
+    Warmup passes run every query sequentially and are not recorded, so
+    cold caches (embedding model, PG buffers) do not skew the numbers.
+    Measured passes run repetitions x queries through a thread pool of
+    `concurrency` workers.
+
+    Returns:
+        Results dict (config, environment, per-stage and per-query stats)
+    """
+    with app.app_context():
+        queries = load_queries(config.queries)
+    if not queries:
+        raise ValueError("Query set is empty")
+
+    for _ in range(config.warmup):
+        for query in queries:
+            _timed_search(app, query, config.limit)
+
+    tasks = [query for _ in range(config.repetitions) for query in queries]
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config.concurrency) as pool:
+        all_timings = list(pool.map(lambda q: _timed_search(app, q, config.limit), tasks))
+    wall_time = time.perf_counter() - wall_start
+
+    stages = {
+        stage: summarize([t[stage] for t in all_timings if stage in t])
+        for stage in BENCHMARK_STAGES
+    }
+
+    per_query = {}
+    for query, timings in zip(tasks, all_timings):
+        per_query.setdefault(query, []).append(timings['total'])
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': asdict(config),
+        'query_count': len(queries),
+        'requests': len(tasks),
+        'wall_time_s': wall_time,
+        'throughput_qps': len(tasks) / wall_time if wall_time else 0.0,
+        'stages': stages,
+        'queries': {query: summarize(samples) for query, samples in per_query.items()},
+    }
+
+
+def _http_search(url: str, query: str, limit: int, timeout: float) -> Tuple[int, float]:
+    """One GET /api/search; returns (status, milliseconds), status 0 on connection errors."""
+    target = f"{url.rstrip('/')}/api/search?{urlencode({'q': query, 'limit': limit})}"
+    start = time.perf_counter()
+    try:
+        with urlopen(target, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except HTTPError as e:
+        status = e.code
+    except (URLError, OSError):
+        status = 0
+    return status, (time.perf_counter() - start) * 1000
+
+
+def run_http_benchmark(config: HttpBenchmarkConfig, queries: List[str]) -> Dict:
+    """
+    Load-test each URL at each concurrency level.
+
+    Every URL first gets one unrecorded pass over the queries (embedding
+    cache, connection pools, PG buffers).
+
+    Returns:
+        Results dict: {url: {concurrency: level stats}} plus the config
+    """
+    if not queries:
+        raise ValueError("Query set is empty")
+
+    results = {}
+    for url in config.urls:
+        for query in queries:
+            _http_search(url, query, config.limit, config.timeout)
+
+        levels = {}
+        for level in config.concurrency:
+            tasks = [queries[i % len(queries)] for i in range(config.requests)]
+            wall_start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                samples = list(pool.map(lambda q: _http_search(url, q, config.limit, config.timeout), tasks))
+            wall_time = time.perf_counter() - wall_start
+
+            statuses = Counter(status for status, _ in samples)
+            ok = [ms for status, ms in samples if status == 200]
+            levels[str(level)] = {
+                'wall_time_s': wall_time,
+                'throughput_qps': len(ok) / wall_time if wall_time else 0.0,
+                'latency': summarize(ok),
+                'shed': statuses[429] + statuses[503],
+                'errors': len(samples) - len(ok) - statuses[429] - statuses[503],
+                'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            }
+        results[url] = levels
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': asdict(config),
+        'query_count': len(queries),
+        'targets': results,
+    }
+
+
+def save_results(results: Dict, output_dir: str = DEFAULT_OUTPUT_DIR) -> str:
+    """Write results to a timestamped JSON file and return its path."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"benchmark_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def load_results(path: str) -> Optional[Dict]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def latest_results(output_dir: str = DEFAULT_OUTPUT_DIR) -> Optional[Dict]:
+    """Most recent saved run, or None."""
+    if not os.path.isdir(output_dir):
+        return None
+    runs = sorted(n for n in os.listdir(output_dir) if n.startswith('benchmark_') and n.endswith('.json'))
+    return load_results(os.path.join(output_dir, runs[-1])) if runs else None
+
+
+def save_baseline(results: Dict, path: str = DEFAULT_BASELINE) -> str:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Flag stage percentiles that got slower than the baseline.
+
+    A regression needs to exceed both the relative threshold and
+    MIN_REGRESSION_MS, so sub-millisecond jitter on fast stages is ignored.
+
+    Returns:
+        List of regression dicts (stage, metric, baseline_ms, current_ms, change)
+    """
+    regressions = []
+    for stage in BENCHMARK_STAGES:
+        current = results['stages'].get(stage, {})
+        base = baseline.get('stages', {}).get(stage, {})
+
+        for p in (50, 95, 99):
+            key = f'p{p}_ms'
+            if key not in current or key not in base or base[key] <= 0:
+                continue
+
+            change = (current[key] - base[key]) / base[key]
+            if change > threshold and current[key] - base[key] > MIN_REGRESSION_MS:
+                regressions.append({
+                    'stage': stage,
+                    'metric': key,
+                    'baseline_ms': base[key],
+                    'current_ms': current[key],
+                    'change': change,
+                })
+    return regressions
+
+
+def _print_results(results: Dict, regressions: Optional[List[Dict]]):
+    config = results['config']
+    print(f"\n{results['query_count']} queries x {config['repetitions']} repetitions, "
+          f"concurrency {config['concurrency']}: {results['requests']} searches in "
+          f"{results['wall_time_s']:.2f}s ({results['throughput_qps']:.1f} qps)\n")
+
+    header = f"{'stage':<10}" + ''.join(f"{f'p{p}':>10}" for p in PERCENTILES) + f"{'mean':>10}"
+    print(header)
+    print('-' * len(header))
+    for stage, s in results['stages'].items():
+        if not s.get('count'):
+            continue
+        row = f"{stage:<10}" + ''.join(f"{s[f'p{p}_ms']:>10.2f}" for p in PERCENTILES)
+        print(row + f"{s['mean_ms']:>10.2f}")
+
+    if regressions is None:
+        return
+    if not regressions:
+        print("\n✓ No regressions against baseline")
+        return
+
+    print(f"\n✗ {len(regressions)} regression(s) against baseline:")
+    for r in regressions:
+        print(f"  {r['stage']} {r['metric']}: {r['baseline_ms']:.2f}ms -> "
+              f"{r['current_ms']:.2f}ms (+{r['change'] * 100:.0f}%)")
+
+
+def _print_http_results(results: Dict):
+    config = results['config']
+    print(f"\n{results['query_count']} queries, {config['requests']} requests per level\n")
+
+    header = f"{'url':<32}{'conc':>6}{'qps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'shed':>7}{'errors':>8}"
+    print(header)
+    print('-' * len(header))
+    for url, levels in results['targets'].items():
+        for level, s in levels.items():
+            latency = s['latency']
+            percentiles = ''.join(
+                f"{latency[key]:>10.1f}" if latency.get('count') else f"{'-':>10}"
+                for key in ('p50_ms', 'p95_ms', 'p99_ms')
+            )
+            print(f"{url[:31]:<32}{level:>6}{s['throughput_qps']:>10.1f}{percentiles}"
+                  f"{s['shed']:>7}{s['errors']:>8}")
+
+
+def create_parser():
+    """Create and configure the argument parser."""
+    parser = argparse.ArgumentParser(description="Hybrid search benchmark harness")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a benchmark")
+    run_parser.add_argument("--queries", "-q", default="default",
+                            help="Query set: default, test_cases, or a .txt/.json file")
+    run_parser.add_argument("--warmup", type=int, default=1, help="Unrecorded warmup passes (default: 1)")
+    run_parser.add_argument("--repetitions", "-n", type=int, default=5, help="Measured passes (default: 5)")
+    run_parser.add_argument("--concurrency", "-c", type=int, default=1, help="Concurrent searches (default: 1)")
+    run_parser.add_argument("--limit", type=int, default=10, help="Results per search (default: 10)")
+    run_parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Where to save results")
+    run_parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file to compare against")
+    run_parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="Relative slowdown that counts as a regression (default: 0.10)")
+
+    http_parser = subparsers.add_parser("http", help="Load-test /api/search on running servers")
+    http_parser.add_argument("--url", action="append", required=True,
+                             help="Server base URL (repeat to compare, e.g. the WSGI and ASGI deployments)")
+    http_parser.add_argument("--concurrency", "-c", default="1,8,32,128",
+                             help="Comma-separated concurrency levels (default: 1,8,32,128)")
+    http_parser.add_argument("--requests", "-n", type=int, default=200,
+                             help="Requests per URL and level (default: 200)")
+    http_parser.add_argument("--queries", "-q", default="default",
+                             help="Query set: default, test_cases, or a .txt/.json file")
+    http_parser.add_argument("--limit", type=int, default=10, help="Results per search (default: 10)")
+    http_parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds (default: 30)")
+    http_parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Where to save results")
+    return parser
+
+
+def http_main(args) -> int:
+    """Run the http subcommand; only test_cases needs the database."""
+    try:
+        concurrency = [int(level) for level in args.concurrency.split(',') if level.strip()]
+        if args.queries == 'test_cases':
+            from utils.database import create_cli_app
+            app = create_cli_app()
+            with app.app_context():
+                queries = load_queries(args.queries)
+        else:
+            queries = load_queries(args.queries)
+
+        config = HttpBenchmarkConfig(
+            urls=args.url,
+            concurrency=concurrency,
+            requests=args.requests,
+            queries=args.queries,
+            limit=args.limit,
+            timeout=args.timeout,
+        )
+        results = run_http_benchmark(config, queries)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"http_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    _print_http_results(results)
+    print(f"\nResults saved to: {path}")
+    return 0
+
+
+def main():
+    """Main entry point for the benchmark CLI."""
+    args = create_parser().parse_args()
+    if args.command == "http":
+        return http_main(args)
+
+    from utils.database import create_cli_app
+    app = create_cli_app()
+
+    config = BenchmarkConfig(
+        queries=args.queries,
+        warmup=args.warmup,
+        repetitions=args.repetitions,
+        concurrency=args.concurrency,
+        limit=args.limit,
+    )
+
+    try:
+        results = run_benchmark(app, config)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    path = save_results(results, args.output_dir)
+
+    baseline = load_results(args.baseline)
+    regressions = compare_to_baseline(results, baseline, args.threshold) if baseline else None
+    _print_results(results, regressions)
+    print(f"\nResults saved to: {path}")
+
+    if args.save_baseline:
+        print(f"Baseline saved to: {save_baseline(results, args.baseline)}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
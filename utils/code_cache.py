@@ -0,0 +1,60 @@
+"""
+Submission code normalization and validation caching.
+
+Model runs often resubmit the same hybrid_search with different
+whitespace, comments or docstrings. normalized_code_hash() hashes the AST
+with those differences removed, so equivalent submissions share a key;
+combined with the corpus version (utils/grading_fixtures.py) it identifies
+a grading result that can be reused.
+
+validate_code() caches AST security validation per source text, so
+repeated submissions skip parsing and walking the tree.
+"""
+
+import ast
+import hashlib
+from functools import lru_cache
+from typing import Tuple
+
+VALIDATION_CACHE_SIZE = 1024
+
+
+def _strip_docstrings(tree: ast.AST) -> ast.AST:
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        body = node.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            node.body = body[1:] or [ast.Pass()]
+    return tree
+
+
+def normalized_code_hash(code: str) -> str:
+    """
+    SHA-256 of the code's AST without positions, comments or docstrings.
+
+    Code that does not parse is hashed as raw text (it fails grading the
+    same way every time, so it is still a valid cache key).
+    """
+    try:
+        tree = _strip_docstrings(ast.parse(code))
+        canonical = 'ast:' + ast.dump(tree, annotate_fields=True, include_attributes=False)
+    except SyntaxError:
+        canonical = 'raw:' + code
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def validate_code(code: str) -> Tuple[str, ...]:
+    """
+    Security issues found by the grader's CodeValidator (empty if clean).
+    """
+    from app.core.grader import CodeValidator
+
+    validator = CodeValidator()
+    try:
+        validator.visit(ast.parse(code))
+    except SyntaxError as e:
+        return (f'SyntaxError: {e}',)
+    return tuple(validator.security_issues)
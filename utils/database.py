@@ -1,10 +1,32 @@
 """
 Database initialization module.
-Contains the SQLAlchemy database instance used throughout the application.
+Contains the SQLAlchemy database instance used throughout the application:
+app.models defines its models on it and the app factory binds it, so
+create_cli_app() and the web app share one instance.
 """
 
 from flask_sqlalchemy import SQLAlchemy
 
+from utils.db_routing import RoutingSession, configure_engines
+
 # Created by claude-sonnet-4-20250514 | 2025-10-05
-# Initialize SQLAlchemy database instance
-db = SQLAlchemy()
\ No newline at end of file
+# Initialize SQLAlchemy database instance (reads may route to a replica)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def create_cli_app(config_name='default'):
+    """
+    Create a minimal Flask app bound to db, for standalone CLI tools
+    (same setup as utils/schema_inspector.py main()).
+    """
+    from flask import Flask
+    from config import config_by_name
+
+    app = Flask(__name__)
+    app.config.from_object(config_by_name[config_name])
+    configure_engines(app.config)
+    db.init_app(app)
+
+    # Register the models on this app's metadata (app.models uses this db)
+    from app import models  # noqa: F401
+    return app
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Read/write routing between the primary and an optional read replica.
+
+Writes, and everything not explicitly marked, use the primary
+(SQLALCHEMY_DATABASE_URI). Views decorated with @replica_reads (search,
+listings, dashboards) run their ORM reads against the 'replica' bind
+(DATABASE_REPLICA_URL) through RoutingSession.get_bind(). A request stays
+on the primary when:
+
+- no replica is configured, or it is unreachable or lagging more than
+  DB_REPLICA_MAX_LAG seconds (checked at most every LAG_CHECK_INTERVAL)
+- the client wrote within the last DB_STICKY_SECONDS (read-your-writes:
+  a flush in any request stamps the Flask session, so the redirect after
+  an upload reads the new document from the primary)
+- the session has already flushed in this request, or the statement is
+  an INSERT/UPDATE/DELETE
+
+Each engine gets its own pool size / overflow / timeout settings and a
+TimedQueuePool, which records how long checkouts wait for a connection
+(db_pool_checkout_wait_seconds, plus db_pool_checkout_timeouts_total).
+
+Setup (factory):
+    configure_engines(app.config)      # before db.init_app(app)
+    db.init_app(app)
+    db_router.init_app(app)
+
+Check a two-instance setup:
+    python utils/db_routing.py check --concurrency 20
+"""
+
+import argparse
+import contextvars
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Dict, Optional
+
+# Handle both direct execution and module imports
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import g, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, exc as sa_exc, text
+from sqlalchemy.pool import QueuePool
+
+from utils.latency import LatencyHistogram
+from utils.metrics import metrics
+
+REPLICA_BIND = 'replica'
+PRIMARY = 'primary'
+
+# Defaults, overridable through app.config
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_TIMEOUT = 30
+DEFAULT_POOL_RECYCLE = 1800
+DEFAULT_STICKY_SECONDS = 10
+DEFAULT_MAX_LAG = 5.0
+LAG_CHECK_INTERVAL = 5.0
+
+STICKY_KEY = 'db_primary_until'
+
+# Millisecond buckets for checkout waits: most are ~0, the tail is what matters
+WAIT_BUCKETS_MS = (0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 30000)
+
+pool_wait = metrics.histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting for a pooled connection, by engine',
+    WAIT_BUCKETS_MS
+)
+pool_timeouts = metrics.counter(
+    'db_pool_checkout_timeouts_total',
+    'Connection checkouts that hit the pool timeout, by engine'
+)
+read_routing = metrics.counter(
+    'db_read_routing_total',
+    'Replica-eligible requests by target and reason'
+)
+
+# Target for the current request/task: None (primary) or REPLICA_BIND
+_read_target: contextvars.ContextVar = contextvars.ContextVar('db_read_target', default=None)
+
+# Run on the replica: seconds behind, 0 when it has replayed everything it
+# received (an idle primary would otherwise look like growing lag)
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records checkout wait time (including connects when the pool grows)."""
+
+    label = PRIMARY
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            pool_timeouts.inc({'engine': self.label})
+            raise
+        finally:
+            pool_wait.observe((time.perf_counter() - start) * 1000, {'engine': self.label})
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.label = self.label
+        return pool
+
+
+def _engine_options(config, prefix: str) -> Dict:
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get(f'{prefix}_POOL_SIZE', DEFAULT_POOL_SIZE),
+        'max_overflow': config.get(f'{prefix}_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW),
+        'pool_timeout': config.get(f'{prefix}_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+        'pool_recycle': config.get(f'{prefix}_POOL_RECYCLE', DEFAULT_POOL_RECYCLE),
+        'pool_pre_ping': True,
+    }
+
+
+def configure_engines(config):
+    """
+    Per-engine pool settings (DB_* for the primary, DB_REPLICA_* for the
+    replica) and the 'replica' bind. Call before db.init_app(app).
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    for key, value in _engine_options(config, 'DB').items():
+        options.setdefault(key, value)
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    replica_url = config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = {'url': replica_url, **_engine_options(config, 'DB_REPLICA')}
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+class RoutingSession(FlaskSession):
+    """Flask-SQLAlchemy session that sends marked reads to the replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and _read_target.get() == REPLICA_BIND
+            and not self._flushing
+            and not self.info.get('wrote')
+            and not getattr(clause, 'is_dml', False)
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_write(session, flush_context):
+    """Pin the rest of this session, and this client for a while, to the primary."""
+    session.info['wrote'] = True
+    if has_request_context():
+        g.db_wrote = True
+
+
+class DatabaseRouter:
+    """
+    Flask extension: replica health, read-your-writes stickiness, engine labels.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.sticky_seconds = DEFAULT_STICKY_SECONDS
+        self.max_lag = DEFAULT_MAX_LAG
+
+        self._lock = threading.Lock()
+        self._lag = None
+        self._lag_checked = 0.0
+        self._healthy = True
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read configuration, label pools and register the stickiness hook."""
+        self.app = app
+        self.sticky_seconds = app.config.get('DB_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+        self.max_lag = app.config.get('DB_REPLICA_MAX_LAG', DEFAULT_MAX_LAG)
+
+        with app.app_context():
+            for key, engine in self._db.engines.items():
+                engine.pool.label = key or PRIMARY
+
+        @app.after_request
+        def _stick_after_write(response):
+            if g.pop('db_wrote', False) and self.sticky_seconds:
+                flask_session[STICKY_KEY] = time.time() + self.sticky_seconds
+            return response
+
+        app.extensions['db_router'] = self
+
+    @property
+    def _db(self):
+        return self.app.extensions['sqlalchemy']
+
+    def replica_engine(self):
+        return self._db.engines.get(REPLICA_BIND)
+
+    def replica_lag(self, force: bool = False) -> Optional[float]:
+        """Seconds behind the primary (cached); None if unknown or not a replica."""
+        now = time.monotonic()
+        if not force and now - self._lag_checked < LAG_CHECK_INTERVAL:
+            return self._lag
+        if not self._lock.acquire(blocking=force):
+            return self._lag
+        try:
+            engine = self.replica_engine()
+            if engine is None:
+                return None
+            try:
+                with engine.connect() as conn:
+                    lag = conn.execute(text(LAG_SQL)).scalar()
+                self._lag = float(lag) if lag is not None else None
+                self._healthy = True
+            except Exception as e:
+                self._healthy = False
+                self.app.logger.warning(f'Read replica check failed: {e}')
+            self._lag_checked = now
+            return self._lag
+        finally:
+            self._lock.release()
+
+    def choose(self) -> str:
+        """Target for a replica-eligible request, counted by reason."""
+        target, reason = REPLICA_BIND, 'replica'
+        if self.replica_engine() is None:
+            target, reason = PRIMARY, 'unconfigured'
+        elif flask_session.get(STICKY_KEY, 0) > time.time():
+            target, reason = PRIMARY, 'sticky'
+        else:
+            lag = self.replica_lag()
+            if not self._healthy:
+                target, reason = PRIMARY, 'unavailable'
+            elif self.max_lag and lag is not None and lag > self.max_lag:
+                target, reason = PRIMARY, 'lag'
+        read_routing.inc({'target': target, 'reason': reason})
+        return target
+
+    def stats(self) -> Dict:
+        """Pool state per engine plus replica health."""
+        with self.app.app_context():
+            engines = {}
+            for key, engine in self._db.engines.items():
+                pool = engine.pool
+                engines[key or PRIMARY] = {
+                    state: getattr(pool, state)() for state in ('size', 'checkedin', 'checkedout', 'overflow')
+                    if callable(getattr(pool, state, None))
+                }
+        return {'engines': engines, 'replica_lag': self._lag, 'replica_healthy': self._healthy}
+
+
+def replica_reads(view):
+    """Run a read-only view's queries on the replica when it is safe to."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if db_router.app is None or db_router.choose() != REPLICA_BIND:
+            return view(*args, **kwargs)
+        token = _read_target.set(REPLICA_BIND)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _read_target.reset(token)
+    return wrapper
+
+
+# Shared instance, bound to the app in the factory
+db_router = DatabaseRouter()
+
+
+# ---------------------------------------------------------------------------
+# check CLI
+# ---------------------------------------------------------------------------
+
+def _describe(engine) -> Dict:
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            "SELECT current_setting('server_version'), pg_is_in_recovery(), "
+            "coalesce(inet_server_addr()::text, 'local'), inet_server_port(), current_database()"
+        )).one()
+    pool = engine.pool
+    return {
+        'version': row[0], 'in_recovery': row[1], 'address': f'{row[2]}:{row[3]}', 'database': row[4],
+        'pool': f"size={pool.size()} overflow={getattr(pool, '_max_overflow', '?')} "
+                f"timeout={getattr(pool, '_timeout', '?')}s ({type(pool).__name__})",
+    }
+
+
+def _probe_pool(engine, concurrency: int, checkouts: int, hold: float) -> Dict:
+    """Concurrent checkouts against one engine; wait percentiles in ms."""
+    histogram = LatencyHistogram(WAIT_BUCKETS_MS)
+
+    def one(_):
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            histogram.observe((time.perf_counter() - start) * 1000)
+            conn.execute(text("SELECT pg_sleep(:hold)"), {'hold': hold})
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(checkouts)))
+    return histogram.snapshot()
+
+
+def check(app, db, concurrency: int = 10, checkouts: int = 100, hold: float = 0.05) -> Dict:
+    """Describe both engines, verify routing and measure checkout waits."""
+    router = app.extensions['db_router']
+    result = {'engines': {}, 'routing': {}, 'pool_wait_ms': {}, 'warnings': []}
+    for key, engine in db.engines.items():
+        result['engines'][key or PRIMARY] = _describe(engine)
+
+    replica = result['engines'].get(REPLICA_BIND)
+    if replica is None:
+        result['warnings'].append('DATABASE_REPLICA_URL is not set: every query uses the primary')
+    else:
+        if not replica['in_recovery']:
+            result['warnings'].append('replica is not in recovery: fine for routing tests, but writes will not replicate')
+        if replica['address'] == result['engines'][PRIMARY]['address'] and \
+                replica['database'] == result['engines'][PRIMARY]['database']:
+            result['warnings'].append('replica and primary are the same server and database')
+        result['replica_lag_s'] = router.replica_lag(force=True)
+
+    probe = text("SELECT inet_server_port(), pg_is_in_recovery()")
+    token = _read_target.set(REPLICA_BIND)
+    try:
+        result['routing']['marked read'] = tuple(db.session.execute(probe).one())
+        db.session.info['wrote'] = True
+        result['routing']['after a write'] = tuple(db.session.execute(probe).one())
+    finally:
+        _read_target.reset(token)
+        db.session.rollback()
+        db.session.info.pop('wrote', None)
+    result['routing']['unmarked'] = tuple(db.session.execute(probe).one())
+    db.session.rollback()
+
+    for key, engine in db.engines.items():
+        result['pool_wait_ms'][key or PRIMARY] = _probe_pool(engine, concurrency, checkouts, hold)
+    return result
+
+
+def main():
+    """Main entry point for the routing check CLI."""
+    parser = argparse.ArgumentParser(description="Primary/replica routing and pool checks")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    check_parser = subparsers.add_parser("check", help="Describe engines, verify routing, measure pool waits")
+    check_parser.add_argument("--concurrency", type=int, default=10, help="Concurrent checkouts (default: 10)")
+    check_parser.add_argument("--checkouts", type=int, default=100, help="Total checkouts per engine (default: 100)")
+    check_parser.add_argument("--hold", type=float, default=0.05, help="Seconds each connection is held (default: 0.05)")
+    args = parser.parse_args()
+
+    from utils.database import create_cli_app, db
+    app = create_cli_app()
+    db_router.init_app(app)
+
+    with app.app_context():
+        try:
+            result = check(app, db, args.concurrency, args.checkouts, args.hold)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    for name, info in result['engines'].items():
+        role = 'replica (in recovery)' if info['in_recovery'] else 'primary (read-write)'
+        print(f"✓ {name:<8} {info['address']}/{info['database']}  PostgreSQL {info['version']}  {role}")
+        print(f"  pool: {info['pool']}")
+    if 'replica_lag_s' in result:
+        lag = result['replica_lag_s']
+        print(f"  replica lag: {'n/a' if lag is None else f'{lag:.2f}s'}")
+    print("Routing (server port, in recovery):")
+    for case, (port, in_recovery) in result['routing'].items():
+        print(f"  {case:<14} -> port {port}{' (replica)' if in_recovery else ''}")
+    print(f"Checkout wait ({args.concurrency} concurrent, {args.checkouts} checkouts, hold {args.hold}s):")
+    for name, snapshot in result['pool_wait_ms'].items():
+        print(f"  {name:<8} p50 {snapshot['p50_ms']:.2f}ms  p95 {snapshot['p95_ms']:.2f}ms  "
+              f"p99 {snapshot['p99_ms']:.2f}ms  max {snapshot['max_ms']:.2f}ms")
+    for warning in result['warnings']:
+        print(f"! {warning}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Full document text in document_contents, off the hot documents table.
+
+documents keeps the narrow columns every listing, stats query and search
+leg reads (title, category, snippet, content_length, embedding,
+ts_vector); the full text lives in document_contents keyed by document id
+and is only read by document_detail (Document.content, loaded lazily) and
+by reindexing (ts_vector and embeddings recomputed from the side table).
+
+Usage:
+    python utils/document_content.py migrate                 # one-off: move documents.content
+    python utils/document_content.py migrate --vacuum-full   # also compact the documents heap
+    python utils/document_content.py reindex [--embeddings]  # recompute ts_vector (and embeddings)
+    python utils/document_content.py status
+
+migrate copies content in id-range batches, fills snippet and
+content_length, then drops documents.content (--keep-column only drops its
+NOT NULL so an old app version can keep running during the rollout).
+Dropping the column does not shrink the heap; VACUUM FULL (or pg_repack)
+does, and takes an exclusive lock for its duration.
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, Optional
+
+# Handle both direct execution and module imports
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from utils.database import db
+
+TABLE = 'document_contents'
+DEFAULT_BATCH_ROWS = 5000
+EMBED_BATCH_ROWS = 256
+
+# Keep in step with SNIPPET_LENGTH and Document.content in app/models.py
+SNIPPET_LENGTH = 300
+
+# Same preview as Document.content's setter: whitespace collapsed, first 300 chars
+SNIPPET_SQL = f"left(regexp_replace(btrim(left({{column}}, {SNIPPET_LENGTH * 2})), '\\s+', ' ', 'g'), {SNIPPET_LENGTH})"
+
+CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        document_id integer PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE,
+        content text NOT NULL
+    )
+"""
+
+ADD_COLUMNS_SQL = f"""
+    ALTER TABLE documents
+        ADD COLUMN IF NOT EXISTS snippet varchar({SNIPPET_LENGTH}),
+        ADD COLUMN IF NOT EXISTS content_length integer
+"""
+
+COPY_BATCH_SQL = f"""
+    INSERT INTO {TABLE} (document_id, content)
+    SELECT id, content FROM documents
+    WHERE id BETWEEN :low AND :high AND content IS NOT NULL
+    ON CONFLICT (document_id) DO UPDATE SET content = EXCLUDED.content
+"""
+
+PREVIEW_BATCH_SQL = f"""
+    UPDATE documents d
+    SET snippet = {SNIPPET_SQL.format(column='c.content')}, content_length = length(c.content)
+    FROM {TABLE} c
+    WHERE c.document_id = d.id AND d.id BETWEEN :low AND :high
+"""
+
+TS_VECTOR_BATCH_SQL = f"""
+    UPDATE documents d
+    SET ts_vector = to_tsvector('english', c.content)
+    FROM {TABLE} c
+    WHERE c.document_id = d.id AND d.id BETWEEN %(low)s AND %(high)s
+"""
+
+
+def make_snippet(content: str) -> str:
+    """Python twin of SNIPPET_SQL, for loaders that bypass the ORM."""
+    return ' '.join(content[:SNIPPET_LENGTH * 2].split())[:SNIPPET_LENGTH]
+
+
+def has_inline_content(conn) -> bool:
+    """True while documents still carries the content column."""
+    return bool(conn.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'documents' AND column_name = 'content'"
+    )).scalar())
+
+
+def _id_range(conn):
+    return conn.execute(text("SELECT coalesce(min(id), 0), coalesce(max(id), -1) FROM documents")).one()
+
+
+def _id_batches(low: int, high: int, size: int):
+    for start in range(low, high + 1, size):
+        yield start, min(start + size - 1, high)
+
+
+def migrate(engine, batch_rows: int = DEFAULT_BATCH_ROWS, keep_column: bool = False,
+            vacuum_full: bool = False, log=print) -> Dict:
+    """Create document_contents, copy content across and narrow documents."""
+    with engine.begin() as conn:
+        conn.execute(text(CREATE_SQL))
+        conn.execute(text(ADD_COLUMNS_SQL))
+        if not has_inline_content(conn):
+            return {'migrated': False, 'rows': 0}
+        low, high = _id_range(conn)
+
+    # One transaction per batch keeps locks short and WAL bursts bounded
+    rows = 0
+    for batch_low, batch_high in _id_batches(low, high, batch_rows):
+        with engine.begin() as conn:
+            params = {'low': batch_low, 'high': batch_high}
+            rows += conn.execute(text(COPY_BATCH_SQL), params).rowcount
+            conn.execute(text(PREVIEW_BATCH_SQL), params)
+        log(f"  copied ids {batch_low:,}-{batch_high:,} ({rows:,} rows)")
+
+    with engine.begin() as conn:
+        # Rows written by the old app version since their batch was copied
+        rows += conn.execute(text(
+            f"INSERT INTO {TABLE} (document_id, content) "
+            f"SELECT d.id, d.content FROM documents d "
+            f"WHERE d.content IS NOT NULL AND NOT EXISTS "
+            f"(SELECT 1 FROM {TABLE} c WHERE c.document_id = d.id)"
+        )).rowcount
+        conn.execute(text(
+            f"UPDATE documents d SET snippet = {SNIPPET_SQL.format(column='c.content')}, "
+            f"content_length = length(c.content) FROM {TABLE} c "
+            f"WHERE c.document_id = d.id AND d.content_length IS NULL"
+        ))
+        if keep_column:
+            conn.execute(text("ALTER TABLE documents ALTER COLUMN content DROP NOT NULL"))
+        else:
+            conn.execute(text("ALTER TABLE documents DROP COLUMN content"))
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if vacuum_full and not keep_column:
+            log("  VACUUM FULL documents (exclusive lock)...")
+            conn.execute(text("VACUUM FULL documents"))
+        conn.execute(text("ANALYZE documents"))
+        conn.execute(text(f"ANALYZE {TABLE}"))
+
+    return {'migrated': True, 'rows': rows, 'dropped_column': not keep_column, 'vacuumed': vacuum_full and not keep_column}
+
+
+def reindex(raw_conn, embeddings: bool = False, batch_rows: int = DEFAULT_BATCH_ROWS,
+            ids: Optional[range] = None, log=print) -> Dict:
+    """
+    Recompute ts_vector (and optionally embeddings) from document_contents.
+
+    Works in id-range batches on a raw DBAPI connection; only the batch
+    being embedded has its content in memory.
+    """
+    with raw_conn.cursor() as cur:
+        if ids is None:
+            cur.execute("SELECT coalesce(min(id), 0), coalesce(max(id), -1) FROM documents")
+            low, high = cur.fetchone()
+        else:
+            low, high = ids.start, ids.stop - 1
+
+    result = {'ts_vectors': 0, 'embeddings': 0}
+    for batch_low, batch_high in _id_batches(low, high, batch_rows):
+        with raw_conn.cursor() as cur:
+            cur.execute(TS_VECTOR_BATCH_SQL, {'low': batch_low, 'high': batch_high})
+            result['ts_vectors'] += cur.rowcount
+        raw_conn.commit()
+        if embeddings:
+            result['embeddings'] += _reembed(raw_conn, batch_low, batch_high)
+        log(f"  reindexed ids {batch_low:,}-{batch_high:,}")
+    return result
+
+
+def _reembed(raw_conn, low: int, high: int) -> int:
+    from app.core.embeddings import generate_embeddings_batch
+
+    with raw_conn.cursor() as cur:
+        cur.execute(
+            f"SELECT document_id, content FROM {TABLE} "
+            "WHERE document_id BETWEEN %s AND %s ORDER BY document_id",
+            (low, high)
+        )
+        rows = cur.fetchall()
+    for start in range(0, len(rows), EMBED_BATCH_ROWS):
+        chunk = rows[start:start + EMBED_BATCH_ROWS]
+        vectors = generate_embeddings_batch([content for _, content in chunk])
+        with raw_conn.cursor() as cur:
+            cur.executemany(
+                "UPDATE documents SET embedding = %s::vector WHERE id = %s",
+                [('[' + ','.join(repr(float(x)) for x in vector) + ']', doc_id)
+                 for (doc_id, _), vector in zip(chunk, vectors)]
+            )
+        raw_conn.commit()
+    return len(rows)
+
+
+def status(conn) -> Dict:
+    """Migration state and the size split between documents and document_contents."""
+    inline = has_inline_content(conn)
+    side_table = conn.execute(text("SELECT to_regclass(:name)"), {'name': TABLE}).scalar() is not None
+    result = {
+        'inline_content': inline,
+        'side_table': side_table,
+        'documents_bytes': conn.execute(text("SELECT pg_total_relation_size('documents')")).scalar(),
+        'documents_heap_bytes': conn.execute(text("SELECT pg_relation_size('documents')")).scalar(),
+        'documents': conn.execute(text("SELECT count(*) FROM documents")).scalar(),
+    }
+    if side_table:
+        result['contents_bytes'] = conn.execute(text(f"SELECT pg_total_relation_size('{TABLE}')")).scalar()
+        result['missing'] = conn.execute(text(
+            f"SELECT count(*) FROM documents d WHERE NOT EXISTS "
+            f"(SELECT 1 FROM {TABLE} c WHERE c.document_id = d.id)"
+        )).scalar()
+    return result
+
+
+def main():
+    """Main entry point for the document content CLI."""
+    parser = argparse.ArgumentParser(description="Document content side table: migrate, reindex, status")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Move documents.content into document_contents")
+    migrate_parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS,
+                                help=f"Documents per copy batch (default: {DEFAULT_BATCH_ROWS})")
+    migrate_parser.add_argument("--keep-column", action="store_true",
+                                help="Keep documents.content (nullable) for a staged rollout")
+    migrate_parser.add_argument("--vacuum-full", action="store_true",
+                                help="VACUUM FULL documents afterwards (exclusive lock)")
+    reindex_parser = subparsers.add_parser("reindex", help="Recompute ts_vector from document_contents")
+    reindex_parser.add_argument("--embeddings", action="store_true", help="Recompute embeddings as well")
+    reindex_parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS,
+                                help=f"Documents per batch (default: {DEFAULT_BATCH_ROWS})")
+    subparsers.add_parser("status", help="Show migration state and table sizes")
+    args = parser.parse_args()
+
+    from utils.database import create_cli_app
+    app = create_cli_app()
+
+    with app.app_context():
+        try:
+            if args.command == "migrate":
+                result = migrate(db.engine, args.batch_rows, args.keep_column, args.vacuum_full)
+            elif args.command == "reindex":
+                raw_conn = db.engine.raw_connection()
+                try:
+                    result = reindex(raw_conn, args.embeddings, args.batch_rows)
+                finally:
+                    raw_conn.close()
+                # Raw UPDATEs bypass the ORM counter hooks; rebuild from the table
+                from utils.stat_counters import reconcile
+                reconcile(['documents'])
+            else:
+                with db.engine.connect() as conn:
+                    result = status(conn)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    if args.command == "migrate":
+        if result['migrated']:
+            print(f"✓ Moved content for {result['rows']:,} documents into {TABLE}")
+            print(f"✓ documents.content {'dropped' if result['dropped_column'] else 'kept (nullable)'}"
+                  f"{', heap compacted' if result['vacuumed'] else ''}")
+        else:
+            print("documents.content already moved")
+    elif args.command == "reindex":
+        print(f"✓ Recomputed ts_vector for {result['ts_vectors']:,} documents")
+        if args.embeddings:
+            print(f"✓ Recomputed {result['embeddings']:,} embeddings")
+    else:
+        print(f"Inline content column: {result['inline_content']}")
+        print(f"{TABLE}: {'present' if result['side_table'] else 'missing'}")
+        print(f"documents: {result['documents']:,} rows, heap {result['documents_heap_bytes']:,} bytes, "
+              f"total {result['documents_bytes']:,} bytes")
+        if result['side_table']:
+            print(f"{TABLE}: {result['contents_bytes']:,} bytes, {result['missing']:,} documents without content")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Single-pass document enrichment: category, type and topic.
+
+One Aho-Corasick automaton holds every classification pattern (code
+syntax and keywords, per-topic vocabulary, multi-word ML phrases). A
+document is scanned once, in chunks of CHUNK_CHARS, with the automaton
+state carried across chunk boundaries; each chunk is lowercased and
+tokenized (words and single punctuation characters) on its own, so a
+10 MB upload is never copied whole. The automaton runs over tokens rather
+than characters: patterns are token sequences ('neural network',
+'= >'), and the per-step work happens in Python only once per token.
+
+From the hit counts:
+    type      'code' when weighted code hits reach CODE_DENSITY per token,
+              else 'prose'
+    topic     the topic with the most hits (at least TOPIC_MIN_HITS), else None
+    category  'code_snippets' for code, else the topic's category
+              ('ml_concepts' or 'general_knowledge')
+
+Topics, their categories and vocabularies are the ones the synthetic
+corpus generator labels documents with (utils/synthetic_corpus.py
+TOPICS), so generated corpora can be used to check the classifier.
+
+Usage:
+    python utils/enrichment.py backfill               # rows without type/topic
+    python utils/enrichment.py backfill --all --recategorize --workers 4
+    python utils/enrichment.py status
+"""
+
+import argparse
+import os
+import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Handle both direct execution and module imports
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import db
+from utils.synthetic_corpus import TOPICS
+
+CHUNK_CHARS = 1 << 20
+CODE_DENSITY = 0.05
+TOPIC_MIN_HITS = 3
+DEFAULT_BATCH_ROWS = 1000
+
+CODE_CATEGORY = 'code_snippets'
+DEFAULT_CATEGORY = 'general_knowledge'
+
+# Extensions that are code regardless of content
+CODE_EXTENSIONS = {'py', 'js', 'ts', 'sql', 'java', 'c', 'cpp', 'go', 'rs', 'rb', 'sh'}
+
+# (pattern, weight): syntax carries most of the weight; keywords that are
+# also ordinary words in prose about programming ('function', 'class')
+# are left out
+CODE_PATTERNS = [
+    ('def', 1.0), ('import', 0.5), ('return', 1.0), ('const', 1.0), ('var', 0.5),
+    ('yield', 1.0), ('self .', 1.0), ('__init__', 1.0), ('order by', 1.0), ('insert into', 1.0),
+    ('(', 0.25), (')', 0.25), ('[', 0.25), (']', 0.25), (':', 0.25), ('=', 0.5),
+    ('{', 0.5), ('}', 0.5), (';', 0.5), ('= >', 1.0), ('- >', 1.0), ('= =', 1.0), ('! =', 1.0),
+]
+
+# Multi-word phrases the old infer_category looked for, beyond the topic words
+ML_PHRASES = [
+    'neural network', 'machine learning', 'deep learning', 'classification',
+    'algorithm', 'backpropagation', 'embedding', 'transformer', 'attention',
+]
+
+_TOKEN = re.compile(r'\w+|[^\w\s]')
+_SPACE = re.compile(r'\s')
+
+
+class PatternMatcher:
+    """Aho-Corasick automaton over token sequences."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, float]]] = [[]]
+        self._built = False
+
+    def add(self, phrase: str, label: str, weight: float = 1.0):
+        state = 0
+        for token in _TOKEN.findall(phrase.lower()):
+            if token not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][token] = len(self._goto) - 1
+            state = self._goto[state][token]
+        self._out[state].append((label, weight))
+        self._built = False
+
+    def build(self):
+        """Failure links (breadth first); outputs include those of the fail chain."""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        for state in queue:
+            for token, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._built = True
+
+    def scan(self, chunks: Iterable[str]) -> Tuple[Dict[str, float], int]:
+        """
+        Weighted hits per label over the concatenated chunks.
+
+        Returns:
+            (label -> weighted hits, token count)
+        """
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        hits: Dict[str, float] = defaultdict(float)
+        tokens = 0
+        state = 0
+        for chunk in chunks:
+            chunk_tokens = _TOKEN.findall(chunk.lower())
+            tokens += len(chunk_tokens)
+            for token in chunk_tokens:
+                if state == 0 and token not in root:
+                    continue
+                while state and token not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(token, 0)
+                for label, weight in out[state]:
+                    hits[label] += weight
+        return hits, tokens
+
+
+def iter_chunks(content: str, size: int = CHUNK_CHARS) -> Iterable[str]:
+    """Slices of about size characters, cut at whitespace so no token is split."""
+    start = 0
+    while start < len(content):
+        end = start + size
+        if end < len(content):
+            space = _SPACE.search(content, end)
+            end = space.start() if space else len(content)
+        yield content[start:end]
+        start = end
+
+
+def _build_matcher() -> PatternMatcher:
+    matcher = PatternMatcher()
+    for pattern, weight in CODE_PATTERNS:
+        matcher.add(pattern, 'code', weight)
+    for topic, (_, vocabulary) in TOPICS.items():
+        for word in vocabulary:
+            matcher.add(word, f'topic:{topic}')
+    for phrase in ML_PHRASES:
+        matcher.add(phrase, 'topic:machine_learning')
+    matcher.build()
+    return matcher
+
+
+_matcher = _build_matcher()
+
+
+@dataclass
+class Enrichment:
+    """Classification of one document."""
+
+    category: str
+    type: str
+    topic: Optional[str] = None
+    topic_hits: Dict[str, float] = field(default_factory=dict)
+    tokens: int = 0
+
+
+def enrich(content: str, filename: Optional[str] = None) -> Enrichment:
+    """Classify a document in one scan of its content."""
+    hits, tokens = _matcher.scan(iter_chunks(content))
+
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    is_code = extension in CODE_EXTENSIONS or (tokens and hits.get('code', 0.0) / tokens >= CODE_DENSITY)
+
+    topic_hits = {label.split(':', 1)[1]: count for label, count in hits.items() if label.startswith('topic:')}
+    topic = None
+    if topic_hits:
+        best = max(topic_hits, key=topic_hits.get)
+        if topic_hits[best] >= TOPIC_MIN_HITS:
+            topic = best
+
+    if is_code:
+        category = CODE_CATEGORY
+    elif topic:
+        category = TOPICS[topic][0]
+    else:
+        category = DEFAULT_CATEGORY
+
+    return Enrichment(category=category, type='code' if is_code else 'prose', topic=topic,
+                      topic_hits=topic_hits, tokens=tokens)
+
+
+def enrich_rows(rows: Sequence[Dict]) -> int:
+    """Fill category/type/topic where missing (bulk loader rows); returns rows enriched."""
+    enriched = 0
+    for row in rows:
+        if row.get('category') and row.get('type') and 'topic' in row:
+            continue
+        result = enrich(row['content'], row.get('file_path'))
+        row['category'] = row.get('category') or result.category
+        row['type'] = row.get('type') or result.type
+        row['topic'] = row.get('topic') or result.topic
+        enriched += 1
+    return enriched
+
+
+# ---------------------------------------------------------------------------
+# Backfill and status
+# ---------------------------------------------------------------------------
+
+def _enrich_item(item: Tuple[int, str, Optional[str]]) -> Tuple[int, Dict]:
+    doc_id, content, file_path = item
+    result = asdict(enrich(content, file_path))
+    return doc_id, {key: result[key] for key in ('category', 'type', 'topic')}
+
+
+def backfill(raw_conn, batch_rows: int = DEFAULT_BATCH_ROWS, all_rows: bool = False,
+             recategorize: bool = False, workers: int = 1, log=print) -> Dict:
+    """
+    Enrich existing documents in id-ordered batches.
+
+    Only rows without a type are touched unless all_rows; category is only
+    filled where NULL unless recategorize (uploads may carry a chosen one).
+    """
+    from psycopg2.extras import execute_values
+
+    category_sql = 'v.category' if recategorize else 'coalesce(d.category, v.category)'
+    result = {'enriched': 0, 'by_type': defaultdict(int)}
+    last_id = 0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while True:
+            with raw_conn.cursor() as cur:
+                cur.execute(
+                    "SELECT d.id, c.content, d.file_path FROM documents d "
+                    "JOIN document_contents c ON c.document_id = d.id "
+                    f"WHERE d.id > %s {'' if all_rows else 'AND d.type IS NULL'} "
+                    "ORDER BY d.id LIMIT %s",
+                    (last_id, batch_rows)
+                )
+                items = cur.fetchall()
+                if not items:
+                    break
+                enriched = pool.map(_enrich_item, items, chunksize=16) if pool else map(_enrich_item, items)
+                values = [(doc_id, e['category'], e['type'], e['topic']) for doc_id, e in enriched]
+                execute_values(
+                    cur,
+                    f"UPDATE documents d SET category = {category_sql}, type = v.type, topic = v.topic "
+                    "FROM (VALUES %s) AS v(id, category, type, topic) WHERE d.id = v.id",
+                    values
+                )
+            raw_conn.commit()
+
+            result['enriched'] += len(values)
+            for _, _, doc_type, _ in values:
+                result['by_type'][doc_type] += 1
+            last_id = items[-1][0]
+            log(f"  {result['enriched']:,} documents enriched")
+    finally:
+        if pool:
+            pool.shutdown()
+    return result
+
+
+def status(raw_conn) -> List[Tuple]:
+    with raw_conn.cursor() as cur:
+        cur.execute(
+            "SELECT coalesce(type, '-'), coalesce(topic, '-'), count(*) FROM documents "
+            "GROUP BY 1, 2 ORDER BY 1, 3 DESC"
+        )
+        return cur.fetchall()
+
+
+def main():
+    """Main entry point for the enrichment CLI."""
+    parser = argparse.ArgumentParser(description="Document category/type/topic enrichment")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Enrich existing documents")
+    backfill_parser.add_argument("--all", action="store_true", help="Re-enrich every document, not just unclassified")
+    backfill_parser.add_argument("--recategorize", action="store_true",
+                                 help="Overwrite existing categories (default: fill NULL only)")
+    backfill_parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS,
+                                 help=f"Documents per batch (default: {DEFAULT_BATCH_ROWS})")
+    backfill_parser.add_argument("--workers", type=int, default=1, help="Classifier processes (default: 1)")
+    subparsers.add_parser("status", help="Show documents by type and topic")
+    args = parser.parse_args()
+
+    from utils.database import create_cli_app
+    app = create_cli_app()
+
+    with app.app_context():
+        raw_conn = db.engine.raw_connection()
+        try:
+            if args.command == "backfill":
+                result = backfill(raw_conn, args.batch_rows, args.all, args.recategorize, args.workers)
+                # Category changes bypass the ORM counter hooks
+                from utils.stat_counters import reconcile
+                reconcile(['documents'])
+                print(f"✓ Enriched {result['enriched']:,} documents")
+                for doc_type, count in sorted(result['by_type'].items()):
+                    print(f"  {doc_type:<8} {count:,}")
+            else:
+                for doc_type, topic, count in status(raw_conn):
+                    print(f"  {doc_type:<8} {topic:<20} {count:,}")
+        except Exception as e:
+            raw_conn.rollback()
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        finally:
+            raw_conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Precomputed retrieval fixtures for grading.
+
+Grading used to re-embed every TestCase query and re-run both candidate
+queries for every submission. The candidate lists only change when
+documents or test cases change, so they are snapshotted once per corpus
+version and served from memory:
+
+- corpus_versions holds a counter per source table. An ORM after_flush
+  hook bumps it whenever a Document or TestCase is inserted, updated or
+  deleted; utils/bulk_load.py bumps it explicitly after COPY.
+- GradingFixtures.get() compares the cached snapshot's version against the
+  table at most every GRADING_FIXTURE_CHECK_INTERVAL seconds and rebuilds
+  (or reloads from GRADING_FIXTURE_DIR) only when it changed.
+- Sandbox workers receive each snapshot once and keep it, so a grading
+  task carries only the code and a test case id.
+
+Usage:
+    grading_fixtures = GradingFixtures()
+    grading_fixtures.init_app(app)
+    fixtures = grading_fixtures.get()
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.models import CorpusVersion, Document, TestCase, db
+
+# Defaults, overridable through app.config
+DEFAULT_CHECK_INTERVAL = 5.0  # seconds between version checks
+
+VERSIONED_MODELS = {
+    Document: 'documents',
+    TestCase: 'test_cases',
+}
+
+BUMP_VERSION_SQL = text(
+    "INSERT INTO corpus_versions (name, version, updated_at) VALUES (:name, 1, now()) "
+    "ON CONFLICT (name) DO UPDATE SET version = corpus_versions.version + 1, updated_at = now()"
+)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_corpus_versions(session, flush_context):
+    """Bump the version of every versioned table touched by this flush."""
+    changed = set()
+    for obj in list(session.new) + list(session.deleted):
+        name = VERSIONED_MODELS.get(type(obj))
+        if name:
+            changed.add(name)
+    for obj in session.dirty:
+        name = VERSIONED_MODELS.get(type(obj))
+        if name and session.is_modified(obj):
+            changed.add(name)
+
+    connection = session.connection()
+    for name in sorted(changed):
+        connection.execute(BUMP_VERSION_SQL, {'name': name})
+
+
+def corpus_version() -> str:
+    """Current combined version, e.g. 'd12-t3'."""
+    versions = dict(db.session.query(CorpusVersion.name, CorpusVersion.version).all())
+    return f"d{versions.get('documents', 0)}-t{versions.get('test_cases', 0)}"
+
+
+@dataclass
+class FixtureSet:
+    """Candidate lists and expected rankings for every test case."""
+
+    version: str
+    cases: List[Dict]
+    built_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec='seconds'))
+    build_time: float = 0.0
+
+    def worker_payload(self) -> Dict:
+        """What sandbox workers keep: {test_id: [vector, keyword]}."""
+        return {str(case['test_id']): [case['vector'], case['keyword']] for case in self.cases}
+
+
+def build_fixtures(version: str) -> FixtureSet:
+    """
+    Embed every test case query and fetch its candidate lists.
+
+    Candidates are [id, score, title, category] lists, ready to be handed
+    to the sandbox; 'expected' is the reference RRF fusion of the two legs.
+    """
+    from app.core.embeddings import generate_embeddings_batch
+    from utils.search_pipeline import keyword_candidates, rrf_fuse, vector_candidates
+
+    start = time.perf_counter()
+    test_cases = TestCase.query.order_by(TestCase.id).all()
+    embeddings = generate_embeddings_batch([tc.query for tc in test_cases]) if test_cases else []
+
+    cases = []
+    for tc, embedding in zip(test_cases, embeddings):
+        vector = vector_candidates(embedding)
+        keyword = keyword_candidates(tc.query)
+        cases.append({
+            'test_id': tc.id,
+            'query': tc.query,
+            'category': tc.category,
+            'description': tc.description,
+            'expected_docs': tc.expected_docs or [],
+            'expected': [doc_id for doc_id, _ in rrf_fuse(vector, keyword)],
+            'vector': vector,
+            'keyword': keyword,
+        })
+
+    # Title/category for every candidate in one query
+    ids = {doc_id for case in cases for doc_id, _ in case['vector'] + case['keyword']}
+    rows = db.session.query(Document.id, Document.title, Document.category).filter(
+        Document.id.in_(ids)
+    ).all() if ids else []
+    info = {doc_id: (title, category) for doc_id, title, category in rows}
+
+    for case in cases:
+        for leg in ('vector', 'keyword'):
+            case[leg] = [[doc_id, score, *info.get(doc_id, (None, None))] for doc_id, score in case[leg]]
+
+    return FixtureSet(version=version, cases=cases, build_time=time.perf_counter() - start)
+
+
+class GradingFixtures:
+    """
+    Flask extension holding the current fixture snapshot.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.cache_dir = None
+        self.check_interval = DEFAULT_CHECK_INTERVAL
+
+        self._fixtures: Optional[FixtureSet] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.builds = 0
+        self.disk_loads = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read configuration."""
+        self.app = app
+        self.cache_dir = app.config.get('GRADING_FIXTURE_DIR')
+        self.check_interval = app.config.get('GRADING_FIXTURE_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+        app.extensions['grading_fixtures'] = self
+
+    def get(self) -> FixtureSet:
+        """
+        Current fixtures, rebuilt only when the corpus version changed.
+
+        Must be called inside an app context.
+        """
+        fixtures = self._fixtures
+        if fixtures is not None and time.monotonic() - self._checked_at < self.check_interval:
+            self.hits += 1
+            return fixtures
+
+        with self._lock:
+            version = corpus_version()
+            self._checked_at = time.monotonic()
+            if self._fixtures is not None and self._fixtures.version == version:
+                self.hits += 1
+                return self._fixtures
+
+            fixtures = self._load(version)
+            if fixtures is None:
+                fixtures = build_fixtures(version)
+                self.builds += 1
+                self._save(fixtures)
+            else:
+                self.disk_loads += 1
+
+            self._fixtures = fixtures
+            return fixtures
+
+    def invalidate(self):
+        """Force a version check on the next get()."""
+        self._checked_at = 0.0
+
+    def stats(self) -> Dict:
+        fixtures = self._fixtures
+        return {
+            'version': fixtures.version if fixtures else None,
+            'cases': len(fixtures.cases) if fixtures else 0,
+            'built_at': fixtures.built_at if fixtures else None,
+            'build_time': fixtures.build_time if fixtures else None,
+            'hits': self.hits,
+            'builds': self.builds,
+            'disk_loads': self.disk_loads,
+        }
+
+    def _path(self, version: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f'fixtures_{version}.json')
+
+    def _load(self, version: str) -> Optional[FixtureSet]:
+        path = self._path(version)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return FixtureSet(**json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            self.app.logger.warning(f'Ignoring unreadable fixture cache {path}: {e}')
+            return None
+
+    def _save(self, fixtures: FixtureSet):
+        path = self._path(fixtures.version)
+        if not path:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(asdict(fixtures), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            self.app.logger.warning(f'Could not write fixture cache {path}: {e}')
+
+
+# Shared instance, bound to the app in the factory
+grading_fixtures = GradingFixtures()
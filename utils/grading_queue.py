@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Database-backed grading queue.
+
+Submissions are saved with status 'pending' and graded in the background,
+so a burst of submissions no longer ties up web workers. The
+model_submissions table is the queue: a worker claims the next submission
+with SELECT ... FOR UPDATE SKIP LOCKED (highest priority first, then
+oldest), so any number of worker threads in any number of processes can
+share it without double-grading.
+
+Status flow: pending -> running -> completed | failed
+
+A submission whose normalized code (utils/code_cache.py) was already
+graded against the current corpus version reuses that result instead of
+running again (cache_hit=True); at enqueue time it completes immediately.
+Only results with no sandbox failures (worker timeouts, crashes) are
+reused; those are graded again.
+
+Workers run as daemon threads inside each web process
+(GRADING_QUEUE_WORKERS, 0 to disable) and/or as a standalone process:
+
+    python utils/grading_queue.py work [--workers 4]
+
+Usage:
+    grading_queue = GradingQueue()
+    grading_queue.init_app(app)
+    submission = grading_queue.enqueue(code, model_name, priority=0)
+"""
+
+import argparse
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+# Handle both direct execution and module imports
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import ModelSubmission, db
+from utils.code_cache import normalized_code_hash
+from utils.grading_fixtures import corpus_version, grading_fixtures
+from utils.sandbox_pool import sandbox_pool
+from utils.tracing import span
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+FINAL_STATUSES = (STATUS_COMPLETED, STATUS_FAILED)
+
+# Defaults, overridable through app.config
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 500
+DEFAULT_POLL_INTERVAL = 2.0   # seconds between claims when idle
+DEFAULT_STALE_AFTER = 600     # seconds before a 'running' row is requeued
+
+MIN_PRIORITY = -10
+MAX_PRIORITY = 10
+
+
+class QueueFullError(Exception):
+    """Raised by enqueue() when GRADING_MAX_PENDING submissions are waiting."""
+
+
+class GradingQueue:
+    """
+    Flask extension that grades pending submissions in background threads.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = DEFAULT_WORKERS
+        self.max_pending = DEFAULT_MAX_PENDING
+        self.poll_interval = DEFAULT_POLL_INTERVAL
+        self.stale_after = DEFAULT_STALE_AFTER
+        self.reuse_results = True
+
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._pid = None
+
+        # Counters exposed through stats()
+        self.graded = 0
+        self.failed = 0
+        self.cache_hits = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read configuration. Worker threads start on first use."""
+        self.app = app
+        self.workers = app.config.get('GRADING_QUEUE_WORKERS', DEFAULT_WORKERS)
+        self.max_pending = app.config.get('GRADING_MAX_PENDING', DEFAULT_MAX_PENDING)
+        self.poll_interval = app.config.get('GRADING_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        self.stale_after = app.config.get('GRADING_STALE_AFTER', DEFAULT_STALE_AFTER)
+        self.reuse_results = app.config.get('GRADING_REUSE_RESULTS', True)
+
+        app.extensions['grading_queue'] = self
+
+        # Pick up submissions left pending by a previous run
+        @app.before_request
+        def _start_grading_workers():
+            self.start()
+
+    def enqueue(self, code: str, model_name: str, priority: int = 0) -> ModelSubmission:
+        """
+        Persist a submission as pending and wake a worker.
+
+        If the same normalized code was already graded against the current
+        corpus version, the submission is stored as completed right away.
+
+        Raises:
+            QueueFullError: if GRADING_MAX_PENDING submissions are already waiting
+        """
+        code_hash = normalized_code_hash(code)
+        now = datetime.utcnow()
+        submission = ModelSubmission(
+            model_name=model_name,
+            code=code,
+            code_hash=code_hash,
+            status=STATUS_PENDING,
+            priority=max(MIN_PRIORITY, min(MAX_PRIORITY, int(priority))),
+            queued_at=now,
+        )
+
+        cached = self.find_cached(code_hash, corpus_version())
+        if cached is not None:
+            submission.started_at = submission.completed_at = now
+            submission.queue_wait_time = submission.grading_time = 0.0
+            self._apply_cached(submission, cached)
+            db.session.add(submission)
+            db.session.commit()
+            return submission
+
+        if self.pending_count() >= self.max_pending:
+            raise QueueFullError(f'Grading queue is full ({self.max_pending} pending)')
+
+        db.session.add(submission)
+        db.session.commit()
+
+        self.start()
+        self._wake.set()
+        return submission
+
+    def find_cached(self, code_hash: Optional[str], version: str) -> Optional[ModelSubmission]:
+        """Latest completed, reusable grading of this code against this corpus version."""
+        if not self.reuse_results or not code_hash:
+            return None
+        return ModelSubmission.query.filter_by(
+            code_hash=code_hash,
+            corpus_version=version,
+            status=STATUS_COMPLETED,
+            cacheable=True,
+        ).order_by(ModelSubmission.id.desc()).first()
+
+    def _apply_cached(self, submission: ModelSubmission, cached: ModelSubmission):
+        submission.score = cached.score
+        submission.passed = cached.passed
+        submission.test_results = cached.test_results
+        submission.execution_time = cached.execution_time
+        submission.security_issues = cached.security_issues
+        submission.corpus_version = cached.corpus_version
+        submission.cacheable = cached.cacheable
+        submission.cache_hit = True
+        submission.status = STATUS_COMPLETED
+        with self._lock:
+            self.cache_hits += 1
+
+    def pending_count(self) -> int:
+        return ModelSubmission.query.filter_by(status=STATUS_PENDING).count()
+
+    def position(self, submission: ModelSubmission) -> Optional[int]:
+        """Number of pending submissions that will be claimed before this one."""
+        if submission.status != STATUS_PENDING:
+            return None
+        return ModelSubmission.query.filter(
+            ModelSubmission.status == STATUS_PENDING,
+            db.or_(
+                ModelSubmission.priority > submission.priority,
+                db.and_(
+                    ModelSubmission.priority == submission.priority,
+                    ModelSubmission.queued_at < submission.queued_at,
+                ),
+            )
+        ).count()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'threads_alive': sum(1 for t in self._threads if t.is_alive()),
+                'graded': self.graded,
+                'failed': self.failed,
+                'cache_hits': self.cache_hits,
+            }
+
+    def start(self, workers: Optional[int] = None):
+        """Start worker threads in this process (idempotent)."""
+        count = self.workers if workers is None else workers
+        if count <= 0 or self.app is None:
+            return
+        if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+            return
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive a fork; start fresh in this process
+                self._threads = []
+                self._pid = os.getpid()
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._stopping.clear()
+
+            for i in range(len(self._threads), count):
+                thread = threading.Thread(target=self._run, name=f'grading-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        """Worker loop: claim and grade until stopped."""
+        with self.app.app_context():
+            self.requeue_stale()
+        while not self._stopping.is_set():
+            try:
+                graded = self.process_next()
+            except Exception as e:
+                self.app.logger.error(f'Grading worker error: {e}')
+                graded = False
+
+            if not graded:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def requeue_stale(self) -> int:
+        """Return 'running' submissions abandoned by a dead worker to the queue."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        count = ModelSubmission.query.filter(
+            ModelSubmission.status == STATUS_RUNNING,
+            ModelSubmission.started_at < cutoff,
+        ).update({'status': STATUS_PENDING, 'started_at': None}, synchronize_session=False)
+        db.session.commit()
+        return count
+
+    def claim(self) -> Optional[ModelSubmission]:
+        """Atomically move the next pending submission to 'running'."""
+        submission = ModelSubmission.query.filter_by(
+            status=STATUS_PENDING
+        ).order_by(
+            ModelSubmission.priority.desc(),
+            ModelSubmission.queued_at,
+            ModelSubmission.id,
+        ).with_for_update(skip_locked=True).first()
+
+        if submission is None:
+            db.session.rollback()
+            return None
+
+        now = datetime.utcnow()
+        submission.status = STATUS_RUNNING
+        submission.started_at = now
+        submission.queue_wait_time = (now - (submission.queued_at or now)).total_seconds()
+        db.session.commit()
+        return submission
+
+    def process_next(self) -> bool:
+        """
+        Claim and grade one submission.
+
+        Returns:
+            True if a submission was processed, False if the queue was empty
+        """
+        with self.app.app_context():
+            submission = self.claim()
+            if submission is None:
+                return False
+
+            try:
+                if not submission.code_hash:
+                    submission.code_hash = normalized_code_hash(submission.code)
+
+                # An identical submission may have finished while this one waited
+                cached = self.find_cached(submission.code_hash, grading_fixtures.get().version)
+                if cached is not None:
+                    self._apply_cached(submission, cached)
+                else:
+                    with span('grade_submission', model_name=submission.model_name):
+                        result = sandbox_pool.grade(submission.code, code_hash=submission.code_hash)
+
+                    submission.score = result['score']
+                    submission.passed = result['passed']
+                    submission.test_results = result['test_results']
+                    submission.execution_time = result['execution_time']
+                    submission.security_issues = result.get('security_issues')
+                    submission.corpus_version = result['corpus_version']
+                    submission.cacheable = result['cacheable']
+                    submission.status = STATUS_COMPLETED
+                submission.error = None
+                counter = 'graded'
+
+            except Exception as e:
+                db.session.rollback()
+                submission = db.session.get(ModelSubmission, submission.id)
+                submission.status = STATUS_FAILED
+                submission.error = str(e)
+                counter = 'failed'
+
+            submission.completed_at = datetime.utcnow()
+            submission.grading_time = (submission.completed_at - submission.started_at).total_seconds()
+            db.session.commit()
+            db.session.remove()
+
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        return True
+
+
+def submission_status(submission: ModelSubmission) -> Dict:
+    """JSON-serializable status of one submission (used by polling and SSE)."""
+    def iso(value):
+        return value.isoformat() if value else None
+
+    status = {
+        'id': submission.id,
+        'status': submission.status,
+        'priority': submission.priority,
+        'queued_at': iso(submission.queued_at),
+        'started_at': iso(submission.started_at),
+        'completed_at': iso(submission.completed_at),
+        'queue_wait_time': submission.queue_wait_time,
+        'grading_time': submission.grading_time,
+        'position': grading_queue.position(submission),
+        'cache_hit': submission.cache_hit,
+        'error': submission.error,
+    }
+    if submission.status == STATUS_COMPLETED:
+        status.update({
+            'score': submission.score,
+            'passed': submission.passed,
+            'execution_time': submission.execution_time,
+        })
+    return status
+
+
+# Shared instance, bound to the app in the factory
+grading_queue = GradingQueue()
+
+
+def main():
+    """Run standalone grading workers until interrupted."""
+    parser = argparse.ArgumentParser(description="Grading queue worker")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    work_parser = subparsers.add_parser("work", help="Grade pending submissions")
+    work_parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS,
+                             help=f"Concurrent submissions (default: {DEFAULT_WORKERS})")
+    args = parser.parse_args()
+
+    from utils.database import create_cli_app
+    app = create_cli_app()
+    sandbox_pool.init_app(app)
+    grading_fixtures.init_app(app)
+    grading_queue.init_app(app)
+
+    print(f"Grading worker started with {args.workers} thread(s); Ctrl+C to stop")
+    grading_queue.start(args.workers)
+    try:
+        while True:
+            threading.Event().wait(60)
+    except KeyboardInterrupt:
+        grading_queue.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
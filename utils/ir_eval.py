@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Batch IR evaluation of the hybrid search against the TestCase suite.
+
+All test queries are embedded in one batch and each candidate leg runs
+as a single SQL statement for a whole chunk of queries (LATERAL over
+unnest of the query arrays). Candidates are fetched once, at the largest
+candidate depth any configuration needs, and every configuration is then
+fused and scored from the same candidates. Metrics are computed for all
+queries at once with NumPy:
+
+- recall@k: fraction of expected_docs in the top k
+- MRR: reciprocal rank of the first expected document
+- nDCG@k: binary-relevance nDCG over expected_docs
+- order agreement: Kendall tau between expected_order and the positions
+  those documents actually got (missing documents rank last)
+
+Usage:
+    python utils/ir_eval.py run [--config hybrid] [--config vector] ...
+                                [--k 10] [--baseline FILE] [--save-baseline]
+                                [--max-drop 0.01]
+
+A config is a preset name or "name:key=value,...", e.g.
+"k20:rrf_k=20" or "vec_heavy:vector_weight=2". Exit status is 1 when a
+metric of the first config dropped more than --max-drop below the
+baseline, so the run can gate performance changes.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Handle both direct execution and module imports
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from utils.database import db
+
+METRICS = ('recall', 'mrr', 'ndcg', 'order_agreement')
+
+DEFAULT_K = 10
+QUERY_CHUNK = 500  # queries per batched SQL statement
+
+DEFAULT_OUTPUT_DIR = 'instance/ir_eval'
+DEFAULT_BASELINE = os.path.join(DEFAULT_OUTPUT_DIR, 'baseline.json')
+DEFAULT_MAX_DROP = 0.01
+
+# A test case passes when this fraction of its expected docs is in the top k
+PASS_RECALL = 0.7
+
+VECTOR_BATCH_SQL = text("""
+    SELECT q.qid, d.id, d.score
+    FROM unnest(CAST(:qids AS integer[]), CAST(:embeddings AS text[])) AS q(qid, embedding)
+    CROSS JOIN LATERAL (
+        SELECT documents.id,
+               1 - (documents.embedding <=> CAST(q.embedding AS vector)) AS score
+        FROM documents
+        WHERE documents.embedding IS NOT NULL
+        ORDER BY documents.embedding <=> CAST(q.embedding AS vector)
+        LIMIT :limit
+    ) AS d
+    ORDER BY q.qid, d.score DESC
+""")
+
+KEYWORD_BATCH_SQL = text("""
+    SELECT q.qid, d.id, d.score
+    FROM unnest(CAST(:qids AS integer[]), CAST(:queries AS text[])) AS q(qid, query)
+    CROSS JOIN LATERAL (
+        SELECT documents.id,
+               ts_rank(documents.ts_vector, plainto_tsquery('english', q.query)) AS score
+        FROM documents
+        WHERE documents.ts_vector @@ plainto_tsquery('english', q.query)
+        ORDER BY score DESC
+        LIMIT :limit
+    ) AS d
+    ORDER BY q.qid, d.score DESC
+""")
+
+
+@dataclass
+class SearchConfig:
+    """One ranking configuration to evaluate."""
+
+    name: str = 'hybrid'
+    mode: str = 'hybrid'          # 'hybrid', 'vector' or 'keyword'
+    rrf_k: int = 60
+    candidate_limit: int = 50
+    vector_weight: float = 1.0
+    keyword_weight: float = 1.0
+
+
+PRESET_CONFIGS = {
+    'hybrid': SearchConfig(),  # reference: RRF k=60 over top-50 of each leg
+    'vector': SearchConfig(name='vector', mode='vector'),
+    'keyword': SearchConfig(name='keyword', mode='keyword'),
+    'hybrid_k20': SearchConfig(name='hybrid_k20', rrf_k=20),
+    'hybrid_c100': SearchConfig(name='hybrid_c100', candidate_limit=100),
+}
+
+
+def parse_config(spec: str) -> SearchConfig:
+    """
+    Resolve a preset name or "name:key=value,..." into a SearchConfig.
+
+    Overrides start from the preset of the same name, or the reference
+    hybrid config for new names.
+    """
+    name, _, overrides = spec.partition(':')
+    base = PRESET_CONFIGS.get(name, replace(PRESET_CONFIGS['hybrid'], name=name))
+    if not overrides:
+        return base
+
+    fields = {}
+    for item in overrides.split(','):
+        key, _, value = item.partition('=')
+        key = key.strip()
+        if key not in SearchConfig.__dataclass_fields__ or key == 'name':
+            raise ValueError(f"Unknown config field: {key}")
+        field_type = type(getattr(base, key))
+        fields[key] = field_type(value.strip())
+    return replace(base, **fields)
+
+
+def fetch_candidates(queries: Sequence[str], limit: int) -> Dict[str, List[List]]:
+    """
+    Run both candidate legs for all queries.
+
+    Returns:
+        {'vector': [[(id, score), ...] per query], 'keyword': [...]}
+    """
+    from app.core.embeddings import generate_embeddings_batch
+
+    n = len(queries)
+    vector = [[] for _ in range(n)]
+    keyword = [[] for _ in range(n)]
+    embeddings = generate_embeddings_batch(list(queries)) if n else []
+
+    for start in range(0, n, QUERY_CHUNK):
+        qids = list(range(start, min(start + QUERY_CHUNK, n)))
+        vector_rows = db.session.execute(VECTOR_BATCH_SQL, {
+            'qids': qids,
+            'embeddings': [str(list(map(float, embeddings[i]))) for i in qids],
+            'limit': limit,
+        })
+        for qid, doc_id, score in vector_rows:
+            vector[qid].append((doc_id, float(score)))
+
+        keyword_rows = db.session.execute(KEYWORD_BATCH_SQL, {
+            'qids': qids,
+            'queries': [queries[i] for i in qids],
+            'limit': limit,
+        })
+        for qid, doc_id, score in keyword_rows:
+            keyword[qid].append((doc_id, float(score)))
+
+    return {'vector': vector, 'keyword': keyword}
+
+
+def rank(config: SearchConfig, vector: List, keyword: List, k: int) -> List[int]:
+    """Top-k document ids for one query under a configuration."""
+    vector = vector[:config.candidate_limit]
+    keyword = keyword[:config.candidate_limit]
+
+    if config.mode == 'vector':
+        return [doc_id for doc_id, _ in vector[:k]]
+    if config.mode == 'keyword':
+        return [doc_id for doc_id, _ in keyword[:k]]
+
+    scores: Dict[int, float] = {}
+    for r, (doc_id, _) in enumerate(vector, start=1):
+        scores[doc_id] = scores.get(doc_id, 0.0) + config.vector_weight / (config.rrf_k + r)
+    for r, (doc_id, _) in enumerate(keyword, start=1):
+        scores[doc_id] = scores.get(doc_id, 0.0) + config.keyword_weight / (config.rrf_k + r)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)[:k]
+
+
+def _pad(rows: Sequence[Sequence[int]], width: int, fill: int) -> np.ndarray:
+    matrix = np.full((len(rows), max(width, 1)), fill, dtype=np.int64)
+    for i, row in enumerate(rows):
+        row = list(row)[:width]
+        matrix[i, :len(row)] = row
+    return matrix
+
+
+def compute_metrics(results: Sequence[Sequence[int]], expected: Sequence[Sequence[int]],
+                    expected_order: Sequence[Sequence[int]], k: int) -> Dict[str, np.ndarray]:
+    """
+    Per-query metric vectors for a batch of ranked results.
+
+    Args:
+        results: Ranked document ids per query (top k used)
+        expected: Relevant document ids per query
+        expected_order: Ideal ranking per query (may be empty)
+        k: Cutoff
+
+    Returns:
+        {metric: ndarray of shape (n_queries,)}; order_agreement is NaN for
+        queries with fewer than two expected_order entries
+    """
+    n = len(results)
+    res = _pad(results, k, -1)
+    exp = _pad(expected, max((len(e) for e in expected), default=0), -2)
+
+    # rel[q, i]: result i of query q is relevant
+    rel = (res[:, :, None] == exp[:, None, :]).any(axis=2) & (res >= 0)
+    n_expected = np.array([len(set(e)) for e in expected], dtype=float)
+
+    recall = np.divide(rel.sum(axis=1), n_expected, out=np.zeros(n), where=n_expected > 0)
+
+    first = np.where(rel.any(axis=1), rel.argmax(axis=1), -1)
+    mrr = np.divide(1.0, first + 1, out=np.zeros(n), where=first >= 0)
+
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = (rel[:, :k] * discounts[:rel.shape[1]]).sum(axis=1)
+    ideal_cum = np.concatenate([[0.0], np.cumsum(discounts)])
+    idcg = ideal_cum[np.minimum(n_expected, k).astype(int)]
+    ndcg = np.divide(dcg, idcg, out=np.zeros(n), where=idcg > 0)
+
+    # Kendall tau between expected_order and actual positions
+    order = _pad(expected_order, max((len(o) for o in expected_order), default=0), -2)
+    valid = order >= 0
+    match = (order[:, :, None] == res[:, None, :]) & valid[:, :, None]
+    pos = np.where(match.any(axis=2), match.argmax(axis=2), k).astype(float)
+
+    upper = np.triu(np.ones((order.shape[1], order.shape[1]), dtype=bool), 1)
+    pair_mask = valid[:, :, None] & valid[:, None, :] & upper
+    diff = pos[:, None, :] - pos[:, :, None]  # > 0 when ranked in expected order
+    concordant = ((diff > 0) & pair_mask).sum(axis=(1, 2))
+    discordant = ((diff < 0) & pair_mask).sum(axis=(1, 2))
+    pairs = pair_mask.sum(axis=(1, 2))
+    order_agreement = np.divide(
+        (concordant - discordant).astype(float), pairs,
+        out=np.full(n, np.nan), where=pairs > 0
+    )
+
+    return {'recall': recall, 'mrr': mrr, 'ndcg': ndcg, 'order_agreement': order_agreement}
+
+
+def _summarize(metrics: Dict[str, np.ndarray], mask: Optional[np.ndarray] = None) -> Dict[str, float]:
+    summary = {}
+    for name, values in metrics.items():
+        values = values if mask is None else values[mask]
+        values = values[~np.isnan(values)]
+        summary[name] = float(values.mean()) if values.size else None
+    summary['count'] = int(mask.sum()) if mask is not None else int(next(iter(metrics.values())).size)
+    return summary
+
+
+def evaluate(configs: Sequence[SearchConfig], test_cases=None, k: int = DEFAULT_K) -> Dict:
+    """
+    Evaluate configurations side by side over the test suite.
+
+    Must run inside an app context.
+
+    Returns:
+        Dict with per-config overall/by-category metric means and
+        per-query results, plus timings
+    """
+    if test_cases is None:
+        from app.models import TestCase
+        test_cases = TestCase.query.order_by(TestCase.id).all()
+
+    queries = [tc.query for tc in test_cases]
+    expected = [tc.expected_docs or [] for tc in test_cases]
+    expected_order = [tc.expected_order or [] for tc in test_cases]
+    categories = np.array([tc.category or 'uncategorized' for tc in test_cases])
+
+    start = time.perf_counter()
+    depth = max(config.candidate_limit for config in configs)
+    candidates = fetch_candidates(queries, depth)
+    search_time = time.perf_counter() - start
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'k': k,
+        'query_count': len(queries),
+        'search_time_s': search_time,
+        'configs': {},
+    }
+
+    for config in configs:
+        start = time.perf_counter()
+        ranked = [
+            rank(config, vector, keyword, k)
+            for vector, keyword in zip(candidates['vector'], candidates['keyword'])
+        ]
+        metrics = compute_metrics(ranked, expected, expected_order, k)
+
+        per_query = []
+        for i, tc in enumerate(test_cases):
+            found = int(round(metrics['recall'][i] * len(set(expected[i]))))
+            tau = metrics['order_agreement'][i]
+            per_query.append({
+                'test_id': tc.id,
+                'query': tc.query,
+                'category': tc.category,
+                'expected_count': len(expected[i]),
+                'found_count': found,
+                'results': ranked[i],
+                'recall': float(metrics['recall'][i]),
+                'mrr': float(metrics['mrr'][i]),
+                'ndcg': float(metrics['ndcg'][i]),
+                'order_agreement': None if np.isnan(tau) else float(tau),
+                'passed': bool(metrics['recall'][i] >= PASS_RECALL),
+            })
+
+        report['configs'][config.name] = {
+            'config': asdict(config),
+            'overall': _summarize(metrics),
+            'by_category': {
+                category: _summarize(metrics, categories == category)
+                for category in sorted(set(categories.tolist()))
+            },
+            'passed': sum(1 for q in per_query if q['passed']),
+            'scoring_time_s': time.perf_counter() - start,
+            'queries': per_query,
+        }
+
+    return report
+
+
+def save_report(report: Dict, output_dir: str = DEFAULT_OUTPUT_DIR) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"eval_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def load_report(path: str) -> Optional[Dict]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, config_name: str,
+                        max_drop: float = DEFAULT_MAX_DROP) -> List[Dict]:
+    """
+    Metrics of one config that dropped more than max_drop (absolute).
+
+    The baseline entry with the same config name is used, falling back to
+    the baseline's first config.
+    """
+    base_configs = baseline.get('configs', {})
+    base = base_configs.get(config_name) or next(iter(base_configs.values()), None)
+    current = report['configs'].get(config_name)
+    if not base or not current:
+        return []
+
+    drops = []
+    for metric in METRICS:
+        before, after = base['overall'].get(metric), current['overall'].get(metric)
+        if before is None or after is None:
+            continue
+        if before - after > max_drop:
+            drops.append({'metric': metric, 'baseline': before, 'current': after, 'change': after - before})
+    return drops
+
+
+def _print_report(report: Dict):
+    print(f"\n{report['query_count']} queries, k={report['k']}, "
+          f"candidate search {report['search_time_s']:.2f}s\n")
+    header = f"{'config':<16}" + ''.join(f"{m:>17}" for m in METRICS) + f"{'passed':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, result in report['configs'].items():
+        overall = result['overall']
+        cells = ''.join(
+            f"{overall[m]:>17.4f}" if overall[m] is not None else f"{'-':>17}" for m in METRICS
+        )
+        print(f"{name:<16}{cells}{result['passed']:>10}")
+
+
+def create_parser():
+    """Create and configure the argument parser."""
+    parser = argparse.ArgumentParser(description="Batch IR evaluation of hybrid search")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Evaluate one or more search configs")
+    run_parser.add_argument("--config", action="append", dest="configs",
+                            help=f"Preset ({', '.join(PRESET_CONFIGS)}) or name:key=value,... "
+                                 "(repeatable; first is gated)")
+    run_parser.add_argument("--k", type=int, default=DEFAULT_K, help="Cutoff (default: 10)")
+    run_parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Where to save reports")
+    run_parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline report to gate against")
+    run_parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    run_parser.add_argument("--max-drop", type=float, default=DEFAULT_MAX_DROP,
+                            help="Largest allowed absolute metric drop (default: 0.01)")
+    return parser
+
+
+def main():
+    """Main entry point for the evaluation CLI."""
+    args = create_parser().parse_args()
+
+    try:
+        configs = [parse_config(spec) for spec in (args.configs or ['hybrid'])]
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    from utils.database import create_cli_app
+    app = create_cli_app()
+
+    with app.app_context():
+        try:
+            report = evaluate(configs, k=args.k)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    _print_report(report)
+    print(f"\nReport saved to: {save_report(report, args.output_dir)}")
+
+    drops = None
+    baseline = load_report(args.baseline)
+    if baseline:
+        drops = compare_to_baseline(report, baseline, configs[0].name, args.max_drop)
+        if drops:
+            print(f"\n✗ {configs[0].name}: {len(drops)} metric(s) dropped below baseline:")
+            for d in drops:
+                print(f"  {d['metric']}: {d['baseline']:.4f} -> {d['current']:.4f} ({d['change']:+.4f})")
+        else:
+            print(f"\n✓ {configs[0].name}: no metric dropped below baseline")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to: {args.baseline}")
+
+    return 1 if drops else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Fixed-bucket latency histograms.
+
+Histograms keep one counter per bucket, so memory and observe() cost are
+constant no matter how many samples are recorded. Percentiles are estimated
+by linear interpolation inside the bucket holding the requested rank.
+Histograms live in process memory; each worker reports its own traffic.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+# Upper bounds in milliseconds; an implicit +Inf bucket follows the last one
+DEFAULT_BUCKETS_MS = (
+    0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000
+)
+
+# Search pipeline stages, in execution order
+SEARCH_STAGES = (
+    'embedding', 'vector', 'keyword', 'fusion', 'hydration', 'rendering', 'total'
+)
+
+
+class LatencyHistogram:
+    """Thread-safe fixed-bucket histogram of millisecond durations."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum_ms = 0.0
+            self.max_ms = 0.0
+
+    def observe(self, value_ms: float):
+        """Record one duration in milliseconds."""
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                index = i
+                break
+
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum_ms += value_ms
+            if value_ms > self.max_ms:
+                self.max_ms = value_ms
+
+    def percentile(self, p: float) -> float:
+        """
+        Estimate the p-th percentile (0-100) in milliseconds.
+
+        Returns 0.0 when no samples have been recorded.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self.count
+            max_ms = self.max_ms
+
+        if total == 0:
+            return 0.0
+
+        rank = p / 100.0 * total
+        cumulative = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(counts):
+            upper = self.buckets[i] if i < len(self.buckets) else max_ms
+            if bucket_count and cumulative + bucket_count >= rank:
+                fraction = (rank - cumulative) / bucket_count
+                return min(lower + (upper - lower) * fraction, max_ms)
+            cumulative += bucket_count
+            lower = upper
+        return max_ms
+
+    def cumulative_buckets(self):
+        """Return [(upper_bound, cumulative_count), ...] ending with +Inf."""
+        with self._lock:
+            counts = list(self._counts)
+
+        result = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            running += bucket_count
+            result.append((bound, running))
+        return result
+
+    def snapshot(self) -> Dict[str, float]:
+        """Summary suitable for templates and JSON responses."""
+        return {
+            'count': self.count,
+            'avg_ms': self.sum_ms / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max_ms,
+        }
+
+
+class HistogramGroup:
+    """A named set of histograms sharing the same bucket layout."""
+
+    def __init__(self, names: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        for name in names:
+            self.get(name)
+
+    def get(self, name: str) -> LatencyHistogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = LatencyHistogram(self.buckets)
+            return self._histograms[name]
+
+    def observe(self, name: str, value_ms: float):
+        self.get(name).observe(value_ms)
+
+    def observe_all(self, timings: Dict[str, float]):
+        """Record every entry of a {name: milliseconds} dict."""
+        for name, value_ms in timings.items():
+            self.observe(name, value_ms)
+
+    def items(self):
+        with self._lock:
+            return list(self._histograms.items())
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {name: hist.snapshot() for name, hist in self.items()}
+
+    def reset(self):
+        for _, hist in self.items():
+            hist.reset()
+
+
+@contextmanager
+def stage_timer(timings: Optional[Dict[str, float]], stage: str):
+    """
+    Time a block and store the duration (ms) in timings[stage].
+
+    Passing timings=None turns the timer into a no-op so callers can make
+    instrumentation optional.
+    """
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+
+# Per-stage search latency, shared by the search routes and admin stats
+search_latency = HistogramGroup(SEARCH_STAGES)
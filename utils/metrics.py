@@ -0,0 +1,169 @@
+"""
+In-process metrics registry with Prometheus text exposition output.
+
+Three kinds of metric are supported:
+- Counters: monotonically increasing values keyed by label set
+- Histograms: fixed-bucket latency histograms keyed by label set
+- Callbacks: values read at scrape time (pool usage, queue depth, ...)
+
+Metrics are per worker process; scrape every worker or run one worker per
+scrape target.
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.latency import DEFAULT_BUCKETS_MS, LatencyHistogram
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelSet:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _format_labels(labels: LabelSet, extra: Optional[Dict[str, str]] = None) -> str:
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ''
+    escaped = []
+    for key, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Labeled monotonically increasing counter."""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[LabelSet, float] = {}
+
+    def inc(self, labels: Optional[Dict[str, str]] = None, amount: float = 1.0):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f'{self.name}{_format_labels(k)} {_format_value(v)}' for k, v in values.items()]
+
+
+class Histogram:
+    """Labeled latency histogram, exported in seconds."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS_MS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms: Dict[LabelSet, LatencyHistogram] = {}
+
+    def observe(self, value_ms: float, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = LatencyHistogram(self.buckets)
+        hist.observe(value_ms)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            histograms = dict(self._histograms)
+
+        lines = []
+        for key, hist in histograms.items():
+            for bound_ms, cumulative in hist.cumulative_buckets():
+                le = '+Inf' if bound_ms == float('inf') else repr(bound_ms / 1000)
+                lines.append(f'{self.name}_bucket{_format_labels(key, {"le": le})} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {repr(hist.sum_ms / 1000)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {hist.count}')
+        return lines
+
+
+class Callback:
+    """
+    Metric whose value is read at scrape time.
+
+    fn returns either a number or a list of (labels_dict, value) tuples.
+    """
+
+    def __init__(self, name: str, help_text: str, fn: Callable, type_name: str = 'gauge'):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.type_name = type_name
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            # A broken collector must not take down the whole scrape
+            return []
+
+        if value is None:
+            return []
+        if isinstance(value, (int, float)):
+            value = [({}, value)]
+        return [
+            f'{self.name}{_format_labels(_label_key(labels))} {_format_value(v)}'
+            for labels, v in value
+        ]
+
+
+class MetricsRegistry:
+    """Holds all metrics for this process and renders the exposition text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS_MS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def callback(self, name: str, help_text: str, fn: Callable, type_name: str = 'gauge') -> Callback:
+        return self._register(Callback(name, help_text, fn, type_name))
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            samples = metric.samples()
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
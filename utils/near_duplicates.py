@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection at ingestion time (MinHash / LSH + embeddings).
+
+Each document gets a 128-value MinHash signature over its word 5-gram
+shingles. The signature is split into 16 bands of 8 values; every band is
+hashed to a bucket and stored in document_lsh_bands (band, bucket,
+document_id). A new document's candidates are the documents sharing at
+least one bucket: an index lookup per band, independent of corpus size.
+Two documents with shingle Jaccard similarity s share a bucket with
+probability 1 - (1 - s^8)^16 (about 0.98 at s = 0.8, 0.04 at s = 0.5).
+
+Content without any word tokens (empty or symbol-only) has no shingles
+and gets no signature: it is never matched and never registered, since an
+empty shingle set would otherwise share every bucket with every other one.
+
+Candidates are verified before they count:
+- estimated Jaccard (share of equal signature values) >= NEAR_DUPLICATE_JACCARD
+- embedding cosine similarity >= NEAR_DUPLICATE_COSINE, when both
+  documents have an embedding (guards against shared boilerplate)
+
+What happens to a match is the NEAR_DUPLICATE_POLICY:
+    skip  reject the new document (uploads raise DuplicateDocument)
+    link  store it as a variant: documents.canonical_id = the match's canonical
+    keep  store it as an independent document
+
+Search collapses variants at query time (staged_hybrid_search
+collapse_variants): only the best-ranked member of each canonical group is
+returned, so near-identical copies don't take several result slots.
+
+Usage:
+    python utils/near_duplicates.py index     # backfill signatures, link existing variants
+    python utils/near_duplicates.py status
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Handle both direct execution and module imports
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import db
+
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_CHUNK = 8192            # shingles hashed per numpy block (bounds memory on huge documents)
+
+POLICIES = ('skip', 'link', 'keep')
+DEFAULT_POLICY = 'link'
+DEFAULT_JACCARD = 0.8
+DEFAULT_COSINE = 0.9
+MAX_CANDIDATES = 20             # most-shared-bands candidates verified per document
+DEFAULT_BATCH_ROWS = 2000
+
+# Universal hashing (a * x + b) mod p per permutation. The seed is fixed:
+# stored signatures are only comparable if every process uses the same values
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+_WORD = re.compile(r'\w+')
+
+CANDIDATES_SQL = """
+    SELECT q.item, b.document_id, count(*) AS shared
+    FROM unnest(%(items)s::int[], %(bands)s::smallint[], %(buckets)s::bigint[]) AS q(item, band, bucket)
+    JOIN document_lsh_bands b ON b.band = q.band AND b.bucket = q.bucket
+    GROUP BY q.item, b.document_id
+"""
+
+VERIFY_SQL = """
+    SELECT d.id, coalesce(d.canonical_id, d.id), s.minhash, d.embedding::text
+    FROM documents d
+    JOIN document_signatures s ON s.document_id = d.id
+    WHERE d.id = ANY(%(ids)s)
+"""
+
+
+# ---------------------------------------------------------------------------
+# Signatures
+# ---------------------------------------------------------------------------
+
+def shingle_hashes(content: str) -> np.ndarray:
+    """32-bit hashes of the distinct word 5-grams (lowercased)."""
+    words = _WORD.findall(content.lower())
+    if len(words) < SHINGLE_WORDS:
+        grams = {' '.join(words)} if words else set()
+    else:
+        grams = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(content: str) -> Optional[np.ndarray]:
+    """NUM_PERM-value MinHash signature (uint32), None when there are no shingles."""
+    hashes = shingle_hashes(content)
+    if not len(hashes):
+        return None
+    signature = np.full(NUM_PERM, MAX_HASH, dtype=np.uint64)
+    # uint64 products wrap around; the result is still a valid hash family
+    with np.errstate(over='ignore'):
+        for start in range(0, len(hashes), SHINGLE_CHUNK):
+            block = hashes[start:start + SHINGLE_CHUNK]
+            permuted = (np.outer(block, _PERM_A) + _PERM_B) % MERSENNE_PRIME & MAX_HASH
+            signature = np.minimum(signature, permuted.min(axis=0))
+    return signature.astype('<u4')
+
+
+def signature_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype('<u4').tobytes()
+
+
+def signature_from_bytes(data) -> np.ndarray:
+    return np.frombuffer(bytes(data), dtype='<u4')
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """One signed 64-bit bucket per band (fits a bigint column)."""
+    raw = signature.astype('<u4')
+    return [
+        int.from_bytes(
+            hashlib.blake2b(raw[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes(), digest_size=8).digest(),
+            'big', signed=True
+        )
+        for band in range(BANDS)
+    ]
+
+
+def estimate_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def _cosine(a, b) -> Optional[float]:
+    if a is None or b is None:
+        return None
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    denominator = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.dot(a, b)) / denominator if denominator else None
+
+
+def signature_row(document_id: int, signature: np.ndarray) -> Dict:
+    """document_signatures row, for COPY-based loaders."""
+    return {'document_id': document_id, 'minhash': signature_bytes(signature)}
+
+
+def band_rows(document_id: int, signature: Optional[np.ndarray]) -> List[Dict]:
+    """document_lsh_bands rows, for COPY-based loaders (none without a signature)."""
+    if signature is None:
+        return []
+    return [
+        {'band': band, 'bucket': bucket, 'document_id': document_id}
+        for band, bucket in enumerate(band_buckets(signature))
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Detection
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Match:
+    """A verified near-duplicate of an incoming document."""
+
+    document_id: int
+    canonical_id: int
+    jaccard: float
+    cosine: Optional[float] = None
+
+    def describe(self) -> str:
+        cosine = f", cosine {self.cosine:.3f}" if self.cosine is not None else ''
+        return f"near-duplicate of document {self.document_id} (jaccard {self.jaccard:.2f}{cosine})"
+
+
+class DuplicateDocument(ValueError):
+    """Raised on ingestion under the 'skip' policy."""
+
+    def __init__(self, match: Match):
+        super().__init__(f"Document is a {match.describe()}")
+        self.match = match
+
+
+class NearDuplicateDetector:
+    """Signature lookups against document_lsh_bands plus verification."""
+
+    def __init__(self, policy: str = DEFAULT_POLICY, jaccard: float = DEFAULT_JACCARD,
+                 cosine: float = DEFAULT_COSINE, max_candidates: int = MAX_CANDIDATES):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown near-duplicate policy: {policy} (use {', '.join(POLICIES)})")
+        self.policy = policy
+        self.jaccard = jaccard
+        self.cosine = cosine
+        self.max_candidates = max_candidates
+
+    @classmethod
+    def from_config(cls, config) -> 'NearDuplicateDetector':
+        return cls(
+            policy=config.get('NEAR_DUPLICATE_POLICY', DEFAULT_POLICY),
+            jaccard=config.get('NEAR_DUPLICATE_JACCARD', DEFAULT_JACCARD),
+            cosine=config.get('NEAR_DUPLICATE_COSINE', DEFAULT_COSINE),
+        )
+
+    def _verify(self, signature, embedding, other_signature, other_embedding) -> Optional[Tuple[float, Optional[float]]]:
+        jaccard = estimate_jaccard(signature, other_signature)
+        if jaccard < self.jaccard:
+            return None
+        cosine = _cosine(embedding, other_embedding)
+        if cosine is not None and cosine < self.cosine:
+            return None
+        return jaccard, cosine
+
+    def check_batch(self, cursor, items: Sequence[Tuple[Optional[int], str, Optional[Sequence[float]]]]
+                    ) -> List[Tuple[np.ndarray, Optional[Match]]]:
+        """
+        Signatures and best verified match for a batch of documents.
+
+        Args:
+            cursor: DBAPI (psycopg2) cursor
+            items: (document_id or None, content, embedding or None) per
+                document; later items are also checked against earlier
+                items that have an id
+
+        Returns:
+            (signature, Match or None) per item, in input order; the
+            signature is None (and there is no match) for content without
+            any shingles
+        """
+        signatures = [minhash(content) for _, content, _ in items]
+        buckets = [band_buckets(signature) if signature is not None else [] for signature in signatures]
+
+        # Existing corpus: one set-based lookup for the whole batch
+        candidates: Dict[int, Dict[int, int]] = {}
+        if any(buckets):
+            cursor.execute(CANDIDATES_SQL, {
+                'items': [i for i, item_buckets in enumerate(buckets) for _ in item_buckets],
+                'bands': [band for item_buckets in buckets for band in range(len(item_buckets))],
+                'buckets': [bucket for item_buckets in buckets for bucket in item_buckets],
+            })
+            for item, document_id, shared in cursor.fetchall():
+                candidates.setdefault(item, {})[document_id] = shared
+
+        for item, shared in candidates.items():
+            top = sorted(shared, key=shared.get, reverse=True)[:self.max_candidates]
+            candidates[item] = {document_id: shared[document_id] for document_id in top}
+
+        known = {}
+        wanted = sorted({document_id for shared in candidates.values() for document_id in shared})
+        if wanted:
+            cursor.execute(VERIFY_SQL, {'ids': wanted})
+            for document_id, canonical_id, data, embedding in cursor.fetchall():
+                known[document_id] = (canonical_id, signature_from_bytes(data),
+                                      json.loads(embedding) if embedding else None)
+
+        results = []
+        batch_buckets: Dict[Tuple[int, int], List[int]] = {}
+        for index, (document_id, _, embedding) in enumerate(items):
+            signature = signatures[index]
+            if signature is None:
+                results.append((None, None))
+                continue
+            best = None
+            for other_id in candidates.get(index, {}):
+                if other_id not in known or other_id == document_id:
+                    continue
+                canonical_id, other_signature, other_embedding = known[other_id]
+                verified = self._verify(signature, embedding, other_signature, other_embedding)
+                if verified and (best is None or verified[0] > best.jaccard):
+                    best = Match(other_id, canonical_id, *verified)
+
+            # Earlier items of the same batch are not in the table yet
+            earlier = {j for band, bucket in enumerate(buckets[index]) for j in batch_buckets.get((band, bucket), ())}
+            for j in sorted(earlier):
+                verified = self._verify(signature, embedding, signatures[j], items[j][2])
+                if verified and (best is None or verified[0] > best.jaccard):
+                    earlier_match = results[j][1]
+                    canonical_id = earlier_match.canonical_id if earlier_match else items[j][0]
+                    best = Match(items[j][0], canonical_id, *verified)
+
+            results.append((signature, best))
+            if document_id is not None and (best is None or self.policy != 'skip'):
+                for band, bucket in enumerate(buckets[index]):
+                    batch_buckets.setdefault((band, bucket), []).append(index)
+        return results
+
+    def check(self, content: str, embedding=None) -> Tuple[np.ndarray, Optional[Match]]:
+        """Single-document check inside the current db.session transaction."""
+        raw = db.session.connection().connection
+        with raw.cursor() as cursor:
+            return self.check_batch(cursor, [(None, content, embedding)])[0]
+
+    def canonical_for(self, match: Optional[Match]) -> Optional[int]:
+        """
+        canonical_id to store for a new document under this policy.
+
+        Raises:
+            DuplicateDocument: policy is 'skip' and there is a match
+        """
+        if match is None or self.policy == 'keep':
+            return None
+        if self.policy == 'skip':
+            raise DuplicateDocument(match)
+        return match.canonical_id
+
+
+def register(document_id: int, signature: Optional[np.ndarray]):
+    """Add a flushed document's signature and LSH bands to the session (none without a signature)."""
+    if signature is None:
+        return
+    from app.models import DocumentLshBand, DocumentSignature
+
+    db.session.add(DocumentSignature(document_id=document_id, minhash=signature_bytes(signature)))
+    db.session.add_all(DocumentLshBand(**row) for row in band_rows(document_id, signature))
+
+
+# ---------------------------------------------------------------------------
+# Backfill and status
+# ---------------------------------------------------------------------------
+
+def index_existing(raw_conn, detector: NearDuplicateDetector, batch_rows: int = DEFAULT_BATCH_ROWS, log=print) -> Dict:
+    """
+    Signatures for documents that have none, in id order; matches are
+    linked as variants (existing documents are never deleted, so 'skip'
+    behaves like 'link' here). Documents without shingles get no signature
+    and are looked at again on every run.
+    """
+    from psycopg2.extras import execute_values
+
+    result = {'indexed': 0, 'linked': 0}
+    last_id = 0
+    while True:
+        with raw_conn.cursor() as cur:
+            cur.execute(
+                "SELECT d.id, c.content, d.embedding::text FROM documents d "
+                "JOIN document_contents c ON c.document_id = d.id "
+                "WHERE d.id > %s AND NOT EXISTS (SELECT 1 FROM document_signatures s WHERE s.document_id = d.id) "
+                "ORDER BY d.id LIMIT %s",
+                (last_id, batch_rows)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            items = [(doc_id, content, json.loads(embedding) if embedding else None)
+                     for doc_id, content, embedding in rows]
+            checked = detector.check_batch(cur, items)
+
+            execute_values(cur, "INSERT INTO document_signatures (document_id, minhash) VALUES %s",
+                           [(doc_id, signature_bytes(signature)) for (doc_id, _, _), (signature, _) in zip(items, checked)
+                            if signature is not None])
+            execute_values(cur, "INSERT INTO document_lsh_bands (band, bucket, document_id) VALUES %s",
+                           [(row['band'], row['bucket'], doc_id)
+                            for (doc_id, _, _), (signature, _) in zip(items, checked)
+                            for row in band_rows(doc_id, signature)],
+                           page_size=5000)
+            links = [(match.canonical_id, doc_id) for (doc_id, _, _), (_, match) in zip(items, checked)
+                     if match and detector.policy != 'keep' and match.canonical_id != doc_id]
+            if links:
+                execute_values(cur, "UPDATE documents d SET canonical_id = v.canonical_id "
+                                    "FROM (VALUES %s) AS v(canonical_id, id) WHERE d.id = v.id", links)
+        raw_conn.commit()
+
+        result['indexed'] += len(rows)
+        result['linked'] += len(links)
+        last_id = rows[-1][0]
+        log(f"  {result['indexed']:,} indexed, {result['linked']:,} linked as variants")
+    return result
+
+
+def status(raw_conn) -> Dict:
+    with raw_conn.cursor() as cur:
+        cur.execute("""
+            SELECT (SELECT count(*) FROM documents),
+                   (SELECT count(*) FROM document_signatures),
+                   (SELECT count(*) FROM documents WHERE canonical_id IS NOT NULL),
+                   (SELECT count(DISTINCT canonical_id) FROM documents WHERE canonical_id IS NOT NULL)
+        """)
+        documents, indexed, variants, groups = cur.fetchone()
+        cur.execute("""
+            SELECT canonical_id, count(*) FROM documents WHERE canonical_id IS NOT NULL
+            GROUP BY canonical_id ORDER BY count(*) DESC LIMIT 10
+        """)
+        largest = cur.fetchall()
+    return {'documents': documents, 'indexed': indexed, 'variants': variants,
+            'groups': groups, 'largest_groups': largest}
+
+
+def main():
+    """Main entry point for the near-duplicate CLI."""
+    parser = argparse.ArgumentParser(description="Near-duplicate signatures and variant groups")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    index_parser = subparsers.add_parser("index", help="Backfill signatures and link existing variants")
+    index_parser.add_argument("--policy", choices=POLICIES, help="Override NEAR_DUPLICATE_POLICY")
+    index_parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS,
+                              help=f"Documents per batch (default: {DEFAULT_BATCH_ROWS})")
+    subparsers.add_parser("status", help="Show signature coverage and variant groups")
+    args = parser.parse_args()
+
+    from utils.database import create_cli_app
+    app = create_cli_app()
+
+    with app.app_context():
+        raw_conn = db.engine.raw_connection()
+        try:
+            if args.command == "index":
+                detector = NearDuplicateDetector.from_config(app.config)
+                if args.policy:
+                    detector.policy = args.policy
+                result = index_existing(raw_conn, detector, args.batch_rows)
+                print(f"✓ Indexed {result['indexed']:,} documents, linked {result['linked']:,} variants")
+            else:
+                result = status(raw_conn)
+                print(f"Signatures: {result['indexed']:,} of {result['documents']:,} documents")
+                print(f"Variants:   {result['variants']:,} in {result['groups']:,} groups")
+                for canonical_id, count in result['largest_groups']:
+                    print(f"  document {canonical_id}: {count:,} variants")
+        except Exception as e:
+            raw_conn.rollback()
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        finally:
+            raw_conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
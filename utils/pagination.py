@@ -0,0 +1,104 @@
+"""
+Keyset (cursor) pagination for newest-first listings.
+
+.paginate() costs an OFFSET scan plus a COUNT(*) per page, so deep pages
+on large tables get slower the further back they go. keyset_paginate()
+instead seeks from the last row shown, using the row comparison
+
+    (created_at, id) < (:created_at, :id)
+
+which an index on (created_at, id), or (filter_column, created_at, id)
+for filtered views, answers as a range scan. Every page costs the same.
+
+Pages are addressed by opaque cursors instead of page numbers:
+
+    page = keyset_paginate(query, Document, after=request.args.get('after'),
+                           before=request.args.get('before'), per_page=50)
+    page.items, page.has_next, page.next_cursor, page.has_prev, page.prev_cursor
+
+Rows with a NULL created_at are not reachable by cursor; all three
+listing tables fill created_at on insert.
+"""
+
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor string cannot be decoded."""
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f'{created_at.isoformat()}|{row_id}'.encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        created_at, row_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor!r}') from e
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing."""
+
+    def __init__(self, items: List, per_page: int, has_next: bool, has_prev: bool):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        """Cursor for the page after this one (older rows)."""
+        if not (self.has_next and self.items):
+            return None
+        last = self.items[-1]
+        return encode_cursor(last.created_at, last.id)
+
+    @property
+    def prev_cursor(self) -> Optional[str]:
+        """Cursor for the page before this one (newer rows)."""
+        if not (self.has_prev and self.items):
+            return None
+        first = self.items[0]
+        return encode_cursor(first.created_at, first.id)
+
+
+def keyset_paginate(query, model, after: Optional[str] = None, before: Optional[str] = None,
+                    per_page: int = 20) -> KeysetPage:
+    """
+    Newest-first page of query, seeking from a cursor.
+
+    Args:
+        query: Filtered query over model (no ORDER BY)
+        model: Mapped class with created_at and id columns
+        after: Cursor of the last row on the previous page (older rows)
+        before: Cursor of the first row on the next page (newer rows)
+        per_page: Page size
+
+    Raises:
+        InvalidCursor: If a cursor cannot be decoded
+    """
+    key = tuple_(model.created_at, model.id)
+
+    if before:
+        # Walk backwards: oldest-first from the cursor, then flip
+        rows = query.filter(key > tuple_(*decode_cursor(before))).order_by(
+            model.created_at.asc(), model.id.asc()
+        ).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        return KeysetPage(list(reversed(rows[:per_page])), per_page, has_next=True, has_prev=has_prev)
+
+    if after:
+        query = query.filter(key < tuple_(*decode_cursor(after)))
+    rows = query.order_by(
+        model.created_at.desc(), model.id.desc()
+    ).limit(per_page + 1).all()
+    return KeysetPage(rows[:per_page], per_page, has_next=len(rows) > per_page, has_prev=bool(after))
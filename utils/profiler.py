@@ -0,0 +1,306 @@
+"""
+On-demand request profiling and memory growth tracking.
+
+An admin arms the profiler for one endpoint and a number of requests. The
+next N requests to that endpoint are profiled with one of two collectors:
+
+- cprofile: deterministic cProfile of the request thread, saved as a
+  .prof file (open with pstats, snakeviz, or `python -m pstats`)
+- sampling: a background thread samples the request thread's stack every
+  PROFILE_SAMPLE_INTERVAL seconds and saves collapsed stacks (.folded),
+  ready for flamegraph.pl or speedscope. Overhead is independent of how
+  many Python calls the request makes.
+
+MemoryTracker wraps tracemalloc to diff heap snapshots of the worker, to
+track growth from the embedding model and in-process caches.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+DEFAULT_PROFILE_DIR = 'instance/profiles'
+DEFAULT_SAMPLE_INTERVAL = 0.005  # seconds
+
+
+class CProfileCollector:
+    """Deterministic profiler for the current (request) thread."""
+
+    extension = 'prof'
+
+    # cProfile cannot run two profilers at once on Python 3.12+
+    _active = threading.Lock()
+
+    def start(self):
+        if not self._active.acquire(blocking=False):
+            return False
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return True
+
+    def stop(self, path):
+        self._profile.disable()
+        self._active.release()
+        self._profile.dump_stats(path)
+
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(25)
+        return out.getvalue()
+
+
+class SamplingCollector:
+    """Samples one thread's stack at a fixed interval into collapsed stacks."""
+
+    extension = 'folded'
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+        self._thread.start()
+        return True
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self, path):
+        self._stop.set()
+        self._thread.join()
+
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+        top = self.stacks.most_common(10)
+        lines = [f'{self.samples} samples every {self.interval * 1000:.1f}ms']
+        lines.extend(f'{count:6d}  {stack.rsplit(";", 1)[-1]}' for stack, count in top)
+        return '\n'.join(lines)
+
+
+class RequestProfiler:
+    """
+    Flask extension that profiles the next N requests to an armed endpoint.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.profile_dir = DEFAULT_PROFILE_DIR
+        self.sample_interval = DEFAULT_SAMPLE_INTERVAL
+        self._lock = threading.Lock()
+        self._armed = {}  # endpoint -> {'remaining': int, 'mode': str}
+        self.recent = []  # metadata of finished profiles, newest first
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PROFILING_ENABLED', False)
+        self.profile_dir = app.config.get('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        self.sample_interval = app.config.get('PROFILE_SAMPLE_INTERVAL', DEFAULT_SAMPLE_INTERVAL)
+        app.extensions['profiler'] = self
+
+    def arm(self, endpoint, count, mode='sampling'):
+        """Profile the next `count` requests to `endpoint`."""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        if count < 1:
+            raise ValueError("Request count must be at least 1")
+
+        with self._lock:
+            self._armed[endpoint] = {'remaining': count, 'mode': mode}
+
+    def disarm(self, endpoint=None):
+        with self._lock:
+            if endpoint is None:
+                self._armed.clear()
+            else:
+                self._armed.pop(endpoint, None)
+
+    def armed(self):
+        with self._lock:
+            return {endpoint: dict(state) for endpoint, state in self._armed.items()}
+
+    def start(self, endpoint):
+        """
+        Start a profile for this request if its endpoint is armed.
+
+        Returns:
+            Session dict to pass to stop(), or None
+        """
+        if not self.enabled or endpoint is None:
+            return None
+
+        with self._lock:
+            state = self._armed.get(endpoint)
+            if not state:
+                return None
+            mode = state['mode']
+
+        if mode == 'cprofile':
+            collector = CProfileCollector()
+        else:
+            collector = SamplingCollector(self.sample_interval)
+
+        if not collector.start():
+            # Another cProfile session is running; leave the count untouched
+            return None
+
+        with self._lock:
+            state = self._armed.get(endpoint)
+            if state is not None:
+                state['remaining'] -= 1
+                if state['remaining'] <= 0:
+                    del self._armed[endpoint]
+
+        return {
+            'endpoint': endpoint,
+            'mode': mode,
+            'collector': collector,
+            'started': time.perf_counter(),
+        }
+
+    def stop(self, session, status_code=None):
+        """Finish a profile and write it to PROFILE_DIR."""
+        duration_ms = (time.perf_counter() - session['started']) * 1000
+        collector = session['collector']
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        filename = f"{session['endpoint']}_{timestamp}_{os.getpid()}.{collector.extension}"
+        summary = collector.stop(os.path.join(self.profile_dir, filename))
+
+        meta = {
+            'filename': filename,
+            'endpoint': session['endpoint'],
+            'mode': session['mode'],
+            'duration_ms': round(duration_ms, 2),
+            'status_code': status_code,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'summary': summary,
+        }
+        with self._lock:
+            self.recent.insert(0, meta)
+            del self.recent[50:]
+        return meta
+
+    def list_profiles(self):
+        """Profile files on disk, newest first (includes other workers')."""
+        if not os.path.isdir(self.profile_dir):
+            return []
+
+        files = []
+        for name in os.listdir(self.profile_dir):
+            if not name.endswith(('.prof', '.folded')):
+                continue
+            path = os.path.join(self.profile_dir, name)
+            stat = os.stat(path)
+            files.append({
+                'filename': name,
+                'size': stat.st_size,
+                'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+            })
+        return sorted(files, key=lambda f: f['modified'], reverse=True)
+
+
+class MemoryTracker:
+    """tracemalloc snapshots of this worker, diffed against a baseline."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.baseline = None
+        self.latest = None
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=25):
+        """Start tracing and take the baseline snapshot."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self.baseline = self._take()
+            self.latest = None
+
+    def snapshot(self):
+        """Take a new snapshot to compare against the baseline."""
+        if not tracemalloc.is_tracing():
+            raise ValueError("Memory tracing is not running")
+        with self._lock:
+            self.latest = self._take()
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self.baseline = None
+            self.latest = None
+
+    def diff(self, limit=25):
+        """
+        Top allocation sites by growth between baseline and latest snapshot.
+
+        Returns:
+            Dict with traced memory totals and a list of growth entries
+        """
+        with self._lock:
+            baseline, latest = self.baseline, self.latest
+
+        if baseline is None or latest is None:
+            return {'tracing': self.tracing, 'entries': []}
+
+        stats = latest.compare_to(baseline, 'lineno')
+        current, peak = tracemalloc.get_traced_memory() if self.tracing else (0, 0)
+
+        return {
+            'tracing': self.tracing,
+            'traced_current_bytes': current,
+            'traced_peak_bytes': peak,
+            'entries': [
+                {
+                    'location': str(stat.traceback[0]),
+                    'size_diff_bytes': stat.size_diff,
+                    'size_bytes': stat.size,
+                    'count_diff': stat.count_diff,
+                }
+                for stat in stats[:limit]
+            ]
+        }
+
+    @staticmethod
+    def _take():
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+
+
+# Shared instances, bound to the app in the factory
+profiler = RequestProfiler()
+memory_tracker = MemoryTracker()
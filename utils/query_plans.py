@@ -0,0 +1,311 @@
+"""
+EXPLAIN plan capture and plan-regression checks for the app's hot queries.
+
+Each query in HOT_QUERIES is the SQL the app issues (search legs, fused
+search, dashboard reads, listing pages), run with representative
+parameters drawn from the current data under
+
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+
+inside a transaction that is always rolled back. Plans are reduced to a
+per-node summary (node type, relation, index, estimated vs actual rows,
+shared buffers) and compared against a stored baseline:
+
+- plan_changed: the node shape differs (high severity if a relation that
+  was read through an index is now sequentially scanned)
+- estimate_blowup: a node's row estimate is off by ESTIMATE_FACTOR or more
+  where the baseline was not
+- buffers_increase: total shared buffers grew by BUFFERS_FACTOR and at
+  least BUFFERS_MIN_INCREASE blocks
+
+Usage (via schema_inspector.py):
+    python utils/schema_inspector.py explain --save-baseline
+    python utils/schema_inspector.py explain --fail-on-regression
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+
+from utils.database import db
+
+BASELINE_PATH = '.roo/plans/baseline.json'
+
+ESTIMATE_FACTOR = 10.0
+BUFFERS_FACTOR = 2.0
+BUFFERS_MIN_INCREASE = 100
+
+# Listing cursors are taken this deep into each table, to exercise the seek
+LISTING_DEPTH = 1000
+
+# Monthly partitions (utils/search_partitions.py) are folded into their
+# parent so plans stay comparable as partitions are added and dropped
+PARTITION_SUFFIX = re.compile(r'_(p\d{6}|default)(?=_|$)')
+
+SCAN_NODES = ('Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan', 'Bitmap Index Scan')
+
+VECTOR_LEG_SQL = """
+    SELECT id, 1 - (embedding <=> CAST(:embedding AS vector)) AS similarity
+    FROM documents
+    WHERE embedding IS NOT NULL
+    ORDER BY embedding <=> CAST(:embedding AS vector)
+    LIMIT 50
+"""
+
+KEYWORD_LEG_SQL = """
+    SELECT id, ts_rank(ts_vector, plainto_tsquery('english', :query)) AS rank
+    FROM documents
+    WHERE ts_vector @@ plainto_tsquery('english', :query)
+    ORDER BY rank DESC
+    LIMIT 50
+"""
+
+HOT_QUERIES = {
+    # Reference implementation (app/core/search.py): orders by the similarity
+    # alias, which the ANN index cannot serve
+    'vector_search_reference': """
+        SELECT documents.*, 1 - (embedding <=> CAST(:embedding AS vector)) AS similarity
+        FROM documents
+        WHERE embedding IS NOT NULL
+        ORDER BY similarity DESC
+        LIMIT 50
+    """,
+    'vector_leg': VECTOR_LEG_SQL,
+    'keyword_leg': KEYWORD_LEG_SQL,
+    'fused_search': f"""
+        WITH vector AS (
+            SELECT id, row_number() OVER (ORDER BY similarity DESC) AS rank FROM ({VECTOR_LEG_SQL}) v
+        ), keyword AS (
+            SELECT id, row_number() OVER (ORDER BY rank DESC) AS rank FROM ({KEYWORD_LEG_SQL}) k
+        ), fused AS (
+            SELECT id, sum(1.0 / (60 + rank)) AS score
+            FROM (SELECT * FROM vector UNION ALL SELECT * FROM keyword) legs
+            GROUP BY id
+            ORDER BY score DESC
+            LIMIT 10
+        )
+        SELECT d.* FROM fused JOIN documents d ON d.id = fused.id ORDER BY fused.score DESC
+    """,
+    'dashboard_counters': "SELECT scope, key, count, total, max_value FROM stat_counters",
+    'category_list': """
+        SELECT key FROM stat_counters
+        WHERE scope = 'documents_by_category' AND count > 0 AND key <> '' ORDER BY key
+    """,
+    'score_series': """
+        SELECT date_trunc('day', created_at) AS bucket, model_name,
+               min(score), avg(score), max(score), count(id)
+        FROM model_submissions
+        WHERE score IS NOT NULL AND created_at >= now() - interval '60 days' AND created_at < now()
+        GROUP BY bucket, model_name
+        ORDER BY bucket
+    """,
+    'documents_listing': """
+        SELECT id, title, file_path, embedding, category, created_at FROM documents
+        WHERE (created_at, id) < (:documents_created_at, :documents_id)
+        ORDER BY created_at DESC, id DESC
+        LIMIT 51
+    """,
+    'documents_listing_by_category': """
+        SELECT id, title, file_path, embedding, category, created_at FROM documents
+        WHERE category = :category AND (created_at, id) < (:documents_created_at, :documents_id)
+        ORDER BY created_at DESC, id DESC
+        LIMIT 51
+    """,
+    'search_history': """
+        SELECT * FROM search_queries
+        WHERE (created_at, id) < (:searches_created_at, :searches_id)
+        ORDER BY created_at DESC, id DESC
+        LIMIT 21
+    """,
+    'submission_history_by_model': """
+        SELECT id, model_name, score, passed, status, cache_hit, created_at FROM model_submissions
+        WHERE model_name = :model_name AND (created_at, id) < (:submissions_created_at, :submissions_id)
+        ORDER BY created_at DESC, id DESC
+        LIMIT 21
+    """,
+}
+
+
+def representative_params(conn) -> Dict:
+    """Parameters drawn from current data, with fallbacks for empty tables."""
+    def scalar(sql, default=None):
+        value = conn.execute(text(sql)).scalar()
+        return default if value is None else value
+
+    def cursor(table, prefix):
+        row = conn.execute(text(
+            f"SELECT created_at, id FROM {table} ORDER BY created_at DESC, id DESC "
+            f"OFFSET {LISTING_DEPTH} LIMIT 1"
+        )).first()
+        return {f'{prefix}_created_at': row[0] if row else datetime.utcnow(), f'{prefix}_id': row[1] if row else 0}
+
+    params = {
+        'embedding': scalar(
+            "SELECT embedding::text FROM documents WHERE embedding IS NOT NULL ORDER BY id LIMIT 1",
+            '[' + ','.join(['0.1'] * 384) + ']'
+        ),
+        'query': scalar(
+            "SELECT query FROM search_queries GROUP BY query ORDER BY count(*) DESC LIMIT 1",
+            scalar("SELECT query FROM test_cases ORDER BY id LIMIT 1", 'hybrid search ranking')
+        ),
+        'category': scalar(
+            "SELECT category FROM documents WHERE category IS NOT NULL GROUP BY category "
+            "ORDER BY count(*) DESC LIMIT 1", 'general'
+        ),
+        'model_name': scalar(
+            "SELECT model_name FROM model_submissions WHERE model_name IS NOT NULL GROUP BY model_name "
+            "ORDER BY count(*) DESC LIMIT 1", 'unknown'
+        ),
+    }
+    params.update(cursor('documents', 'documents'))
+    params.update(cursor('search_queries', 'searches'))
+    params.update(cursor('model_submissions', 'submissions'))
+    return params
+
+
+def _summarize(node: Dict, depth: int = 0, out: Optional[List] = None) -> List[Dict]:
+    """Flatten a JSON plan into pre-order node summaries."""
+    out = [] if out is None else out
+    relation, index = node.get('Relation Name'), node.get('Index Name')
+    out.append({
+        'depth': depth,
+        'node_type': node['Node Type'],
+        'relation': PARTITION_SUFFIX.sub('', relation) if relation else None,
+        'index': PARTITION_SUFFIX.sub('', index) if index else None,
+        # Both per loop
+        'plan_rows': node.get('Plan Rows', 0),
+        'actual_rows': node.get('Actual Rows', 0),
+        'shared_hit': node.get('Shared Hit Blocks', 0),
+        'shared_read': node.get('Shared Read Blocks', 0),
+    })
+    for child in node.get('Plans', []):
+        _summarize(child, depth + 1, out)
+    return out
+
+
+def _signature(nodes: List[Dict]) -> List[str]:
+    """Indented node labels; repeated siblings (one per partition) collapse to one."""
+    labels = []
+    for n in nodes:
+        target = n['index'] or n['relation']
+        label = f"{'  ' * n['depth']}{n['node_type']}" + (f" [{target}]" if target else '')
+        if not labels or labels[-1] != label:
+            labels.append(label)
+    return labels
+
+
+def _estimate_factor(node: Dict) -> float:
+    estimated, actual = max(node['plan_rows'], 1), max(node['actual_rows'], 1)
+    return max(estimated / actual, actual / estimated)
+
+
+def capture(names: Optional[Iterable[str]] = None) -> Dict:
+    """Run the hot queries under EXPLAIN ANALYZE and summarize their plans."""
+    names = list(names or HOT_QUERIES)
+    unknown = set(names) - set(HOT_QUERIES)
+    if unknown:
+        raise KeyError(f"Unknown quer{'ies' if len(unknown) > 1 else 'y'}: {', '.join(sorted(unknown))}")
+
+    results = {}
+    with db.engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            params = representative_params(conn)
+            server_version = conn.execute(text("SHOW server_version")).scalar()
+            vector_version = conn.execute(text(
+                "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+            )).scalar()
+            for name in names:
+                raw = conn.execute(
+                    text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {HOT_QUERIES[name]}"), params
+                ).scalar()
+                plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+                nodes = _summarize(plan['Plan'])
+                top = plan['Plan']
+                results[name] = {
+                    'execution_ms': plan.get('Execution Time'),
+                    'planning_ms': plan.get('Planning Time'),
+                    'shared_buffers': top.get('Shared Hit Blocks', 0) + top.get('Shared Read Blocks', 0),
+                    'signature': _signature(nodes),
+                    'nodes': nodes,
+                    'plan': plan,
+                }
+        finally:
+            transaction.rollback()
+
+    return {
+        'captured_at': datetime.now().isoformat(timespec='seconds'),
+        'server_version': server_version,
+        'pgvector_version': vector_version,
+        'queries': results,
+    }
+
+
+def _seq_scanned(nodes: List[Dict]) -> set:
+    return {n['relation'] for n in nodes if n['node_type'] == 'Seq Scan' and n['relation']}
+
+
+def _index_scanned(nodes: List[Dict]) -> set:
+    return {n['relation'] for n in nodes
+            if n['node_type'] in SCAN_NODES and n['node_type'] != 'Seq Scan' and n['relation']}
+
+
+def diff(baseline: Dict, current: Dict) -> List[Dict]:
+    """Regressions of current plans against the baseline."""
+    regressions = []
+    for name, now in current['queries'].items():
+        before = baseline.get('queries', {}).get(name)
+        if before is None:
+            continue
+
+        if now['signature'] != before['signature']:
+            newly_seq = (_seq_scanned(now['nodes']) - _seq_scanned(before['nodes'])) & _index_scanned(before['nodes'])
+            regressions.append({
+                'query': name,
+                'type': 'plan_changed',
+                'severity': 'high' if newly_seq else 'medium',
+                'detail': (f"now sequentially scans {', '.join(sorted(newly_seq))}" if newly_seq
+                           else 'plan shape changed'),
+                'baseline': before['signature'],
+                'current': now['signature'],
+            })
+        elif len(now['nodes']) == len(before['nodes']):
+            for old_node, new_node in zip(before['nodes'], now['nodes']):
+                factor = _estimate_factor(new_node)
+                if factor >= ESTIMATE_FACTOR and _estimate_factor(old_node) < ESTIMATE_FACTOR:
+                    regressions.append({
+                        'query': name,
+                        'type': 'estimate_blowup',
+                        'severity': 'medium',
+                        'detail': (f"{new_node['node_type']}"
+                                   f"{' on ' + new_node['relation'] if new_node['relation'] else ''}: "
+                                   f"estimated {new_node['plan_rows']:,} rows, actual {new_node['actual_rows']:,}"),
+                    })
+
+        increase = now['shared_buffers'] - before['shared_buffers']
+        if increase >= BUFFERS_MIN_INCREASE and now['shared_buffers'] >= before['shared_buffers'] * BUFFERS_FACTOR:
+            regressions.append({
+                'query': name,
+                'type': 'buffers_increase',
+                'severity': 'medium',
+                'detail': f"shared buffers {before['shared_buffers']:,} -> {now['shared_buffers']:,}",
+            })
+    return regressions
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(capture_result: Dict, path: str = BASELINE_PATH) -> str:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(capture_result, f, indent=2, default=str)
+    return path
@@ -0,0 +1,388 @@
+"""
+Sandbox worker pool for parallel grading.
+
+Submissions are no longer exec'd in the web process. A pool of long-lived
+sandbox worker processes (utils/sandbox_worker.py) runs them instead, one
+test case per worker at a time, so a submission's latency scales with the
+number of workers and a hung or crashing submission only costs a worker
+restart.
+
+Each worker is a fresh `python -I -S` interpreter started with resource
+limits (address space, CPU time, no file writes, no child processes, no
+network). Workers are started lazily on first use and reused across
+submissions. A task that exceeds its wall-clock timeout, or a worker that
+dies (SIGXCPU, OOM), is killed and replaced: a task waiting for a worker
+is woken and starts the replacement. Waiting for a worker is bounded by
+the submission's grading deadline (GRADER_DEADLINE); when it passes,
+PoolTimeout fails the submission instead of hanging the grading thread.
+
+Candidate lists come from the grading fixture snapshot
+(utils/grading_fixtures.py). Each worker is sent a snapshot once and keeps
+it, so grading a submission makes no DB or embedding calls.
+
+A case passes when hybrid_search returns exactly the reference RRF (k=60)
+ranking of the candidates it was given; the score is the share of cases
+passed, and a submission passes at GRADER_PASS_SCORE (0.7). The planted
+TestCase.expected_docs are reported per case (expected_docs_found) but do
+not score: every correct fusion of the same candidate lists returns the
+same documents, so they measure the corpus and retrieval legs
+(utils/ir_eval.py), not the submission.
+
+Usage:
+    sandbox_pool = SandboxPool()
+    sandbox_pool.init_app(app)
+    result = sandbox_pool.grade(code)
+"""
+
+import atexit
+import itertools
+import json
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from utils.code_cache import normalized_code_hash, validate_code
+from utils.grading_fixtures import FixtureSet, grading_fixtures
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_worker.py')
+
+# Defaults, overridable through app.config
+DEFAULT_WORKERS = os.cpu_count() or 2
+DEFAULT_TIMEOUT = 30        # seconds per test case (GRADER_TIMEOUT)
+DEFAULT_MEMORY_MB = 256
+DEFAULT_PASS_SCORE = 0.7      # share of cases passed (GRADER_PASS_SCORE)
+DEFAULT_DEADLINE = 300      # seconds for a whole submission (GRADER_DEADLINE)
+
+# Extra wall-clock time on top of the CPU budget before a worker is killed
+TIMEOUT_GRACE = 2.0
+STARTUP_TIMEOUT = 10.0
+
+
+class WorkerError(Exception):
+    """A sandbox worker timed out or died while running a task."""
+
+
+class PoolTimeout(Exception):
+    """No sandbox worker became free before the grading deadline."""
+
+
+class SandboxWorker:
+    """One sandbox subprocess speaking the JSON-lines protocol."""
+
+    def __init__(self, memory_mb: int):
+        self.proc = subprocess.Popen(
+            [sys.executable, '-I', '-S', WORKER_PATH, '--memory-mb', str(memory_mb)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            close_fds=True,
+        )
+        ready = self._read_line(STARTUP_TIMEOUT)
+        if not ready.get('ready'):
+            self.kill()
+            raise WorkerError('Sandbox worker failed to start')
+        self.pid = ready.get('pid')
+        self.tasks_run = 0
+        self.fixture_version = None
+
+    def _read_line(self, timeout: float) -> Dict:
+        readable, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        if not readable:
+            raise WorkerError(f'Execution exceeded {timeout:.0f}s')
+
+        line = self.proc.stdout.readline()
+        if not line:
+            code = self.proc.poll()
+            raise WorkerError(f'Sandbox worker exited (status {code})')
+        return json.loads(line)
+
+    def run(self, task: Dict, timeout: float) -> Dict:
+        """Send one task and wait up to `timeout` seconds for its result."""
+        try:
+            self.proc.stdin.write(json.dumps(task) + '\n')
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise WorkerError('Sandbox worker exited')
+
+        result = self._read_line(timeout)
+        self.tasks_run += 1
+        return result
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def kill(self):
+        if self.alive():
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class SandboxPool:
+    """
+    Flask extension owning the sandbox workers.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.size = DEFAULT_WORKERS
+        self.timeout = DEFAULT_TIMEOUT
+        self.memory_mb = DEFAULT_MEMORY_MB
+        self.pass_score = DEFAULT_PASS_SCORE
+        self.deadline = DEFAULT_DEADLINE
+
+        # Idle workers (most recently used last); _available is notified
+        # whenever a worker is released or discarded
+        self._idle = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._started = 0
+        self._task_ids = itertools.count(1)
+        self._pid = None
+
+        # Counters exposed through stats()
+        self.tasks = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read configuration. Workers start on first use."""
+        self.app = app
+        self.size = app.config.get('GRADER_WORKERS') or DEFAULT_WORKERS
+        self.timeout = app.config.get('GRADER_TIMEOUT', DEFAULT_TIMEOUT)
+        self.memory_mb = app.config.get('GRADER_MEMORY_MB', DEFAULT_MEMORY_MB)
+        self.pass_score = app.config.get('GRADER_PASS_SCORE', DEFAULT_PASS_SCORE)
+        self.deadline = app.config.get('GRADER_DEADLINE', DEFAULT_DEADLINE)
+
+        app.extensions['sandbox_pool'] = self
+        atexit.register(self.shutdown)
+
+    def _check_process(self):
+        # Workers belong to the process that started them; a forked web
+        # worker must not share its parent's pipes.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = []
+                    self._started = 0
+                    self._pid = os.getpid()
+
+    def _acquire(self, deadline: float) -> SandboxWorker:
+        """
+        An idle worker, or a new one while fewer than size are started.
+
+        Raises:
+            PoolTimeout: if neither is available before deadline (time.monotonic())
+        """
+        self._check_process()
+        with self._available:
+            while not self._idle and self._started >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f'No sandbox worker became free within the grading deadline '
+                        f'({self.deadline}s, {self.size} workers busy)'
+                    )
+                self._available.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+
+        try:
+            return SandboxWorker(self.memory_mb)
+        except Exception:
+            with self._available:
+                self._started -= 1
+                self._available.notify()
+            raise
+
+    def _release(self, worker: SandboxWorker):
+        with self._available:
+            self._idle.append(worker)
+            self._available.notify()
+
+    def _discard(self, worker: SandboxWorker):
+        worker.kill()
+        with self._available:
+            self._started -= 1
+            self.restarts += 1
+            # A waiter can now start a replacement
+            self._available.notify()
+
+    def _preload(self, worker: SandboxWorker, fixtures: FixtureSet, payload: Dict):
+        """Send the fixture snapshot to a worker that does not have it yet."""
+        if worker.fixture_version == fixtures.version:
+            return
+        worker.run({
+            'op': 'fixtures',
+            'id': next(self._task_ids),
+            'version': fixtures.version,
+            'cases': payload,
+        }, STARTUP_TIMEOUT)
+        worker.fixture_version = fixtures.version
+
+    def run_task(self, task: Dict, fixtures: Optional[FixtureSet] = None, payload: Optional[Dict] = None,
+                 deadline: Optional[float] = None) -> Dict:
+        """
+        Run one task on an idle worker.
+
+        Args:
+            task: Task dict (code, query, limit and test_id or vector/keyword)
+            fixtures: Snapshot the task's test_id refers to
+            payload: fixtures.worker_payload(), computed once by the caller
+            deadline: time.monotonic() by which a worker must be free
+                (default: GRADER_DEADLINE from now)
+
+        Returns:
+            Worker result dict ({'ok', 'ids' | 'error', 'time'}); 'worker_error'
+            is set when the failure came from the sandbox, not the submission
+
+        Raises:
+            PoolTimeout: if no worker became free before the deadline
+        """
+        task = dict(task, id=next(self._task_ids), cpu_seconds=self.timeout)
+        worker = self._acquire(deadline if deadline is not None else time.monotonic() + self.deadline)
+        try:
+            if fixtures is not None:
+                self._preload(worker, fixtures, payload or fixtures.worker_payload())
+            result = worker.run(task, self.timeout + TIMEOUT_GRACE)
+        except WorkerError as e:
+            self._discard(worker)
+            with self._lock:
+                self.tasks += 1
+                self.timeouts += 1
+            return {'ok': False, 'error': str(e), 'worker_error': True, 'time': None}
+        except Exception:
+            self._discard(worker)
+            raise
+
+        self._release(worker)
+        with self._lock:
+            self.tasks += 1
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'size': self.size,
+                'started': self._started,
+                'idle': len(self._idle),
+                'tasks': self.tasks,
+                'timeouts': self.timeouts,
+                'restarts': self.restarts,
+            }
+
+    def shutdown(self):
+        """Stop all idle workers."""
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._started = 0
+            self._available.notify_all()
+        for worker in idle:
+            worker.kill()
+
+    def grade(self, code: str, limit: int = 10, code_hash: Optional[str] = None) -> Dict:
+        """
+        Grade a submission against every test case in parallel.
+
+        Must be called inside an app context (the fixture snapshot checks
+        the corpus version); execution happens in the sandbox workers.
+
+        Args:
+            code: Submission source
+            limit: Results requested from hybrid_search per test case
+            code_hash: normalized_code_hash(code), if the caller has it;
+                workers cache compiled code under it
+
+        Returns:
+            Dict with score, passed, test_results, execution_time,
+            security_issues, corpus_version and cacheable (False when a
+            case failed for sandbox reasons: worker timeout, crash, stale
+            fixtures), which decides whether the result may be reused
+
+        Raises:
+            PoolTimeout: if test cases could not get a worker within GRADER_DEADLINE
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.deadline
+        code_hash = code_hash or normalized_code_hash(code)
+        fixtures = grading_fixtures.get()
+
+        security_issues = validate_code(code)
+        if security_issues:
+            return {
+                'score': 0.0,
+                'passed': False,
+                'test_results': [],
+                'execution_time': time.perf_counter() - start,
+                'security_issues': list(security_issues),
+                'corpus_version': fixtures.version,
+                'cacheable': True,
+            }
+
+        payload = fixtures.worker_payload()
+        cases = fixtures.cases
+
+        def run_case(case: Dict) -> Dict:
+            expected = case['expected'][:limit]
+            result = self.run_task({
+                'code': code,
+                'code_hash': code_hash,
+                'query': case['query'],
+                'limit': limit,
+                'test_id': case['test_id'],
+                'fixture_version': fixtures.version,
+            }, fixtures, payload, deadline)
+            actual = result.get('ids', [])
+            passed = result['ok'] and actual == expected
+            expected_docs = case.get('expected_docs') or []
+            error = result.get('error')
+            if result['ok'] and not passed:
+                error = 'Ranking does not match expected order'
+            return {
+                'test_id': case['test_id'],
+                'query': case['query'],
+                'category': case['category'],
+                'description': case['description'],
+                'passed': passed,
+                'expected': expected,
+                'actual': actual,
+                'expected_docs': expected_docs,
+                'expected_docs_found': [doc_id for doc_id in expected_docs if doc_id in actual],
+                'error': error,
+                'worker_error': bool(result.get('worker_error')),
+                'execution_time': result.get('time'),
+            }
+
+        if cases:
+            with ThreadPoolExecutor(max_workers=min(self.size, len(cases))) as executor:
+                test_results = list(executor.map(run_case, cases))
+        else:
+            test_results = []
+
+        score = sum(1 for r in test_results if r['passed']) / len(test_results) if test_results else 0.0
+        return {
+            'score': score,
+            'passed': score >= self.pass_score,
+            'test_results': test_results,
+            'execution_time': time.perf_counter() - start,
+            'security_issues': [],
+            'corpus_version': fixtures.version,
+            'cacheable': not any(r['worker_error'] for r in test_results),
+        }
+
+
+# Shared instance, initialized in the app factory
+sandbox_pool = SandboxPool()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Sandbox worker process for grading model-generated code.
+
+Started by utils/sandbox_pool.py as `python -I -S sandbox_worker.py
+--memory-mb N`. Stdlib only, so startup is fast and the address-space
+limit is not eaten by Flask/torch. The worker:
+
+- applies resource limits once: address space, no file writes, no child
+  processes, and a network namespace when the kernel allows it
+- replaces the socket API so code cannot open connections
+- then serves one task per line of JSON on stdin, answering one line of
+  JSON on stdout, until stdin closes
+
+A {"op": "fixtures", "version": ..., "cases": {test_id: [vector, keyword]}}
+line replaces the worker's candidate lists; grading tasks then name a
+test_id instead of carrying their candidates.
+
+Before each task the CPU-time soft limit is moved to "used + cpu_seconds",
+so a runaway task is killed by SIGXCPU and the pool replaces the worker.
+"""
+
+import argparse
+import json
+from collections import OrderedDict
+import os
+import resource
+import socket
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Names model code may use (mirrors the grader's restricted globals).
+# Annotations are evaluated when `def` runs, so every type the task
+# prompt's signature names must be here.
+SAFE_BUILTINS = {
+    'len': len,
+    'sorted': sorted,
+    'enumerate': enumerate,
+    'zip': zip,
+    'range': range,
+    'sum': sum,
+    'min': min,
+    'max': max,
+    'abs': abs,
+    'round': round,
+    'float': float,
+    'int': int,
+    'str': str,
+    'bool': bool,
+    'dict': dict,
+    'list': list,
+    'set': set,
+    'tuple': tuple,
+    'reversed': reversed,
+    'any': any,
+    'all': all,
+    'frozenset': frozenset,
+    'map': map,
+    'filter': filter,
+    'iter': iter,
+    'next': next,
+    'isinstance': isinstance,
+    'ValueError': ValueError,
+    'KeyError': KeyError,
+    'TypeError': TypeError,
+    'IndexError': IndexError,
+    'StopIteration': StopIteration,
+}
+
+
+class SandboxDocument:
+    """Minimal stand-in for app.models.Document inside the sandbox."""
+
+    __slots__ = ('id', 'title', 'category')
+
+    def __init__(self, id, title=None, category=None):
+        self.id = id
+        self.title = title
+        self.category = category
+
+    def __repr__(self):
+        return f'<Document {self.id}>'
+
+
+class StaleFixtures(Exception):
+    """The task names a fixture version this worker does not hold."""
+
+
+def _blocked(*args, **kwargs):
+    raise PermissionError('Network access is disabled in the sandbox')
+
+
+def apply_limits(memory_mb: int):
+    """One-time process hardening, applied before any task runs."""
+    # Own network namespace with no usable interfaces (best effort)
+    unshare = getattr(os, 'unshare', None)
+    if unshare is not None:
+        try:
+            unshare(os.CLONE_NEWUSER | os.CLONE_NEWNET)
+        except (OSError, AttributeError):
+            pass
+
+    socket.socket = _blocked
+    socket.create_connection = _blocked
+    socket.socketpair = _blocked
+    socket.getaddrinfo = _blocked
+
+    limits = [
+        (resource.RLIMIT_AS, memory_mb * 1024 * 1024),
+        (resource.RLIMIT_FSIZE, 0),
+        (resource.RLIMIT_NPROC, 0),
+        (resource.RLIMIT_CORE, 0),
+    ]
+    for limit, value in limits:
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+def _set_cpu_budget(seconds: int):
+    """Allow `seconds` more CPU time from now (soft limit; SIGXCPU after)."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _mock_search(candidates: List[List]):
+    docs = [(SandboxDocument(c[0], *c[2:4]), float(c[1])) for c in candidates]
+
+    def search(query, limit=50):
+        return docs[:limit]
+    return search
+
+
+# Compiled submissions kept per worker, keyed by normalized code hash
+CODE_CACHE_SIZE = 64
+
+
+class Executor:
+    """Compiles and runs submissions, caching compiled code by hash."""
+
+    def __init__(self):
+        self.fixture_version = None
+        self.fixtures = {}
+        self._code_cache = OrderedDict()
+        self.compile_hits = 0
+
+    def load_fixtures(self, task: Dict) -> Dict:
+        self.fixtures = task['cases']
+        self.fixture_version = task['version']
+        return {'ok': True, 'version': self.fixture_version}
+
+    def compile(self, code: str, code_hash: Optional[str] = None):
+        if code_hash is None:
+            return compile(code, '<submission>', 'exec')
+
+        compiled = self._code_cache.get(code_hash)
+        if compiled is not None:
+            self._code_cache.move_to_end(code_hash)
+            self.compile_hits += 1
+            return compiled
+
+        compiled = compile(code, '<submission>', 'exec')
+        self._code_cache[code_hash] = compiled
+        if len(self._code_cache) > CODE_CACHE_SIZE:
+            self._code_cache.popitem(last=False)
+        return compiled
+
+    def run(self, task: Dict) -> Dict:
+        start = time.perf_counter()
+        try:
+            compiled = self.compile(task['code'], task.get('code_hash'))
+            if 'test_id' in task:
+                if task.get('fixture_version') != self.fixture_version:
+                    raise StaleFixtures('Stale grading fixtures in sandbox worker')
+                vector, keyword = self.fixtures[str(task['test_id'])]
+            else:
+                vector, keyword = task['vector'], task['keyword']
+            safe_globals = {
+                '__builtins__': dict(SAFE_BUILTINS),
+                '__name__': 'submission',
+                'List': List,
+                'Tuple': Tuple,
+                'Dict': Dict,
+                'Optional': Optional,
+                'Document': SandboxDocument,
+                '_vector_search': _mock_search(vector),
+                '_keyword_search': _mock_search(keyword),
+            }
+
+            _set_cpu_budget(task.get('cpu_seconds', 30))
+            exec(compiled, safe_globals)
+
+            hybrid_search = safe_globals.get('hybrid_search')
+            if not callable(hybrid_search):
+                raise ValueError('hybrid_search function not found')
+
+            results = hybrid_search(task['query'], limit=task.get('limit', 10))
+            ids = [getattr(doc, 'id', doc) for doc in results]
+            return {'ok': True, 'ids': ids, 'time': time.perf_counter() - start}
+
+        except StaleFixtures as e:
+            return {'ok': False, 'error': str(e), 'worker_error': True, 'time': time.perf_counter() - start}
+        except MemoryError:
+            return {'ok': False, 'error': 'Memory limit exceeded', 'time': time.perf_counter() - start}
+        except Exception as e:
+            return {'ok': False, 'error': f'{type(e).__name__}: {e}', 'time': time.perf_counter() - start}
+
+
+def serve(memory_mb: int):
+    # Keep the real stdout for the protocol; anything the submission
+    # writes to stdout/stderr goes nowhere.
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), 'w', buffering=1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.dup2(devnull, sys.stderr.fileno())
+
+    apply_limits(memory_mb)
+    executor = Executor()
+
+    protocol_out.write(json.dumps({'ready': True, 'pid': os.getpid()}) + '\n')
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        task = json.loads(line)
+        if task.get('op') == 'fixtures':
+            result = executor.load_fixtures(task)
+        else:
+            result = executor.run(task)
+        result['id'] = task.get('id')
+        protocol_out.write(json.dumps(result) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grading sandbox worker')
+    parser.add_argument('--memory-mb', type=int, default=256)
+    args = parser.parse_args()
+    serve(args.memory_mb)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Set-based PostgreSQL catalog introspection with a cached snapshot.
+
+SQLAlchemy's Inspector issues several catalog queries per table
+(columns, primary key, foreign keys, indexes). This module reads the whole
+schema in four queries against pg_catalog, one each for tables, columns,
+constraints and indexes, and assembles a JSON-serializable snapshot:
+
+    {
+        'generated_at': ..., 'schema': 'public', 'fingerprint': ...,
+        'tables': {
+            name: {
+                'kind': 'table' | 'partitioned',
+                'columns': [{'name', 'type', 'nullable', 'default'}],
+                'primary_key': [...],
+                'foreign_keys': [{'name', 'columns', 'references_table', 'references_columns'}],
+                'unique': [{'name', 'columns'}],
+                'checks': [{'name', 'definition'}],
+                'indexes': [{'name', 'method', 'unique', 'primary', 'columns', 'options', 'definition'}],
+            }
+        }
+    }
+
+Partitions are folded into their parent (only the parent is listed).
+get_snapshot() caches the snapshot on disk and revalidates it with a
+single fingerprint query over pg_class/pg_constraint row versions, so
+repeat schema checks cost one round trip until DDL changes something.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import text
+
+from utils.database import db
+
+DEFAULT_SCHEMA = 'public'
+SNAPSHOT_PATH = '.roo/cache/schema_snapshot.json'
+
+TABLES_SQL = """
+    SELECT c.oid, c.relname, c.relkind
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = :schema AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+"""
+
+COLUMNS_SQL = """
+    SELECT a.attrelid, a.attname, format_type(a.atttypid, a.atttypmod), NOT a.attnotnull,
+           pg_get_expr(d.adbin, d.adrelid)
+    FROM pg_attribute a
+    JOIN pg_class c ON c.oid = a.attrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+    WHERE n.nspname = :schema AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+      AND a.attnum > 0 AND NOT a.attisdropped
+    ORDER BY a.attrelid, a.attnum
+"""
+
+CONSTRAINTS_SQL = """
+    SELECT con.conrelid, con.conname, con.contype,
+           ARRAY(SELECT a.attname FROM unnest(con.conkey) WITH ORDINALITY k(attnum, ord)
+                 JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                 ORDER BY k.ord),
+           ref.relname,
+           ARRAY(SELECT a.attname FROM unnest(con.confkey) WITH ORDINALITY k(attnum, ord)
+                 JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+                 ORDER BY k.ord),
+           pg_get_constraintdef(con.oid)
+    FROM pg_constraint con
+    JOIN pg_namespace n ON n.oid = con.connamespace
+    LEFT JOIN pg_class ref ON ref.oid = con.confrelid
+    WHERE n.nspname = :schema AND con.contype IN ('p', 'u', 'f', 'c') AND con.conrelid <> 0
+    ORDER BY con.conrelid, con.conname
+"""
+
+INDEXES_SQL = """
+    SELECT i.indrelid, ic.relname, am.amname, i.indisunique, i.indisprimary,
+           ARRAY(SELECT coalesce(a.attname, pg_get_indexdef(i.indexrelid, k.ord::int, true))
+                 FROM unnest(i.indkey::int2[]) WITH ORDINALITY k(attnum, ord)
+                 LEFT JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                 WHERE k.ord <= i.indnkeyatts
+                 ORDER BY k.ord),
+           ic.reloptions, pg_get_indexdef(i.indexrelid)
+    FROM pg_index i
+    JOIN pg_class ic ON ic.oid = i.indexrelid
+    JOIN pg_class tc ON tc.oid = i.indrelid
+    JOIN pg_namespace n ON n.oid = tc.relnamespace
+    JOIN pg_am am ON am.oid = ic.relam
+    WHERE n.nspname = :schema AND tc.relkind IN ('r', 'p') AND NOT tc.relispartition
+    ORDER BY i.indrelid, ic.relname
+"""
+
+# Row versions of the schema's relations, columns, defaults and constraints:
+# DDL that changes anything in the snapshot rewrites at least one of them
+FINGERPRINT_SQL = """
+    WITH rels AS (
+        SELECT c.oid, c.xmin FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema
+    ), versions AS (
+        SELECT 'c' || oid::text || ':' || xmin::text AS v FROM rels
+        UNION ALL
+        SELECT 'a' || a.attrelid::text || '.' || a.attnum::text || ':' || a.xmin::text
+        FROM pg_attribute a JOIN rels ON rels.oid = a.attrelid WHERE a.attnum > 0
+        UNION ALL
+        SELECT 'd' || d.oid::text || ':' || d.xmin::text
+        FROM pg_attrdef d JOIN rels ON rels.oid = d.adrelid
+        UNION ALL
+        SELECT 'k' || con.oid::text || ':' || con.xmin::text
+        FROM pg_constraint con JOIN pg_namespace n ON n.oid = con.connamespace
+        WHERE n.nspname = :schema
+    )
+    SELECT md5(coalesce(string_agg(v, ',' ORDER BY v), '')) FROM versions
+"""
+
+
+def _parse_options(reloptions) -> Dict[str, str]:
+    """['lists=100'] -> {'lists': '100'}"""
+    return dict(option.split('=', 1) for option in reloptions or [])
+
+
+def schema_fingerprint(schema: str = DEFAULT_SCHEMA) -> str:
+    return db.session.execute(text(FINGERPRINT_SQL), {'schema': schema}).scalar()
+
+
+def build_snapshot(schema: str = DEFAULT_SCHEMA) -> Dict:
+    """Read the whole schema in four catalog queries."""
+    params = {'schema': schema}
+    session = db.session
+
+    names = {}
+    tables = {}
+    for oid, name, kind in session.execute(text(TABLES_SQL), params):
+        names[oid] = name
+        tables[name] = {
+            'kind': 'partitioned' if kind == 'p' else 'table',
+            'columns': [],
+            'primary_key': [],
+            'foreign_keys': [],
+            'unique': [],
+            'checks': [],
+            'indexes': [],
+        }
+
+    for oid, name, type_name, nullable, default in session.execute(text(COLUMNS_SQL), params):
+        tables[names[oid]]['columns'].append({
+            'name': name,
+            'type': type_name,
+            'nullable': nullable,
+            'default': default,
+        })
+
+    for oid, name, kind, columns, ref_table, ref_columns, definition in session.execute(text(CONSTRAINTS_SQL), params):
+        if oid not in names:
+            continue
+        table = tables[names[oid]]
+        if kind == 'p':
+            table['primary_key'] = list(columns)
+        elif kind == 'u':
+            table['unique'].append({'name': name, 'columns': list(columns)})
+        elif kind == 'f':
+            table['foreign_keys'].append({
+                'name': name,
+                'columns': list(columns),
+                'references_table': ref_table,
+                'references_columns': list(ref_columns),
+            })
+        else:
+            table['checks'].append({'name': name, 'definition': definition})
+
+    for oid, name, method, unique, primary, columns, options, definition in session.execute(text(INDEXES_SQL), params):
+        tables[names[oid]]['indexes'].append({
+            'name': name,
+            'method': method,
+            'unique': unique,
+            'primary': primary,
+            'columns': list(columns),
+            'options': _parse_options(options),
+            'definition': definition,
+        })
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'schema': schema,
+        'fingerprint': schema_fingerprint(schema),
+        'tables': dict(sorted(tables.items())),
+    }
+
+
+def get_snapshot(schema: str = DEFAULT_SCHEMA, path: Optional[str] = SNAPSHOT_PATH,
+                 refresh: bool = False) -> Dict:
+    """
+    Cached snapshot, rebuilt only when the schema fingerprint changed.
+
+    Args:
+        schema: Schema to introspect
+        path: Snapshot file (None disables the disk cache)
+        refresh: Rebuild even if the cached fingerprint matches
+    """
+    if path and not refresh and os.path.exists(path):
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+            if cached.get('schema') == schema and cached.get('fingerprint') == schema_fingerprint(schema):
+                return cached
+        except (OSError, ValueError):
+            pass
+
+    snapshot = build_snapshot(schema)
+    if path:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+    return snapshot
+
+
+def select_tables(snapshot: Dict, tables: Optional[Iterable[str]] = None) -> Dict:
+    """Copy of the snapshot restricted to the given tables (all if empty)."""
+    if not tables:
+        return snapshot
+    wanted = set(tables)
+    missing = wanted - set(snapshot['tables'])
+    if missing:
+        raise KeyError(f"Unknown table(s): {', '.join(sorted(missing))}")
+    return {**snapshot, 'tables': {name: t for name, t in snapshot['tables'].items() if name in wanted}}
+
+
+def snapshot_digest(snapshot: Dict) -> str:
+    """Content hash of the tables section (stable across regenerations)."""
+    payload = json.dumps(snapshot['tables'], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
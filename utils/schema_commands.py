@@ -7,31 +7,49 @@ This module provides the implementation for database schema comparison,
 documentation generation, and validation commands.
 """
 
+import html
 import json
 import os
 from datetime import datetime
-from sqlalchemy import inspect as sqlalchemy_inspect
+from sqlalchemy import text
 from utils.database import db
+from utils.schema_catalog import get_snapshot, select_tables, snapshot_digest
+
+# format_type() names -> the names SQLAlchemy's Inspector reported, so
+# compare_schemas() keeps matching model types the same way
+_CATALOG_TYPE_NAMES = {
+    'character varying': 'VARCHAR',
+    'character': 'CHAR',
+    'timestamp without time zone': 'TIMESTAMP',
+    'timestamp with time zone': 'TIMESTAMP',
+    'double precision': 'DOUBLE PRECISION',
+}
+
+def _inspector_type_name(type_name):
+    base, paren, rest = type_name.partition('(')
+    base = _CATALOG_TYPE_NAMES.get(base.strip(), base.strip().upper())
+    return f"{base}{paren}{rest}"
 
 # [Created] by Roo | 2025-10-28_1
-def get_db_schema():
+def get_db_schema(snapshot=None):
     """
     Get database schema information from PGDB.
     Returns dict mapping table names to their column/constraint info.
+    
+    Built from the cached catalog snapshot (utils/schema_catalog.py): a few
+    set-based pg_catalog queries instead of Inspector calls per table.
     """
-    inspector = sqlalchemy_inspect(db.engine)
+    snapshot = snapshot or get_snapshot()
     db_schema = {}
     
-    for table_name in inspector.get_table_names():
-        columns = inspector.get_columns(table_name)
-        pk_constraint = inspector.get_pk_constraint(table_name)
-        
+    for table_name, table in snapshot['tables'].items():
+        columns = table['columns']
         db_schema[table_name] = {
             'columns': [col['name'] for col in columns],
-            'column_types': {col['name']: str(col['type']) for col in columns},
+            'column_types': {col['name']: _inspector_type_name(col['type']) for col in columns},
             'nullable': {col['name']: col['nullable'] for col in columns},
-            'primary_keys': pk_constraint['constrained_columns'] if pk_constraint else [],
-            'foreign_keys': [fk['constrained_columns'] for fk in inspector.get_foreign_keys(table_name)]
+            'primary_keys': table['primary_key'],
+            'foreign_keys': [fk['columns'] for fk in table['foreign_keys']]
         }
     
     return db_schema
@@ -267,11 +285,487 @@ def run_compare_db_models(args):
 def run_compare_models_doc(args):
     return {'status': 'error', 'error': 'Not yet implemented'}
 
+REPORTS_DIR = '.roo/reports'
+REPORT_SECTIONS = ['schema', 'models', 'discrepancies', 'statistics']
+
+# Column types left out of --include-samples (large, unreadable values)
+_SAMPLE_SKIP_TYPES = ('vector', 'tsvector', 'bytea')
+SAMPLE_ROWS = 3
+SAMPLE_VALUE_WIDTH = 60
+
+def _write_output(path, content):
+    """Write a report file, creating its directory."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+    return path
+
+def _format_columns(column):
+    flags = []
+    if not column['nullable']:
+        flags.append('NOT NULL')
+    if column['default'] is not None:
+        flags.append(f"DEFAULT {column['default']}")
+    return ' '.join(flags)
+
+def _index_label(index):
+    label = f"{index['name']} ({index['method']}: {', '.join(index['columns'])})"
+    if index['options']:
+        label += ' ' + ', '.join(f"{k}={v}" for k, v in index['options'].items())
+    return label
+
+def _render_snapshot_table(snapshot):
+    """Plain-text rendering of a catalog snapshot."""
+    lines = []
+    for name, table in snapshot['tables'].items():
+        title = f"{name}{' (partitioned)' if table['kind'] == 'partitioned' else ''}"
+        lines.extend([title, '=' * len(title)])
+        width = max((len(col['name']) for col in table['columns']), default=0)
+        type_width = max((len(col['type']) for col in table['columns']), default=0)
+        for col in table['columns']:
+            pk = 'PK' if col['name'] in table['primary_key'] else '  '
+            lines.append(f"  {pk} {col['name']:<{width}}  {col['type']:<{type_width}}  {_format_columns(col)}".rstrip())
+        for fk in table['foreign_keys']:
+            lines.append(f"  FK {', '.join(fk['columns'])} -> {fk['references_table']}({', '.join(fk['references_columns'])})")
+        for index in table['indexes']:
+            lines.append(f"  IX {_index_label(index)}")
+        lines.append('')
+    return '\n'.join(lines)
+
+def _render_yaml(data):
+    try:
+        import yaml
+    except ImportError:
+        raise RuntimeError("YAML output requires PyYAML: pip install pyyaml")
+    return yaml.safe_dump(data, sort_keys=False, default_flow_style=False)
+
+def run_introspect(args):
+    """
+    Introspect PGDB schema from the cached catalog snapshot.
+    Writes json/yaml/table output to --output or .roo/reports/.
+    """
+    try:
+        snapshot = get_snapshot(refresh=getattr(args, 'refresh', False))
+        selected = select_tables(snapshot, getattr(args, 'tables', None))
+        
+        fmt = getattr(args, 'format', 'json')
+        if fmt == 'table':
+            content, ext = _render_snapshot_table(selected), 'txt'
+        elif fmt == 'yaml':
+            content, ext = _render_yaml(selected), 'yaml'
+        else:
+            content, ext = json.dumps(selected, indent=2, default=str), 'json'
+        
+        output_file = getattr(args, 'output', None) or os.path.join(REPORTS_DIR, f'schema_introspect.{ext}')
+        _write_output(output_file, content)
+        
+        return {
+            'status': 'success',
+            'output_file': output_file,
+            'tables': len(selected['tables']),
+            'fingerprint': snapshot['fingerprint']
+        }
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
+
+def _sample_rows(table_name, table):
+    """First rows of a table for documentation (large column types skipped)."""
+    columns = [col['name'] for col in table['columns'] if not col['type'].startswith(_SAMPLE_SKIP_TYPES)]
+    if not columns:
+        return columns, []
+    column_list = ', '.join(f'"{name}"' for name in columns)
+    rows = db.session.execute(text(f'SELECT {column_list} FROM "{table_name}" LIMIT {SAMPLE_ROWS}')).all()
+    
+    def cell(value):
+        value = '' if value is None else str(value).replace('\n', ' ')
+        return value if len(value) <= SAMPLE_VALUE_WIDTH else value[:SAMPLE_VALUE_WIDTH - 1] + '…'
+    
+    return columns, [[cell(value) for value in row] for row in rows]
+
+def _docs_markdown(snapshot, samples):
+    lines = [
+        "# Database Schema",
+        f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} from PGDB (schema `{snapshot['schema']}`, "
+        f"digest `{snapshot_digest(snapshot)}`)",
+        ""
+    ]
+    for name, table in snapshot['tables'].items():
+        lines.extend([f"## `{name}`" + (" (partitioned)" if table['kind'] == 'partitioned' else ""), ""])
+        lines.extend(["| Column | Type | Nullable | Default | Key |", "|---|---|---|---|---|"])
+        fk_columns = {col: fk for fk in table['foreign_keys'] for col in fk['columns']}
+        for col in table['columns']:
+            key = 'PK' if col['name'] in table['primary_key'] else ''
+            if col['name'] in fk_columns:
+                fk = fk_columns[col['name']]
+                key = (key + ' ' if key else '') + f"FK → `{fk['references_table']}`"
+            lines.append(
+                f"| `{col['name']}` | {col['type']} | {'yes' if col['nullable'] else 'no'} | "
+                f"{col['default'] or ''} | {key} |"
+            )
+        if table['indexes']:
+            lines.extend(["", "**Indexes**", ""])
+            lines.extend(f"- `{index['definition']}`" for index in table['indexes'])
+        if table['checks'] or table['unique']:
+            lines.extend(["", "**Constraints**", ""])
+            lines.extend(f"- `{u['name']}`: UNIQUE ({', '.join(u['columns'])})" for u in table['unique'])
+            lines.extend(f"- `{c['name']}`: {c['definition']}" for c in table['checks'])
+        if name in samples:
+            columns, rows = samples[name]
+            if rows:
+                lines.extend(["", "**Sample rows**", ""])
+                lines.append("| " + " | ".join(columns) + " |")
+                lines.append("|" + "---|" * len(columns))
+                lines.extend("| " + " | ".join(v.replace('|', '\\|') for v in row) + " |" for row in rows)
+        lines.append("")
+    return '\n'.join(lines)
+
+def _docs_html(snapshot, samples):
+    esc = html.escape
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Database Schema</title></head><body>",
+        f"<h1>Database Schema</h1><p>Generated {esc(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))} "
+        f"(schema {esc(snapshot['schema'])}, digest {snapshot_digest(snapshot)})</p>"
+    ]
+    for name, table in snapshot['tables'].items():
+        parts.append(f"<h2>{esc(name)}</h2><table border=\"1\"><tr><th>Column</th><th>Type</th>"
+                     "<th>Nullable</th><th>Default</th><th>PK</th></tr>")
+        for col in table['columns']:
+            parts.append(
+                f"<tr><td>{esc(col['name'])}</td><td>{esc(col['type'])}</td>"
+                f"<td>{'yes' if col['nullable'] else 'no'}</td><td>{esc(col['default'] or '')}</td>"
+                f"<td>{'✓' if col['name'] in table['primary_key'] else ''}</td></tr>"
+            )
+        parts.append("</table>")
+        if table['indexes']:
+            parts.append("<ul>" + "".join(f"<li><code>{esc(i['definition'])}</code></li>" for i in table['indexes']) + "</ul>")
+        if name in samples and samples[name][1]:
+            columns, rows = samples[name]
+            parts.append("<table border=\"1\"><tr>" + "".join(f"<th>{esc(c)}</th>" for c in columns) + "</tr>")
+            parts.extend("<tr>" + "".join(f"<td>{esc(v)}</td>" for v in row) + "</tr>" for row in rows)
+            parts.append("</table>")
+    parts.append("</body></html>")
+    return '\n'.join(parts)
+
 def run_generate_docs(args):
-    return {'status': 'error', 'error': 'Not yet implemented'}
+    """
+    Generate schema documentation (markdown/html/json) from the catalog snapshot.
+    """
+    try:
+        snapshot = get_snapshot()
+        samples = {}
+        if getattr(args, 'include_samples', False):
+            samples = {name: _sample_rows(name, table) for name, table in snapshot['tables'].items()}
+        
+        fmt = getattr(args, 'format', 'markdown')
+        if fmt == 'json':
+            data = dict(snapshot)
+            if samples:
+                data['samples'] = {name: {'columns': c, 'rows': r} for name, (c, r) in samples.items()}
+            content = json.dumps(data, indent=2, default=str)
+        elif fmt == 'html':
+            content = _docs_html(snapshot, samples)
+        else:
+            content = _docs_markdown(snapshot, samples)
+        
+        output_file = _write_output(args.output, content)
+        print(f"✓ Documented {len(snapshot['tables'])} tables")
+        return {'status': 'success', 'output_file': output_file, 'tables': len(snapshot['tables'])}
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
+
+def _schema_section(snapshot):
+    tables = snapshot['tables']
+    return {
+        'tables': len(tables),
+        'columns': sum(len(t['columns']) for t in tables.values()),
+        'indexes': sum(len(t['indexes']) for t in tables.values()),
+        'foreign_keys': sum(len(t['foreign_keys']) for t in tables.values()),
+        'by_table': {
+            name: {
+                'kind': t['kind'],
+                'columns': len(t['columns']),
+                'indexes': [_index_label(i) for i in t['indexes']],
+            }
+            for name, t in tables.items()
+        }
+    }
+
+def _models_section(model_schema):
+    return {
+        'models': len(model_schema),
+        'by_model': {
+            info['model_class']: {'table': table, 'columns': len(info['columns'])}
+            for table, info in sorted(model_schema.items())
+        }
+    }
+
+def _discrepancies_section(discrepancies):
+    by_severity = {'high': 0, 'medium': 0, 'low': 0}
+    for d in discrepancies:
+        by_severity[d.get('severity', 'low')] += 1
+    return {'total': len(discrepancies), 'by_severity': by_severity, 'items': discrepancies}
+
+def _statistics_section(snapshot):
+    from utils.schema_stats import collect_statistics
+    return collect_statistics(snapshot, snapshot['schema'])
+
+def _size(num_bytes):
+    """Human-readable byte count."""
+    value = float(num_bytes or 0)
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+def _ratio(value):
+    return '-' if value is None else f"{value:.0%}"
+
+def _statistics_rows(stats, verbose):
+    """(title, headers, rows) tables shared by the table and markdown renderers."""
+    tables = [t for t in stats['tables'] if verbose or not t['partition']]
+    blocks = [(
+        'Tables',
+        ['Table', 'Total', 'Heap', 'Indexes', 'TOAST', 'Live', 'Dead', 'Bloat', 'Seq scans', 'Idx scans', 'Last analyze'],
+        [[t['table'], _size(t['total_bytes']), _size(t['heap_bytes']), _size(t['index_bytes']),
+          _size(t['toast_bytes']), f"{t['live_tuples']:,}", f"{t['dead_tuples']:,} ({_ratio(t['dead_ratio'])})",
+          _ratio(t['bloat_ratio']), f"{t['seq_scan']:,}", f"{t['idx_scan']:,}",
+          str(t['last_analyze'])[:16] if t['last_analyze'] else 'never'] for t in tables]
+    )]
+    indexes = stats['indexes'] if verbose else stats['indexes'][:20]
+    blocks.append((
+        'Indexes',
+        ['Index', 'Table', 'Method', 'Size', 'Scans', 'Tuples read'],
+        [[i['index'], i['table'], i['method'], _size(i['bytes']), f"{i['idx_scan']:,}", f"{i['idx_tup_read']:,}"]
+         for i in indexes]
+    ))
+    if stats['ann_indexes']:
+        blocks.append((
+            'ANN indexes',
+            ['Index', 'Method', 'Rows', 'Parameters', 'Search setting'],
+            [[a['index'], a['method'], f"{a['rows']:,}",
+              f"lists={a['lists']} (recommended {a['recommended_lists']})" if a['method'] == 'ivfflat'
+              else f"m={a['m']}, ef_construction={a['ef_construction']}",
+              f"probes={a['probes']}" if a['method'] == 'ivfflat' else f"ef_search={a['ef_search']}"]
+             for a in stats['ann_indexes']]
+        ))
+    content = stats['documents_content']
+    if content:
+        blocks.append((
+            'document_contents.content storage',
+            ['Sampled rows', 'Avg length', 'Avg stored', 'Out of line', 'TOAST size'],
+            [[f"{content['sampled_rows']:,}", _size(content['avg_length_bytes']), _size(content['avg_stored_bytes']),
+              _ratio(content['toasted_share']), _size(content['toast_bytes'])]]
+        ))
+    if stats['missing_indexes']:
+        blocks.append((
+            'Missing indexes for hot queries',
+            ['Query', 'Suggestion'],
+            [[m['query'], m['suggestion']] for m in stats['missing_indexes']]
+        ))
+    if stats['unused_indexes']:
+        blocks.append((
+            'Unused indexes (0 scans since stats reset)',
+            ['Index', 'Table', 'Size'],
+            [[u['index'], u['table'], _size(u['bytes'])] for u in stats['unused_indexes']]
+        ))
+    return blocks
+
+def _text_table(headers, rows):
+    widths = [max(len(str(v)) for v in column) for column in zip(headers, *rows)]
+    lines = [('  ' + '  '.join(f"{h:<{w}}" for h, w in zip(headers, widths))).rstrip()]
+    lines.append('  ' + '  '.join('-' * w for w in widths))
+    lines.extend(('  ' + '  '.join(f"{str(v):<{w}}" for v, w in zip(row, widths))).rstrip() for row in rows)
+    return lines
+
+def _render_report_table(report, verbose):
+    lines = [f"Schema Report - {report['generated_at']}", ""]
+    sections = report['sections']
+    if 'schema' in sections:
+        s = sections['schema']
+        lines.append(f"Schema: {s['tables']} tables, {s['columns']} columns, {s['indexes']} indexes, "
+                     f"{s['foreign_keys']} foreign keys")
+        for name, t in s['by_table'].items():
+            lines.append(f"  {name:<30} {t['columns']:>3} columns  {len(t['indexes']):>2} indexes")
+            if verbose:
+                lines.extend(f"      {label}" for label in t['indexes'])
+        lines.append("")
+    if 'models' in sections:
+        m = sections['models']
+        lines.append(f"Models: {m['models']}")
+        for model, info in m['by_model'].items():
+            lines.append(f"  {model:<30} {info['table']:<30} {info['columns']:>3} columns")
+        lines.append("")
+    if 'discrepancies' in sections:
+        d = sections['discrepancies']
+        sev = d['by_severity']
+        lines.append(f"Discrepancies: {d['total']} (high {sev['high']}, medium {sev['medium']}, low {sev['low']})")
+        items = d['items'] if verbose else [i for i in d['items'] if i.get('severity') != 'low']
+        for item in items:
+            where = item['table'] + (f".{item['column']}" if 'column' in item else '')
+            lines.append(f"  [{item['severity']}] {where}: {item['type']}")
+        lines.append("")
+    if 'statistics' in sections:
+        stats = sections['statistics']
+        lines.append(f"Statistics: {len(stats['findings'])} finding(s)")
+        lines.extend(f"  ! {finding}" for finding in stats['findings'])
+        lines.append("")
+        for title, headers, rows in _statistics_rows(stats, verbose):
+            lines.append(title)
+            lines.extend(_text_table(headers, rows))
+            lines.append("")
+    return '\n'.join(lines)
+
+def _render_report_markdown(report, verbose):
+    lines = ["# Schema Report", f"Generated: {report['generated_at']}", ""]
+    sections = report['sections']
+    if 'schema' in sections:
+        s = sections['schema']
+        lines.extend(["## Schema", "", f"{s['tables']} tables, {s['columns']} columns, {s['indexes']} indexes, "
+                      f"{s['foreign_keys']} foreign keys", "", "| Table | Columns | Indexes |", "|---|---|---|"])
+        for name, t in s['by_table'].items():
+            indexes = '<br>'.join(f"`{label}`" for label in t['indexes']) if verbose else len(t['indexes'])
+            lines.append(f"| `{name}` | {t['columns']} | {indexes} |")
+        lines.append("")
+    if 'models' in sections:
+        lines.extend(["## Models", "", "| Model | Table | Columns |", "|---|---|---|"])
+        for model, info in sections['models']['by_model'].items():
+            lines.append(f"| {model} | `{info['table']}` | {info['columns']} |")
+        lines.append("")
+    if 'discrepancies' in sections:
+        d = sections['discrepancies']
+        lines.extend(["## Discrepancies", "", f"- Total: {d['total']}"])
+        lines.extend(f"- {sev.title()}: {count}" for sev, count in d['by_severity'].items())
+        lines.append("")
+        items = d['items'] if verbose else [i for i in d['items'] if i.get('severity') != 'low']
+        for item in items:
+            where = item['table'] + (f".{item['column']}" if 'column' in item else '')
+            lines.append(f"- **{item['severity']}** `{where}`: {item['type']}")
+        lines.append("")
+    if 'statistics' in sections:
+        stats = sections['statistics']
+        lines.extend(["## Statistics", "", "### Findings", ""])
+        lines.extend(f"- {finding}" for finding in stats['findings'])
+        if not stats['findings']:
+            lines.append("- None")
+        lines.append("")
+        for title, headers, rows in _statistics_rows(stats, verbose):
+            lines.extend([f"### {title}", "", "| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)])
+            lines.extend("| " + " | ".join(str(v) for v in row) + " |" for row in rows)
+            lines.append("")
+    return '\n'.join(lines)
 
 def run_report(args):
-    return {'status': 'error', 'error': 'Not yet implemented'}
+    """
+    Summary report over the catalog snapshot and ORM models.
+    Sections: schema, models, discrepancies, statistics.
+    """
+    try:
+        wanted = getattr(args, 'sections', None) or REPORT_SECTIONS
+        verbose = getattr(args, 'verbose', False)
+        
+        snapshot = get_snapshot()
+        model_schema = get_model_schema() if {'models', 'discrepancies'} & set(wanted) else None
+        
+        sections = {}
+        if 'schema' in wanted:
+            sections['schema'] = _schema_section(snapshot)
+        if 'models' in wanted:
+            sections['models'] = _models_section(model_schema)
+        if 'discrepancies' in wanted:
+            sections['discrepancies'] = _discrepancies_section(
+                compare_schemas(get_db_schema(snapshot), model_schema)
+            )
+        if 'statistics' in wanted:
+            sections['statistics'] = _statistics_section(snapshot)
+        
+        report = {'generated_at': datetime.now().isoformat(timespec='seconds'), 'sections': sections}
+        
+        fmt = getattr(args, 'format', 'table')
+        if fmt == 'json':
+            content = json.dumps(report, indent=2, default=str)
+        elif fmt == 'markdown':
+            content = _render_report_markdown(report, verbose)
+        elif fmt == 'html':
+            content = "<!DOCTYPE html><html><body><pre>" + html.escape(_render_report_table(report, verbose)) + "</pre></body></html>"
+        else:
+            content = _render_report_table(report, verbose)
+        
+        result = {'status': 'success', 'content': content}
+        if getattr(args, 'output', None):
+            result['output_file'] = _write_output(args.output, content)
+        return result
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
 
-def run_introspect(args):
-    return {'status': 'error', 'error': 'Not yet implemented'}
\ No newline at end of file
+def _render_explain(capture_result, regressions, baseline, markdown=False):
+    lines = []
+    header = (f"Plans captured {capture_result['captured_at']} (PostgreSQL {capture_result['server_version']}, "
+              f"pgvector {capture_result['pgvector_version'] or 'n/a'})")
+    if baseline:
+        header += f"; baseline {baseline['captured_at']} (PostgreSQL {baseline['server_version']})"
+    lines.extend(["# Query Plans" if markdown else "Query Plans", header, ""])
+    
+    headers = ['Query', 'Time (ms)', 'Buffers', 'Top scan']
+    rows = []
+    for name, result in capture_result['queries'].items():
+        scans = [n for n in result['nodes'] if n['node_type'] in ('Seq Scan', 'Index Scan', 'Index Only Scan',
+                                                                  'Bitmap Heap Scan')]
+        top_scan = f"{scans[0]['node_type']} [{scans[0]['index'] or scans[0]['relation']}]" if scans else '-'
+        rows.append([name, f"{result['execution_ms']:.2f}", f"{result['shared_buffers']:,}", top_scan])
+    if markdown:
+        lines.extend(["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)])
+        lines.extend("| " + " | ".join(row) + " |" for row in rows)
+    else:
+        lines.extend(_text_table(headers, rows))
+    lines.append("")
+    
+    if baseline is None:
+        lines.append("No baseline; run with --save-baseline to record one.")
+    elif not regressions:
+        lines.append("No plan regressions against the baseline.")
+    else:
+        lines.append(f"{'## ' if markdown else ''}Regressions: {len(regressions)}")
+        for r in regressions:
+            lines.append(f"{'- ' if markdown else '  '}[{r['severity']}] {r['query']}: {r['type']} - {r['detail']}")
+            if r['type'] == 'plan_changed':
+                fence = ["```"] if markdown else []
+                lines.extend(fence + ["    baseline:"] + [f"      {l}" for l in r['baseline']] +
+                             ["    current:"] + [f"      {l}" for l in r['current']] + fence)
+    return '\n'.join(lines)
+
+def run_explain(args):
+    """
+    Capture EXPLAIN (ANALYZE, BUFFERS) plans for the hot queries and diff them
+    against the stored baseline (utils/query_plans.py).
+    """
+    from utils.query_plans import BASELINE_PATH, capture, diff, load_baseline, save_baseline
+    
+    try:
+        baseline_path = getattr(args, 'baseline', None) or BASELINE_PATH
+        capture_result = capture(getattr(args, 'queries', None))
+        baseline = load_baseline(baseline_path)
+        regressions = diff(baseline, capture_result) if baseline else []
+        
+        fmt = getattr(args, 'format', 'table')
+        if fmt == 'json':
+            content = json.dumps({
+                'capture': capture_result,
+                'baseline_captured_at': baseline['captured_at'] if baseline else None,
+                'regressions': regressions
+            }, indent=2, default=str)
+        else:
+            content = _render_explain(capture_result, regressions, baseline, markdown=(fmt == 'markdown'))
+        
+        result = {'status': 'success', 'content': content, 'regressions': len(regressions)}
+        if getattr(args, 'save_baseline', False):
+            if baseline is not None and getattr(args, 'queries', None):
+                # Partial capture: keep the other queries' baselines
+                baseline['queries'].update(capture_result['queries'])
+                capture_result = {**capture_result, 'queries': baseline['queries']}
+            result['baseline_file'] = save_baseline(capture_result, baseline_path)
+        if getattr(args, 'output', None):
+            result['output_file'] = _write_output(args.output, content)
+        return result
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
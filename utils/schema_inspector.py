@@ -21,6 +21,7 @@ Subcommands:
     compare-models-doc Compare ORM models vs schema doc
     generate-docs      Generate schema docs from PGDB
     report             Generate human-readable summary report
+    explain            Capture hot-query plans and diff against a baseline
 """
 
 import argparse
@@ -39,6 +40,7 @@ from utils.database import db
 from utils.schema_commands import (
     run_compare_db_models,
     run_compare_models_doc,
+    run_explain,
     run_generate_docs,
     run_report,
 )
@@ -79,6 +81,11 @@ def cmd_report(args):
     return run_report(args)
 
 
+def cmd_explain(args):
+    """Capture EXPLAIN plans for hot queries and flag regressions against the baseline."""
+    return run_explain(args)
+
+
 def create_parser():
     """Create and configure the argument parser with subcommands."""
     parser = argparse.ArgumentParser(
@@ -90,6 +97,8 @@ Examples:
     %(prog)s compare-db-models --verbose --format json
     %(prog)s generate-docs --output docs/schema.md
     %(prog)s report --format table --output report.txt
+    %(prog)s explain --save-baseline
+    %(prog)s explain --fail-on-regression
         """
     )
     
@@ -121,6 +130,11 @@ Examples:
         nargs="*",
         help="Specific tables to introspect (default: all tables)"
     )
+    introspect_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Rebuild the cached catalog snapshot even if the schema is unchanged"
+    )
     introspect_parser.set_defaults(func=cmd_introspect)
     
     # Compare DB vs Models subcommand
@@ -221,6 +235,44 @@ Examples:
     )
     report_parser.set_defaults(func=cmd_report)
     
+    # Explain subcommand
+    explain_parser = subparsers.add_parser(
+        "explain",
+        help="Capture hot-query EXPLAIN (ANALYZE, BUFFERS) plans and diff against a baseline"
+    )
+    explain_parser.add_argument(
+        "--queries",
+        nargs="*",
+        help="Specific hot queries to explain (default: all)"
+    )
+    explain_parser.add_argument(
+        "--baseline",
+        help="Baseline file (default: .roo/plans/baseline.json)",
+        metavar="FILE"
+    )
+    explain_parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store this run's plans as the new baseline"
+    )
+    explain_parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with status 1 if any regression is flagged"
+    )
+    explain_parser.add_argument(
+        "--output", "-o",
+        help="Output file path (default: stdout)",
+        metavar="FILE"
+    )
+    explain_parser.add_argument(
+        "--format", "-f",
+        choices=["table", "markdown", "json"],
+        default="table",
+        help="Output format (default: table)"
+    )
+    explain_parser.set_defaults(func=cmd_explain)
+    
     return parser
 
 
@@ -258,10 +310,16 @@ def main():
                     print(f"Schema report available at: {result['output_file']}")
             else:
                 # For other commands, handle output formatting
-                if args.output:
-                    print(f"Output would be written to: {args.output}")
+                if result.get("output_file"):
+                    print(f"Output written to: {result['output_file']}")
+                elif "content" in result:
+                    print(result["content"])
                 else:
                     print(json.dumps(result, indent=2))
+                if result.get("baseline_file"):
+                    print(f"Baseline saved to: {result['baseline_file']}")
+                if getattr(args, "fail_on_regression", False) and result.get("regressions"):
+                    return 1
         else:
             # Error occurred
             print(f"Command failed: {result.get('error', 'Unknown error')}", file=sys.stderr)
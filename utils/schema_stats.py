@@ -0,0 +1,268 @@
+"""
+Database performance statistics for `schema_inspector.py report --sections statistics`.
+
+Collected from pg_class, pg_stat_user_tables, pg_stat_user_indexes and
+pg_stats in a handful of set-based queries:
+
+- table sizes (heap, indexes, TOAST), live/dead tuples, last (auto)vacuum
+  and analyze, sequential vs index scans
+- index sizes and scan counts; unused non-unique indexes
+- a bloat estimate per table (actual heap size vs rows x average width)
+- TOAST footprint of document_contents.content, sampled
+- ANN index parameters against the current row count: ivfflat lists
+  (recommended rows/1000 up to 1M rows, sqrt(rows) beyond), hnsw m /
+  ef_construction, plus the session's probes / ef_search
+- missing indexes for the app's hot queries (HOT_QUERY_INDEXES, checked
+  against the catalog snapshot) and tables that are mostly seq-scanned
+
+Everything is an estimate from statistics views; counters reset with
+pg_stat_reset() and depend on ANALYZE having run.
+"""
+
+import math
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from utils.database import db
+
+# Thresholds for findings
+DEAD_TUPLE_RATIO_WARN = 0.2
+BLOAT_RATIO_WARN = 0.3
+BLOAT_MIN_BYTES = 10 * 1024 * 1024      # ignore bloat on small tables
+SEQ_SCAN_MIN_ROWS = 10000               # tables smaller than this are fine to seq-scan
+SEQ_SCAN_RATIO_WARN = 0.5               # share of scans that are sequential
+IVFFLAT_LISTS_TOLERANCE = 2.0           # flag lists outside [rec / 2, rec * 2]
+TOAST_SAMPLE_ROWS = 10000
+
+# (query, table, method, leading columns) the app relies on
+HOT_QUERY_INDEXES = [
+    ('vector search (_vector_search)', 'documents', ('ivfflat', 'hnsw'), ['embedding']),
+    ('keyword search (_keyword_search)', 'documents', ('gin',), ['ts_vector']),
+    ('document listing (admin.documents)', 'documents', ('btree',), ['created_at', 'id']),
+    ('document listing by category', 'documents', ('btree',), ['category', 'created_at', 'id']),
+    ('search history (main.search_history)', 'search_queries', ('btree',), ['created_at', 'id']),
+    ('grading queue claim', 'model_submissions', ('btree',), ['status', 'priority']),
+    ('grading result reuse', 'model_submissions', ('btree',), ['code_hash', 'corpus_version']),
+    ('submission history (rl_task.history)', 'model_submissions', ('btree',), ['created_at', 'id']),
+    ('submission history by model', 'model_submissions', ('btree',), ['model_name', 'created_at', 'id']),
+    ('dashboard counters (read_stats)', 'stat_counters', ('btree',), ['scope', 'key']),
+    ('near-duplicate candidates', 'document_lsh_bands', ('btree',), ['band', 'bucket']),
+]
+
+TABLES_SQL = """
+    SELECT s.relname, c.relkind,
+           pg_relation_size(c.oid), pg_indexes_size(c.oid),
+           coalesce(pg_total_relation_size(nullif(c.reltoastrelid, 0)), 0),
+           pg_total_relation_size(c.oid),
+           s.n_live_tup, s.n_dead_tup, s.seq_scan, s.seq_tup_read, coalesce(s.idx_scan, 0),
+           greatest(s.last_vacuum, s.last_autovacuum), greatest(s.last_analyze, s.last_autoanalyze),
+           c.reltuples::bigint,
+           (SELECT sum(st.avg_width) FROM pg_stats st
+            WHERE st.schemaname = s.schemaname AND st.tablename = s.relname)
+    FROM pg_stat_user_tables s
+    JOIN pg_class c ON c.oid = s.relid
+    WHERE s.schemaname = :schema
+    ORDER BY pg_total_relation_size(c.oid) DESC
+"""
+
+INDEXES_SQL = """
+    SELECT s.relname, s.indexrelname, am.amname, pg_relation_size(s.indexrelid),
+           s.idx_scan, s.idx_tup_read, i.indisunique, i.indisprimary
+    FROM pg_stat_user_indexes s
+    JOIN pg_index i ON i.indexrelid = s.indexrelid
+    JOIN pg_class ic ON ic.oid = s.indexrelid
+    JOIN pg_am am ON am.oid = ic.relam
+    WHERE s.schemaname = :schema
+    ORDER BY pg_relation_size(s.indexrelid) DESC
+"""
+
+TOAST_SQL = f"""
+    SELECT count(*), avg(octet_length(content)), avg(pg_column_size(content)),
+           count(*) FILTER (WHERE pg_column_size(content) > 2032)
+    FROM (SELECT content FROM document_contents LIMIT {TOAST_SAMPLE_ROWS}) sample
+"""
+
+# Per-tuple overhead (header + item pointer) for the bloat estimate
+TUPLE_OVERHEAD = 28
+PAGE_SIZE = 8192
+
+
+def _setting(name: str):
+    """Current value of a (possibly extension) GUC, or None if unknown."""
+    return db.session.execute(text("SELECT current_setting(:name, true)"), {'name': name}).scalar()
+
+
+def _bloat(heap_bytes: int, rows: int, avg_width) -> Dict:
+    if not heap_bytes or not avg_width or rows <= 0:
+        return {'expected_bytes': None, 'ratio': None}
+    expected = math.ceil(rows * (avg_width + TUPLE_OVERHEAD) / PAGE_SIZE) * PAGE_SIZE
+    return {'expected_bytes': expected, 'ratio': max(0.0, 1 - expected / heap_bytes)}
+
+
+def recommended_ivfflat_lists(rows: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def _ann_indexes(snapshot: Dict, live_rows: Dict[str, int]) -> List[Dict]:
+    """ANN index parameters against the table's current row count."""
+    results = []
+    probes = _setting('ivfflat.probes')
+    ef_search = _setting('hnsw.ef_search')
+    for table_name, table in snapshot['tables'].items():
+        for index in table['indexes']:
+            if index['method'] not in ('ivfflat', 'hnsw'):
+                continue
+            rows = live_rows.get(table_name, 0)
+            entry = {
+                'table': table_name,
+                'index': index['name'],
+                'method': index['method'],
+                'rows': rows,
+                'options': index['options'],
+                'findings': [],
+            }
+            if index['method'] == 'ivfflat':
+                lists = int(index['options'].get('lists', 100))
+                recommended = recommended_ivfflat_lists(rows)
+                entry.update({'lists': lists, 'recommended_lists': recommended, 'probes': probes})
+                if rows and lists > rows:
+                    entry['findings'].append(f'lists={lists} exceeds row count {rows}: most lists are empty')
+                elif rows and not (recommended / IVFFLAT_LISTS_TOLERANCE <= lists <= recommended * IVFFLAT_LISTS_TOLERANCE):
+                    entry['findings'].append(
+                        f'lists={lists} vs recommended {recommended} for {rows:,} rows: '
+                        f'rebuild with REINDEX after changing lists'
+                    )
+                if probes and lists and int(probes) == 1 and lists > 10:
+                    entry['findings'].append(f'ivfflat.probes=1 searches 1 of {lists} lists: low recall')
+            else:
+                entry.update({
+                    'm': int(index['options'].get('m', 16)),
+                    'ef_construction': int(index['options'].get('ef_construction', 64)),
+                    'ef_search': ef_search,
+                })
+            results.append(entry)
+    return results
+
+
+def _missing_indexes(snapshot: Dict) -> List[Dict]:
+    missing = []
+    for query, table_name, methods, columns in HOT_QUERY_INDEXES:
+        table = snapshot['tables'].get(table_name)
+        if table is None:
+            continue
+        covered = any(
+            index['method'] in methods and index['columns'][:len(columns)] == columns
+            for index in table['indexes']
+        ) or (methods == ('btree',) and table['primary_key'][:len(columns)] == columns)
+        if not covered:
+            missing.append({
+                'query': query,
+                'table': table_name,
+                'suggestion': f"CREATE INDEX ON {table_name} USING {methods[0]} ({', '.join(columns)})",
+            })
+    return missing
+
+
+def collect_statistics(snapshot: Dict, schema: str = 'public') -> Dict:
+    """
+    Performance statistics and findings for the given catalog snapshot.
+
+    Returns:
+        {'tables', 'indexes', 'documents_content', 'ann_indexes',
+         'unused_indexes', 'missing_indexes', 'findings'}
+    """
+    params = {'schema': schema}
+    session = db.session
+    findings = []
+
+    tables = []
+    for row in session.execute(text(TABLES_SQL), params):
+        (name, kind, heap, indexes, toast, total, live, dead, seq_scan, seq_tup_read,
+         idx_scan, last_vacuum, last_analyze, reltuples, avg_width) = row
+        dead_ratio = dead / (live + dead) if live + dead else 0.0
+        bloat = _bloat(heap, max(reltuples, live), avg_width)
+        scans = seq_scan + idx_scan
+        tables.append({
+            'table': name,
+            'partition': kind == 'r' and name not in snapshot['tables'],
+            'heap_bytes': heap,
+            'index_bytes': indexes,
+            'toast_bytes': toast,
+            'total_bytes': total,
+            'live_tuples': live,
+            'dead_tuples': dead,
+            'dead_ratio': dead_ratio,
+            'bloat_ratio': bloat['ratio'],
+            'seq_scan': seq_scan,
+            'seq_tup_read': seq_tup_read,
+            'idx_scan': idx_scan,
+            'last_vacuum': last_vacuum,
+            'last_analyze': last_analyze,
+        })
+        if dead_ratio >= DEAD_TUPLE_RATIO_WARN and dead > 1000:
+            findings.append(f'{name}: {dead_ratio:.0%} dead tuples ({dead:,}); check autovacuum or run VACUUM')
+        if bloat['ratio'] is not None and bloat['ratio'] >= BLOAT_RATIO_WARN and heap >= BLOAT_MIN_BYTES:
+            findings.append(f'{name}: ~{bloat["ratio"]:.0%} estimated bloat; consider VACUUM FULL or pg_repack')
+        if last_analyze is None and live:
+            findings.append(f'{name}: never analyzed; planner estimates are guesses')
+        if live >= SEQ_SCAN_MIN_ROWS and scans and seq_scan / scans >= SEQ_SCAN_RATIO_WARN:
+            findings.append(
+                f'{name}: {seq_scan / scans:.0%} of {scans:,} scans are sequential '
+                f'({seq_tup_read:,} rows read); a hot query may lack an index'
+            )
+
+    indexes = []
+    unused = []
+    for name, index_name, method, size, idx_scan, tup_read, unique, primary in session.execute(text(INDEXES_SQL), params):
+        entry = {
+            'table': name,
+            'index': index_name,
+            'method': method,
+            'bytes': size,
+            'idx_scan': idx_scan,
+            'idx_tup_read': tup_read,
+        }
+        indexes.append(entry)
+        if idx_scan == 0 and not (unique or primary):
+            unused.append(entry)
+
+    documents_content = None
+    if 'document_contents' in snapshot['tables']:
+        sampled, avg_length, avg_stored, toasted = session.execute(text(TOAST_SQL)).one()
+        documents_content = {
+            'sampled_rows': sampled,
+            'avg_length_bytes': float(avg_length or 0),
+            'avg_stored_bytes': float(avg_stored or 0),
+            'toasted_share': toasted / sampled if sampled else 0.0,
+            'toast_bytes': next((t['toast_bytes'] for t in tables if t['table'] == 'document_contents'), 0),
+        }
+
+    documents = snapshot['tables'].get('documents')
+    if documents and any(c['name'] == 'content' for c in documents['columns']):
+        findings.append('documents.content is still inline; run utils/document_content.py migrate')
+
+    live_rows = {t['table']: t['live_tuples'] for t in tables}
+    ann = _ann_indexes(snapshot, live_rows)
+    for entry in ann:
+        findings.extend(f"{entry['index']}: {finding}" for finding in entry['findings'])
+
+    missing = _missing_indexes(snapshot)
+    findings.extend(f"missing index for {m['query']}: {m['suggestion']}" for m in missing)
+    findings.extend(
+        f"{u['index']} on {u['table']} has never been scanned ({u['bytes']:,} bytes)"
+        for u in unused if u['bytes'] > BLOAT_MIN_BYTES
+    )
+
+    return {
+        'tables': tables,
+        'indexes': indexes,
+        'documents_content': documents_content,
+        'ann_indexes': ann,
+        'unused_indexes': unused,
+        'missing_indexes': missing,
+        'findings': findings,
+    }
@@ -0,0 +1,198 @@
+"""
+Buffered search analytics writer.
+
+Search requests hand their SearchQuery rows to an in-memory bounded queue
+instead of committing them inline. A background thread drains the queue and
+writes the rows with multi-row INSERTs whenever the batch size or the flush
+interval is reached. When the queue is full new records are dropped and
+counted rather than blocking the request.
+
+Usage:
+    search_analytics = SearchAnalyticsWriter()
+    search_analytics.init_app(app)
+    search_analytics.record(query, results_count, execution_time, source='ui')
+"""
+
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.models import SearchQuery, db
+from utils.stat_counters import apply_delta, search_batch_delta
+
+# Defaults, overridable through app.config
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 2.0  # seconds
+
+
+class SearchAnalyticsWriter:
+    """
+    Flask extension that batches SearchQuery inserts off the request path.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.queue_size = DEFAULT_QUEUE_SIZE
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL
+
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        # Counters exposed through stats()
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read configuration and register shutdown flushing."""
+        self.app = app
+        self.queue_size = app.config.get('SEARCH_ANALYTICS_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        self.batch_size = app.config.get('SEARCH_ANALYTICS_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.flush_interval = app.config.get('SEARCH_ANALYTICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        self._queue = queue.Queue(maxsize=self.queue_size)
+
+        app.extensions['search_analytics'] = self
+        atexit.register(self.shutdown)
+
+    def record(self, query, results_count, execution_time, source='ui', stage_timings=None):
+        """
+        Enqueue one search for logging. Never blocks the caller.
+
+        Args:
+            query: Search query string
+            results_count: Number of results returned
+            execution_time: Search time in seconds
+            source: Where the search came from ('ui' or 'api')
+            stage_timings: Optional {stage: milliseconds} breakdown
+
+        Returns:
+            True if queued, False if dropped because the queue is full
+        """
+        if self._queue is None:
+            raise RuntimeError('SearchAnalyticsWriter.init_app() has not been called')
+
+        # Start the writer lazily so it runs in the worker process, not in a
+        # pre-fork master where the thread would not survive the fork.
+        self._ensure_started()
+
+        row = {
+            'query': query[:1000],
+            'results_count': results_count,
+            'execution_time': execution_time,
+            'source': source,
+            'stage_timings': stage_timings,
+            'created_at': datetime.utcnow(),
+        }
+
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def stats(self):
+        """Return writer counters and current queue depth."""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize() if self._queue else 0,
+                'queue_size': self.queue_size,
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'written': self.written,
+                'failed': self.failed,
+            }
+
+    def flush(self):
+        """Synchronously write everything currently queued."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def shutdown(self, timeout=10.0):
+        """Stop the background thread and flush remaining rows."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        if self._queue is not None and self.app is not None:
+            self.flush()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name='search-analytics-writer',
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        """Background loop: flush on batch size or interval, whichever first."""
+        while not self._stopping.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            batch = []
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopping.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+
+    def _drain(self, max_items):
+        batch = []
+        while len(batch) < max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, rows):
+        """Insert a batch of rows and its search counters in one transaction."""
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(insert(SearchQuery), rows)
+                    apply_delta(conn, search_batch_delta(rows))
+        except Exception as e:
+            with self._lock:
+                self.failed += len(rows)
+            self.app.logger.error(f'Search analytics flush failed ({len(rows)} rows): {e}')
+            return
+
+        with self._lock:
+            self.written += len(rows)
+
+
+# Shared instance, bound to the app in the factory
+search_analytics = SearchAnalyticsWriter()
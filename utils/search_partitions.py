@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Monthly partitions, daily rollups and retention for search_queries.
+
+search_queries is an append-only log. It is range-partitioned by
+created_at into one table per month (search_queries_pYYYYMM) plus a
+default partition, so old data is removed by dropping a partition rather
+than by DELETE + VACUUM. Before a partition is dropped its rows are kept
+in search_query_daily: one row per (day, normalized query, source) with
+search count, execution-time and result-count totals.
+
+Usage:
+    python utils/search_partitions.py migrate      # one-off: convert the plain table
+    python utils/search_partitions.py maintain     # cron: partitions ahead, rollup, retention
+    python utils/search_partitions.py status
+
+On a fresh database db.create_all() builds the partitioned parent; the
+app factory then calls setup() for the default, current and upcoming
+partitions. maintain is idempotent; run it daily. Settings (app.config):
+    SEARCH_PARTITIONS_AHEAD   future monthly partitions to keep created (default 2)
+    SEARCH_RETENTION_MONTHS   raw months to keep, current month included;
+                              0 keeps everything (default 6)
+"""
+
+import argparse
+import os
+import re
+import sys
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+# Handle both direct execution and module imports
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from utils.database import db
+
+TABLE = 'search_queries'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+
+DEFAULT_PARTITIONS_AHEAD = 2
+DEFAULT_RETENTION_MONTHS = 6
+
+# Same normalization for rollups and lookups: trimmed, lowercased, single spaces
+NORMALIZED_QUERY_SQL = "lower(regexp_replace(btrim(query), '\\s+', ' ', 'g'))"
+
+ROLLUP_SQL = f"""
+    INSERT INTO search_query_daily
+        (day, normalized_query, source, searches, total_execution_time,
+         max_execution_time, total_results, updated_at)
+    SELECT created_at::date, {NORMALIZED_QUERY_SQL}, coalesce(source, 'ui'),
+           count(*), coalesce(sum(execution_time), 0), max(execution_time),
+           coalesce(sum(results_count), 0), now()
+    FROM {TABLE}
+    WHERE created_at >= :start AND created_at < :end
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, normalized_query, source) DO UPDATE SET
+        searches = EXCLUDED.searches,
+        total_execution_time = EXCLUDED.total_execution_time,
+        max_execution_time = EXCLUDED.max_execution_time,
+        total_results = EXCLUDED.total_results,
+        updated_at = now()
+"""
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f'{TABLE}_p{month.year:04d}{month.month:02d}'
+
+
+def is_partitioned(conn) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {'table': TABLE}).scalar()
+
+
+def list_partitions(conn) -> List[Tuple[date, str]]:
+    """Monthly partitions as (month, name), oldest first (default excluded)."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {'table': TABLE}).scalars()
+    months = []
+    for name in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(months)
+
+
+def create_partition(conn, month: date) -> bool:
+    """
+    Create the partition for month if missing.
+
+    Rows that already landed in the default partition for that range are
+    moved into the new partition before it is attached (PostgreSQL refuses
+    to attach a range the default partition still holds rows for).
+    """
+    name = partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar():
+        return False
+
+    start, end = month, add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    if conn.execute(text("SELECT to_regclass(:name)"), {'name': DEFAULT_PARTITION}).scalar():
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE created_at >= :start AND created_at < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), {'start': start, 'end': end})
+    conn.execute(text(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    return True
+
+
+def ensure_default_partition(conn) -> bool:
+    """Create the default partition if missing (catches rows outside every month)."""
+    if conn.execute(text("SELECT to_regclass(:name)"), {'name': DEFAULT_PARTITION}).scalar():
+        return False
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+    return True
+
+
+def ensure_partitions(conn, ahead: int = DEFAULT_PARTITIONS_AHEAD, today: Optional[date] = None) -> List[str]:
+    """Create the default partition and partitions for the current month and `ahead` months after it."""
+    current = month_start(today or date.today())
+    created = [DEFAULT_PARTITION] if ensure_default_partition(conn) else []
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if create_partition(conn, month):
+            created.append(partition_name(month))
+    return created
+
+
+def setup(conn, ahead: int = DEFAULT_PARTITIONS_AHEAD) -> List[str]:
+    """
+    Make a partitioned search_queries writable: db.create_all() builds the
+    parent with no partitions, and every insert fails until one covers it.
+    Called by the app factory after create_all(); no-op on a plain table.
+    """
+    if not is_partitioned(conn):
+        return []
+    return ensure_partitions(conn, ahead)
+
+
+def migrate(conn, ahead: int = DEFAULT_PARTITIONS_AHEAD) -> Dict:
+    """
+    Convert a plain search_queries table into a partitioned one.
+
+    Runs in the caller's transaction and holds an exclusive lock on the
+    table for the copy, so run it in a maintenance window on large tables.
+    The primary key becomes (id, created_at), as PostgreSQL requires the
+    partition key in unique constraints; ids keep their sequence.
+    """
+    if is_partitioned(conn):
+        return {'migrated': False, 'rows': 0, 'partitions': ensure_partitions(conn, ahead)}
+
+    old = f'{TABLE}_unpartitioned'
+    conn.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+    conn.execute(text(f"UPDATE {TABLE} SET created_at = now() WHERE created_at IS NULL"))
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {old}"))
+    conn.execute(text(f"ALTER INDEX IF EXISTS {TABLE}_pkey RENAME TO {old}_pkey"))
+    conn.execute(text(f"ALTER INDEX IF EXISTS idx_{TABLE}_created_at RENAME TO idx_{old}_created_at"))
+
+    conn.execute(text(
+        f"CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS, PRIMARY KEY (id, created_at)) "
+        f"PARTITION BY RANGE (created_at)"
+    ))
+    conn.execute(text(f"CREATE INDEX idx_{TABLE}_created_at ON {TABLE} (created_at, id)"))
+    ensure_default_partition(conn)
+
+    oldest = conn.execute(text(f"SELECT min(created_at) FROM {old}")).scalar()
+    partitions = []
+    if oldest is not None:
+        month = month_start(oldest)
+        while month < month_start(date.today()):
+            if create_partition(conn, month):
+                partitions.append(partition_name(month))
+            month = add_months(month, 1)
+    partitions += ensure_partitions(conn, ahead)
+
+    rows = conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {old}")).rowcount
+    conn.execute(text(f"ALTER SEQUENCE IF EXISTS {TABLE}_id_seq OWNED BY {TABLE}.id"))
+    conn.execute(text(f"DROP TABLE {old}"))
+    return {'migrated': True, 'rows': rows, 'partitions': partitions}
+
+
+def rollup(conn, start: date, end: date) -> int:
+    """(Re)aggregate raw rows for days in [start, end) into search_query_daily."""
+    return conn.execute(text(ROLLUP_SQL), {'start': start, 'end': end}).rowcount
+
+
+def rollup_pending(conn, today: Optional[date] = None) -> int:
+    """
+    Roll up every complete day not yet summarized, a month at a time.
+
+    Starts from the newest rolled-up day (re-aggregated, in case it was
+    summarized while still in progress) or the oldest raw row.
+    """
+    today = today or date.today()
+    start = conn.execute(text("SELECT max(day) FROM search_query_daily")).scalar()
+    if start is None:
+        oldest = conn.execute(text(f"SELECT min(created_at) FROM {TABLE}")).scalar()
+        if oldest is None:
+            return 0
+        start = oldest.date()
+
+    written = 0
+    while start < today:
+        end = min(add_months(month_start(start), 1), today)
+        written += rollup(conn, start, end)
+        start = end
+    return written
+
+
+def apply_retention(conn, months: int, today: Optional[date] = None) -> List[str]:
+    """
+    Drop raw partitions older than the retention window.
+
+    Each partition is rolled up in full first, so its summaries are
+    complete regardless of when maintain last ran.
+    """
+    if months <= 0:
+        return []
+    cutoff = add_months(month_start(today or date.today()), -(months - 1))
+    dropped = []
+    for month, name in list_partitions(conn):
+        if month >= cutoff:
+            break
+        rollup(conn, month, add_months(month, 1))
+        conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+
+def maintain(conn, ahead: int = DEFAULT_PARTITIONS_AHEAD,
+             retention_months: int = DEFAULT_RETENTION_MONTHS) -> Dict:
+    """Create upcoming partitions, roll up complete days, drop expired partitions."""
+    return {
+        'created': ensure_partitions(conn, ahead),
+        'rolled_up': rollup_pending(conn),
+        'dropped': apply_retention(conn, retention_months),
+    }
+
+
+def status(conn) -> Dict:
+    """Partitions with row estimates, default partition rows, rollup range."""
+    partitions = []
+    for month, name in list_partitions(conn):
+        estimate = conn.execute(text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"
+        ), {'name': name}).scalar()
+        partitions.append({'month': month.isoformat()[:7], 'name': name, 'rows_estimate': max(estimate or 0, 0)})
+
+    default_rows = 0
+    if conn.execute(text("SELECT to_regclass(:name)"), {'name': DEFAULT_PARTITION}).scalar():
+        default_rows = conn.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}")).scalar()
+
+    first_day, last_day, summaries = conn.execute(text(
+        "SELECT min(day), max(day), count(*) FROM search_query_daily"
+    )).one()
+    return {
+        'partitioned': is_partitioned(conn),
+        'partitions': partitions,
+        'default_rows': default_rows,
+        'rollup': {'first_day': first_day, 'last_day': last_day, 'rows': summaries},
+    }
+
+
+def main():
+    """Main entry point for the search partition maintenance CLI."""
+    parser = argparse.ArgumentParser(description="search_queries partitions, rollups and retention")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    subparsers.add_parser("migrate", help="Convert search_queries to a monthly partitioned table")
+    maintain_parser = subparsers.add_parser("maintain", help="Create partitions, roll up, apply retention")
+    maintain_parser.add_argument("--retention-months", type=int,
+                                 help="Override SEARCH_RETENTION_MONTHS (0 keeps everything)")
+    subparsers.add_parser("status", help="Show partitions and rollup coverage")
+    args = parser.parse_args()
+
+    from utils.database import create_cli_app
+    app = create_cli_app()
+
+    with app.app_context():
+        ahead = app.config.get('SEARCH_PARTITIONS_AHEAD', DEFAULT_PARTITIONS_AHEAD)
+        retention = args.retention_months if getattr(args, 'retention_months', None) is not None \
+            else app.config.get('SEARCH_RETENTION_MONTHS', DEFAULT_RETENTION_MONTHS)
+        try:
+            with db.engine.begin() as conn:
+                if args.command == "migrate":
+                    result = migrate(conn, ahead)
+                elif args.command == "maintain":
+                    if not is_partitioned(conn):
+                        print("Error: search_queries is not partitioned; run 'migrate' first", file=sys.stderr)
+                        return 1
+                    result = maintain(conn, ahead, retention)
+                else:
+                    result = status(conn)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    if args.command == "migrate":
+        if result['migrated']:
+            print(f"✓ Migrated {result['rows']:,} rows into {len(result['partitions'])} partitions")
+        else:
+            print("search_queries is already partitioned")
+            print(f"✓ Created partitions: {', '.join(result['partitions']) or 'none'}")
+    elif args.command == "maintain":
+        print(f"✓ Created partitions: {', '.join(result['created']) or 'none'}")
+        print(f"✓ Rolled up {result['rolled_up']:,} daily summary rows")
+        print(f"✓ Dropped partitions: {', '.join(result['dropped']) or 'none'}")
+    else:
+        print(f"Partitioned: {result['partitioned']}")
+        for partition in result['partitions']:
+            print(f"  {partition['month']}  {partition['name']:<28} ~{partition['rows_estimate']:,} rows")
+        print(f"  default partition: {result['default_rows']:,} rows")
+        rollup_info = result['rollup']
+        print(f"Rollup: {rollup_info['rows']:,} rows, {rollup_info['first_day']} to {rollup_info['last_day']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
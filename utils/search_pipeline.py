@@ -0,0 +1,184 @@
+"""
+Staged hybrid search pipeline.
+
+Produces the same ranking as the reference hybrid_search in
+app/core/search.py (RRF with k=60 over the top-50 vector and keyword
+candidates), but splits the work into separately timed stages:
+
+    embedding -> vector leg -> keyword leg -> fusion -> hydration
+
+The candidate legs only fetch (id, score) pairs; full Document rows are
+loaded once, for the fused top-N, in the hydration stage. With
+collapse_variants, near-duplicate variants (documents.canonical_id, see
+utils/near_duplicates.py) are folded into their best-ranked member during
+fusion, so a group takes one result slot.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.models import Document, db
+from app.core.embeddings import generate_embedding_cached
+from sqlalchemy import func
+from utils.latency import stage_timer
+from utils.tracing import traced
+
+# Must match the reference implementation
+RRF_K = 60
+CANDIDATE_LIMIT = 50
+
+
+def embed_query(query: str) -> List[float]:
+    """Generate (or fetch from the LRU cache) the query embedding."""
+    return list(generate_embedding_cached(query))
+
+
+def vector_candidates(query_embedding: Sequence[float], limit: int = CANDIDATE_LIMIT) -> List[Tuple[int, float]]:
+    """
+    Vector leg: nearest documents by cosine distance.
+
+    Orders by the distance expression itself so the ANN index can serve it.
+
+    Returns:
+        List of (document_id, similarity) tuples, ordered by similarity DESC
+    """
+    distance = Document.embedding.cosine_distance(query_embedding)
+
+    rows = db.session.query(
+        Document.id,
+        (1 - distance).label('similarity')
+    ).filter(
+        Document.embedding.isnot(None)
+    ).order_by(
+        distance
+    ).limit(limit).all()
+
+    return [(doc_id, float(sim)) for doc_id, sim in rows]
+
+
+def keyword_candidates(query: str, limit: int = CANDIDATE_LIMIT) -> List[Tuple[int, float]]:
+    """
+    Keyword leg: PostgreSQL full-text search.
+
+    Returns:
+        List of (document_id, rank) tuples, ordered by rank DESC
+    """
+    tsquery = func.plainto_tsquery('english', query)
+    rank = func.ts_rank(Document.ts_vector, tsquery).label('rank')
+
+    rows = db.session.query(
+        Document.id,
+        rank
+    ).filter(
+        Document.ts_vector.op('@@')(tsquery)
+    ).order_by(
+        rank.desc()
+    ).limit(limit).all()
+
+    return [(doc_id, float(score)) for doc_id, score in rows]
+
+
+def rrf_fuse(
+    vector_results: Sequence[Tuple[int, float]],
+    keyword_results: Sequence[Tuple[int, float]],
+    k: int = RRF_K
+) -> List[Tuple[int, float]]:
+    """
+    Reciprocal Rank Fusion of two ranked candidate lists.
+
+    Ties keep first-seen order (vector leg before keyword leg), exactly as
+    the reference implementation does.
+
+    Returns:
+        List of (document_id, rrf_score) tuples, ordered by score DESC
+    """
+    rrf_scores: Dict[int, float] = {}
+
+    for rank, (doc_id, _) in enumerate(vector_results, start=1):
+        rrf_scores[doc_id] = rrf_scores.get(doc_id, 0.0) + (1.0 / (k + rank))
+
+    for rank, (doc_id, _) in enumerate(keyword_results, start=1):
+        rrf_scores[doc_id] = rrf_scores.get(doc_id, 0.0) + (1.0 / (k + rank))
+
+    sorted_ids = sorted(rrf_scores.keys(), key=lambda x: rrf_scores[x], reverse=True)
+    return [(doc_id, rrf_scores[doc_id]) for doc_id in sorted_ids]
+
+
+def collapse_variant_groups(fused: Sequence[Tuple[int, float]], limit: int) -> List[Tuple[int, float]]:
+    """
+    Keep the best-ranked document of each canonical group.
+
+    Looks up canonical_id for the fused candidates only (primary key
+    lookups, at most 2 x CANDIDATE_LIMIT ids).
+    """
+    if not fused:
+        return []
+
+    rows = db.session.query(Document.id, Document.canonical_id).filter(
+        Document.id.in_([doc_id for doc_id, _ in fused])
+    ).all()
+    return group_leaders(fused, {doc_id: canonical_id or doc_id for doc_id, canonical_id in rows}, limit)
+
+
+def group_leaders(fused: Sequence[Tuple[int, float]], group: Dict[int, int], limit: int) -> List[Tuple[int, float]]:
+    """First (best-ranked) entry per group key; ids missing from group are their own group."""
+    seen = set()
+    collapsed = []
+    for doc_id, score in fused:
+        key = group.get(doc_id, doc_id)
+        if key in seen:
+            continue
+        seen.add(key)
+        collapsed.append((doc_id, score))
+        if len(collapsed) >= limit:
+            break
+    return collapsed
+
+
+def hydrate(doc_ids: Sequence[int]) -> List[Document]:
+    """Load Document rows for the given ids, preserving their order."""
+    if not doc_ids:
+        return []
+
+    docs = Document.query.filter(Document.id.in_(list(doc_ids))).all()
+    doc_map = {doc.id: doc for doc in docs}
+    return [doc_map[doc_id] for doc_id in doc_ids if doc_id in doc_map]
+
+
+@traced('hybrid_search')
+def staged_hybrid_search(
+    query: str,
+    limit: int = 10,
+    timings: Optional[Dict[str, float]] = None,
+    collapse_variants: bool = False
+) -> List[Document]:
+    """
+    Hybrid search with per-stage timing.
+
+    Args:
+        query: Search query string
+        limit: Maximum number of results to return
+        timings: Optional dict that receives stage durations in milliseconds
+            (keys: embedding, vector, keyword, fusion, hydration)
+        collapse_variants: Return one document per near-duplicate group
+
+    Returns:
+        List of Document objects, ordered by RRF score DESC
+    """
+    with stage_timer(timings, 'embedding'):
+        query_embedding = embed_query(query)
+
+    with stage_timer(timings, 'vector'):
+        vector_results = vector_candidates(query_embedding)
+
+    with stage_timer(timings, 'keyword'):
+        keyword_results = keyword_candidates(query)
+
+    with stage_timer(timings, 'fusion'):
+        fused = rrf_fuse(vector_results, keyword_results)
+        if collapse_variants:
+            fused = collapse_variant_groups(fused, limit)
+
+    with stage_timer(timings, 'hydration'):
+        results = hydrate([doc_id for doc_id, _ in fused[:limit]])
+
+    return results
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained dashboard statistics.
+
+Dashboards used to run several COUNT/AVG/GROUP BY queries over documents,
+search_queries and model_submissions on every page view. The stat_counters
+table keeps those aggregates instead, one row per (scope, key) with a
+count, a running sum (for averages) and a running max:
+
+    documents            total / with_embedding / with_ts_vector
+    documents_by_category <category>
+    searches             total (sum: execution_time) / results (sum: results_count)
+    submissions          total / passed / score (sum + max: score)
+                         graded (completed; sum: result cache hits)
+    submissions_by_model <model_name>
+    submissions_graded_by_model <model_name> (sum: result cache hits)
+
+Counters are updated as deltas in the same transaction as the write:
+
+- an ORM after_flush hook turns inserted, updated and deleted Document,
+  SearchQuery and ModelSubmission rows into deltas; they are summed per
+  session and upserted once, just before commit, so the hot counter rows
+  are locked for the commit only rather than from the first flush
+- a running max only grows with upserts; when a flush deletes or lowers
+  the current max it is recomputed from the base table
+- the search analytics writer adds its batch totals (Core INSERT)
+- writes that bypass both (bulk COPY, raw SQL UPDATE/DELETE, Query.update
+  and Query.delete) leave the counters stale until reconcile() rebuilds a
+  scope from the base tables. The bulk loader, enrichment and
+  document_content reindex call it when they finish; run it after any
+  other such write:
+
+    python utils/stat_counters.py reconcile [--scope documents]
+
+read_stats() returns everything in one query.
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Handle both direct execution and module imports
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from app.models import Document, ModelSubmission, SearchQuery, db
+
+# (count, sum, max) delta per (scope, key)
+Delta = Dict[Tuple[str, str], Tuple[int, float, Optional[float]]]
+
+SCOPES = ('documents', 'searches', 'submissions')
+
+# Empty keys stand in for NULL categories / model names
+NULL_KEY = ''
+
+UPSERT_SQL = text(
+    "INSERT INTO stat_counters (scope, key, count, total, max_value, updated_at) "
+    "VALUES (:scope, :key, :count, :total, :max_value, now()) "
+    "ON CONFLICT (scope, key) DO UPDATE SET "
+    "count = stat_counters.count + EXCLUDED.count, "
+    "total = stat_counters.total + EXCLUDED.total, "
+    "max_value = GREATEST(stat_counters.max_value, EXCLUDED.max_value), "
+    "updated_at = now()"
+)
+
+
+# Recomputes a running max when the current max may have been removed
+MAX_SQL = {
+    ('submissions', 'score'): "SELECT max(score) FROM model_submissions",
+}
+
+# session.info keys for deltas waiting for commit
+PENDING_DELTA = 'stat_counters_delta'
+PENDING_LOWERED = 'stat_counters_lowered'
+
+# Columns whose changes move a counter
+_TRACKED = {
+    Document: ('category', 'embedding', 'ts_vector'),
+    SearchQuery: ('execution_time', 'results_count'),
+    ModelSubmission: ('model_name', 'passed', 'score', 'status', 'cache_hit'),
+}
+
+
+def _document_contribution(category, has_embedding, has_ts_vector):
+    yield ('documents', 'total'), 0.0, None
+    yield ('documents_by_category', category or NULL_KEY), 0.0, None
+    if has_embedding:
+        yield ('documents', 'with_embedding'), 0.0, None
+    if has_ts_vector:
+        yield ('documents', 'with_ts_vector'), 0.0, None
+
+
+def _search_contribution(execution_time, results_count):
+    yield ('searches', 'total'), float(execution_time or 0.0), None
+    yield ('searches', 'results'), float(results_count or 0), None
+
+
+def _submission_contribution(model_name, passed, score, status, cache_hit):
+    yield ('submissions', 'total'), 0.0, None
+    yield ('submissions_by_model', model_name or NULL_KEY), 0.0, None
+    if passed:
+        yield ('submissions', 'passed'), 0.0, None
+    if score is not None:
+        yield ('submissions', 'score'), float(score), float(score)
+    if status == 'completed':
+        yield ('submissions', 'graded'), float(bool(cache_hit)), None
+        yield ('submissions_graded_by_model', model_name or NULL_KEY), float(bool(cache_hit)), None
+
+
+def _values(obj, old: bool) -> Dict:
+    """
+    Current attribute values, or the values before this flush.
+
+    Old values come from attribute history or the loaded state only: the
+    row may already be gone, so nothing is lazy-loaded. Attributes that
+    were never loaded count as NULL (reconcile() corrects any drift).
+    """
+    state = inspect(obj)
+    values = {}
+    for attr in _TRACKED[type(obj)]:
+        if old:
+            history = state.attrs[attr].history
+            if history.has_changes():
+                values[attr] = history.deleted[0] if history.deleted else None
+            else:
+                values[attr] = state.dict.get(attr)
+        else:
+            values[attr] = state.attrs[attr].value
+    return values
+
+
+def _contribution(obj, old: bool = False) -> Iterable:
+    v = _values(obj, old)
+    if isinstance(obj, Document):
+        return _document_contribution(v['category'], v['embedding'] is not None, v['ts_vector'] is not None)
+    if isinstance(obj, SearchQuery):
+        return _search_contribution(v['execution_time'], v['results_count'])
+    return _submission_contribution(v['model_name'], v['passed'], v['score'], v['status'], v['cache_hit'])
+
+
+def _add(delta: Delta, contribution: Iterable, sign: int, lowered: Optional[Dict] = None):
+    """
+    Add a row's contribution to delta. Removed max values are noted in
+    lowered (largest per key), unless the same value is added back.
+    """
+    for key, total, max_value in contribution:
+        count, running_total, running_max = delta.get(key, (0, 0.0, None))
+        if sign > 0 and max_value is not None:
+            running_max = max_value if running_max is None else max(running_max, max_value)
+        delta[key] = (count + sign, running_total + sign * total, running_max)
+        if lowered is not None and max_value is not None:
+            if sign < 0:
+                lowered[key] = max(lowered.get(key, max_value), max_value)
+            elif lowered.get(key) == max_value:
+                del lowered[key]
+
+
+def _merge(delta: Delta, other: Delta):
+    for key, (count, total, max_value) in other.items():
+        running_count, running_total, running_max = delta.get(key, (0, 0.0, None))
+        if running_max is None or (max_value is not None and max_value > running_max):
+            running_max = max_value
+        delta[key] = (running_count + count, running_total + total, running_max)
+
+
+def apply_delta(connection, delta: Delta):
+    """Upsert counter deltas on the given connection (caller's transaction)."""
+    for (scope, key), (count, total, max_value) in sorted(delta.items()):
+        if count == 0 and total == 0 and max_value is None:
+            continue
+        connection.execute(UPSERT_SQL, {
+            'scope': scope,
+            'key': key,
+            'count': count,
+            'total': total,
+            'max_value': max_value,
+        })
+
+
+def refresh_maxima(connection, lowered: Dict):
+    """
+    Recompute running maxima that may have been deleted or lowered.
+
+    Only rows whose stored max is at most the removed value are touched,
+    so the base table is scanned only when the max itself went away.
+    """
+    for (scope, key), removed in sorted(lowered.items()):
+        connection.execute(text(
+            f"UPDATE stat_counters SET max_value = ({MAX_SQL[(scope, key)]}), updated_at = now() "
+            "WHERE scope = :scope AND key = :key AND max_value <= :removed"
+        ), {'scope': scope, 'key': key, 'removed': removed})
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_counters(session, flush_context):
+    """Turn this flush's inserts/updates/deletes into counter deltas."""
+    delta: Delta = {}
+    lowered = {}
+    for obj in session.new:
+        if type(obj) in _TRACKED:
+            _add(delta, _contribution(obj), +1, lowered)
+    for obj in session.deleted:
+        if type(obj) in _TRACKED:
+            _add(delta, _contribution(obj, old=True), -1, lowered)
+    for obj in session.dirty:
+        if type(obj) in _TRACKED and session.is_modified(obj):
+            _add(delta, _contribution(obj, old=True), -1, lowered)
+            _add(delta, _contribution(obj), +1, lowered)
+    if not delta:
+        return
+
+    # A savepoint may roll back on its own: write its deltas inside it
+    if session.in_nested_transaction():
+        apply_delta(session.connection(), delta)
+        refresh_maxima(session.connection(), lowered)
+        return
+    _merge(session.info.setdefault(PENDING_DELTA, {}), delta)
+    pending_lowered = session.info.setdefault(PENDING_LOWERED, {})
+    for key, removed in lowered.items():
+        pending_lowered[key] = max(pending_lowered.get(key, removed), removed)
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_pending_counters(session):
+    """Upsert the session's summed deltas as the last statements before commit."""
+    # commit() flushes only after this hook; flush first so nothing is missed
+    session.flush()
+    if PENDING_DELTA not in session.info:
+        return
+    delta = session.info.pop(PENDING_DELTA)
+    lowered = session.info.pop(PENDING_LOWERED, {})
+    apply_delta(session.connection(), delta)
+    refresh_maxima(session.connection(), lowered)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _discard_pending_counters(session, transaction):
+    """Rolled back (or already written): drop what the outer transaction collected."""
+    if transaction.parent is None:
+        session.info.pop(PENDING_DELTA, None)
+        session.info.pop(PENDING_LOWERED, None)
+
+
+def search_batch_delta(rows: Iterable[Dict]) -> Delta:
+    """Counter delta for a batch of search_queries rows (Core inserts)."""
+    delta: Delta = {}
+    for row in rows:
+        _add(delta, _search_contribution(row.get('execution_time'), row.get('results_count')), +1)
+    return delta
+
+
+# Rebuild statements per scope: (scope, key, count, total, max_value) rows
+RECONCILE_SQL = {
+    'documents': """
+        SELECT 'documents', 'total', count(*), 0, NULL FROM documents
+        UNION ALL
+        SELECT 'documents', 'with_embedding', count(*), 0, NULL FROM documents WHERE embedding IS NOT NULL
+        UNION ALL
+        SELECT 'documents', 'with_ts_vector', count(*), 0, NULL FROM documents WHERE ts_vector IS NOT NULL
+        UNION ALL
+        SELECT 'documents_by_category', coalesce(category, ''), count(*), 0, NULL
+        FROM documents GROUP BY category
+    """,
+    # Raw rows plus daily rollups of partitions dropped by retention
+    # (utils/search_partitions.py), so totals stay all-time
+    'searches': """
+        WITH raw AS (
+            SELECT count(*) AS n, coalesce(sum(execution_time), 0) AS time,
+                   coalesce(sum(results_count), 0) AS results, min(created_at)::date AS first_day
+            FROM search_queries
+        ), rolled AS (
+            SELECT coalesce(sum(searches), 0) AS n, coalesce(sum(total_execution_time), 0) AS time,
+                   coalesce(sum(total_results), 0) AS results
+            FROM search_query_daily
+            WHERE day < (SELECT coalesce(first_day, 'infinity'::date) FROM raw)
+        )
+        SELECT 'searches', 'total', raw.n + rolled.n, raw.time + rolled.time, NULL FROM raw, rolled
+        UNION ALL
+        SELECT 'searches', 'results', raw.n + rolled.n, raw.results + rolled.results, NULL FROM raw, rolled
+    """,
+    'submissions': """
+        SELECT 'submissions', 'total', count(*), 0, NULL FROM model_submissions
+        UNION ALL
+        SELECT 'submissions', 'passed', count(*), 0, NULL FROM model_submissions WHERE passed
+        UNION ALL
+        SELECT 'submissions', 'score', count(score), coalesce(sum(score), 0), max(score) FROM model_submissions
+        UNION ALL
+        SELECT 'submissions_by_model', coalesce(model_name, ''), count(*), 0, NULL
+        FROM model_submissions GROUP BY model_name
+        UNION ALL
+        SELECT 'submissions', 'graded', count(*), count(*) FILTER (WHERE cache_hit), NULL
+        FROM model_submissions WHERE status = 'completed'
+        UNION ALL
+        SELECT 'submissions_graded_by_model', coalesce(model_name, ''), count(*),
+               count(*) FILTER (WHERE cache_hit), NULL
+        FROM model_submissions WHERE status = 'completed' GROUP BY model_name
+    """,
+}
+
+
+def reconcile(scopes: Iterable[str] = SCOPES) -> Dict[str, int]:
+    """
+    Recompute counters from the base tables.
+
+    Runs in one transaction holding a lock that blocks concurrent counter
+    updates, so deltas committed during the rebuild are not lost.
+
+    Returns:
+        {scope: rows written}
+    """
+    written = {}
+    with db.engine.begin() as conn:
+        conn.execute(text("LOCK TABLE stat_counters IN SHARE ROW EXCLUSIVE MODE"))
+        for scope in scopes:
+            conn.execute(
+                text("DELETE FROM stat_counters WHERE scope = :scope OR scope LIKE :prefix"),
+                {'scope': scope, 'prefix': f'{scope}_%'}
+            )
+            result = conn.execute(text(
+                "INSERT INTO stat_counters (scope, key, count, total, max_value, updated_at) "
+                f"SELECT *, now() FROM ({RECONCILE_SQL[scope]}) AS rebuilt"
+            ))
+            written[scope] = result.rowcount
+    return written
+
+
+def read_stats() -> Dict:
+    """All dashboard statistics from a single query."""
+    rows = db.session.execute(text(
+        "SELECT scope, key, count, total, max_value FROM stat_counters"
+    )).all()
+
+    counters = defaultdict(dict)
+    for scope, key, count, total, max_value in rows:
+        counters[scope][key] = (count, total, max_value)
+
+    def count(scope, key):
+        return counters[scope].get(key, (0, 0.0, None))[0]
+
+    def average(scope, key):
+        n, total, _ = counters[scope].get(key, (0, 0.0, None))
+        return total / n if n else 0
+
+    def breakdown(scope):
+        return {key or None: n for key, (n, _, _) in sorted(counters[scope].items()) if n}
+
+    graded, cache_hits, _ = counters['submissions'].get('graded', (0, 0.0, None))
+
+    return {
+        'documents': {
+            'total': count('documents', 'total'),
+            'with_embedding': count('documents', 'with_embedding'),
+            'with_ts_vector': count('documents', 'with_ts_vector'),
+            'by_category': breakdown('documents_by_category'),
+        },
+        'searches': {
+            'total': count('searches', 'total'),
+            'avg_time': average('searches', 'total'),
+            'avg_results': average('searches', 'results'),
+        },
+        'submissions': {
+            'total': count('submissions', 'total'),
+            'passed': count('submissions', 'passed'),
+            'avg_score': average('submissions', 'score'),
+            'best_score': counters['submissions'].get('score', (0, 0.0, None))[2] or 0,
+            'by_model': breakdown('submissions_by_model'),
+            'graded': graded,
+            'cache_hits': int(cache_hits),
+            'cache_hits_by_model': {
+                key or None: (n, int(hits))
+                for key, (n, hits, _) in sorted(counters['submissions_graded_by_model'].items()) if n
+            },
+        },
+    }
+
+
+def counter_keys(scope: str) -> List[str]:
+    """
+    Non-empty keys of a breakdown scope, e.g. category or model names.
+
+    Serves filter dropdowns from the counters' primary key instead of a
+    SELECT DISTINCT over the base table.
+    """
+    rows = db.session.execute(text(
+        "SELECT key FROM stat_counters WHERE scope = :scope AND count > 0 AND key <> '' ORDER BY key"
+    ), {'scope': scope}).all()
+    return [row[0] for row in rows]
+
+
+def main():
+    """Main entry point for the stat counters CLI."""
+    parser = argparse.ArgumentParser(description="Dashboard statistics maintenance")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    reconcile_parser = subparsers.add_parser("reconcile", help="Rebuild counters from the base tables")
+    reconcile_parser.add_argument("--scope", choices=SCOPES, action="append",
+                                  help="Scope to rebuild (repeatable; default: all)")
+    args = parser.parse_args()
+
+    from utils.database import create_cli_app
+    app = create_cli_app()
+
+    with app.app_context():
+        try:
+            written = reconcile(args.scope or SCOPES)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    for scope, count in written.items():
+        print(f"✓ {scope}: {count} counter rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic corpus generator for scale testing.
+
+Produces corpora of any size with realistic shape, without the embedding
+model or a database:
+- log-normal document lengths (prose and code have separate distributions)
+- configurable topic mix and code-vs-prose ratio
+- seeded synthetic embeddings: each topic has a centroid on the unit
+  sphere and documents scatter around their topic (plus a secondary topic)
+- TestCase queries with known relevant document ids. Relevant documents
+  are planted: keyword cases get rare anchor terms in their content,
+  semantic cases get embeddings pulled toward the query embedding, hybrid
+  cases get both.
+
+Every document is generated from its own seed (seed, doc_id), so output is
+identical across runs and independent of generation order.
+
+Output (in --out):
+    documents.jsonl    id, title, content, category, type, topic, embedding
+    test_cases.jsonl   query, expected_docs, expected_order, category,
+                       description, query_embedding
+    manifest.json      generation parameters and counts
+
+Usage:
+    python utils/synthetic_corpus.py generate --docs 100000 --queries 500 \\
+        --seed 42 --out instance/synthetic/100k
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_DIM = 384
+
+# topic -> (category for prose docs, vocabulary)
+TOPICS: Dict[str, Tuple[str, List[str]]] = {
+    'databases': ('general_knowledge', [
+        'query', 'index', 'table', 'join', 'transaction', 'postgres', 'schema', 'row',
+        'column', 'primary', 'key', 'vacuum', 'replica', 'partition', 'constraint', 'sql',
+    ]),
+    'python': ('general_knowledge', [
+        'function', 'list', 'dictionary', 'generator', 'decorator', 'module', 'package',
+        'exception', 'iterator', 'class', 'average', 'lambda', 'comprehension', 'typing',
+    ]),
+    'web': ('general_knowledge', [
+        'request', 'response', 'route', 'template', 'session', 'cookie', 'header',
+        'endpoint', 'flask', 'http', 'cache', 'json', 'form', 'browser', 'server',
+    ]),
+    'machine_learning': ('ml_concepts', [
+        'model', 'training', 'gradient', 'loss', 'neural', 'network', 'backpropagation',
+        'weights', 'epoch', 'overfitting', 'regularization', 'optimizer', 'learning', 'rate',
+    ]),
+    'nlp': ('ml_concepts', [
+        'embedding', 'token', 'transformer', 'attention', 'vocabulary', 'sentence',
+        'language', 'retrieval', 'semantic', 'similarity', 'encoder', 'corpus', 'bert',
+    ]),
+    'statistics': ('ml_concepts', [
+        'mean', 'variance', 'distribution', 'sample', 'regression', 'probability',
+        'hypothesis', 'confidence', 'interval', 'median', 'correlation', 'bayesian',
+    ]),
+    'devops': ('general_knowledge', [
+        'deploy', 'container', 'pipeline', 'monitoring', 'latency', 'nginx', 'gunicorn',
+        'service', 'config', 'logging', 'metrics', 'rollback', 'scaling', 'load',
+    ]),
+    'history': ('general_knowledge', [
+        'empire', 'century', 'war', 'treaty', 'dynasty', 'revolution', 'trade', 'city',
+        'king', 'republic', 'archive', 'foundation', 'colony', 'migration',
+    ]),
+}
+
+FILLER = [
+    'the', 'a', 'of', 'and', 'to', 'in', 'is', 'for', 'with', 'on', 'that', 'by',
+    'this', 'as', 'it', 'can', 'be', 'from', 'are', 'when', 'which', 'each', 'more',
+]
+
+CODE_TEMPLATES = [
+    "def {a}_{b}({c}):\n    \"\"\"Compute {a} {b} for {c}.\"\"\"\n    return sum({c}) / len({c})\n",
+    "class {A}{B}:\n    def __init__(self, {c}):\n        self.{c} = {c}\n\n    def {a}(self):\n        return [x for x in self.{c} if x]\n",
+    "SELECT {a}, {b} FROM {c} WHERE {a}_id = 1 ORDER BY {b} DESC;\n",
+    "const {a}{B} = ({c}) => {{\n  return {c}.map(x => x.{b});\n}};\n",
+    "for {a} in {c}:\n    if {a}.{b}:\n        yield {a}\n",
+]
+
+SYLLABLES = ['zor', 'vex', 'qua', 'lin', 'mor', 'tak', 'bri', 'sol', 'dra', 'kel', 'nym', 'fis']
+
+# Log-normal length parameters (in words / lines): median ~ exp(mu)
+PROSE_LENGTH = (5.5, 0.9)
+CODE_LENGTH = (3.0, 0.8)
+
+TEST_CASE_KINDS = ('keyword_heavy', 'semantic', 'hybrid')
+
+
+def parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    """Parse 'topic=weight,topic=weight' into normalized weights."""
+    if not spec:
+        weights = {topic: 1.0 for topic in TOPICS}
+    else:
+        weights = {}
+        for part in spec.split(','):
+            topic, _, weight = part.partition('=')
+            topic = topic.strip()
+            if topic not in TOPICS:
+                raise ValueError(f"Unknown topic: {topic} (choose from {', '.join(TOPICS)})")
+            weights[topic] = float(weight or 1.0)
+
+    total = sum(weights.values())
+    return {topic: w / total for topic, w in weights.items()}
+
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+def _pseudo_word(rng: np.random.Generator) -> str:
+    return ''.join(rng.choice(SYLLABLES, size=3))
+
+
+class CorpusGenerator:
+    """Generates documents and planted test cases from a single seed."""
+
+    def __init__(
+        self,
+        num_docs: int,
+        num_queries: int = 100,
+        seed: int = 42,
+        dim: int = DEFAULT_DIM,
+        code_ratio: float = 0.3,
+        topic_mix: Optional[Dict[str, float]] = None,
+        relevant_per_query: int = 5,
+        max_words: int = 20000,
+        with_embeddings: bool = True,
+    ):
+        self.num_docs = num_docs
+        self.num_queries = num_queries
+        self.seed = seed
+        self.dim = dim
+        self.code_ratio = code_ratio
+        self.topic_mix = topic_mix or parse_mix(None)
+        self.relevant_per_query = min(relevant_per_query, num_docs)
+        self.max_words = max_words
+        self.with_embeddings = with_embeddings
+
+        self.topics = list(self.topic_mix)
+        self.topic_weights = np.array([self.topic_mix[t] for t in self.topics])
+
+        # Topic centroids: fixed by seed, independent of corpus size
+        rng = np.random.default_rng([seed, 0])
+        self.centroids = {
+            topic: _unit(rng.standard_normal(dim)).astype(np.float32) for topic in TOPICS
+        }
+
+        # Zipf-like term weights inside each vocabulary
+        self.term_weights = {
+            topic: self._zipf(len(vocab)) for topic, (_, vocab) in TOPICS.items()
+        }
+
+        self.test_cases, self.plants = self._plan_test_cases()
+
+    @staticmethod
+    def _zipf(n: int) -> np.ndarray:
+        w = 1.0 / np.arange(1, n + 1)
+        return w / w.sum()
+
+    def _plan_test_cases(self):
+        """
+        Decide every test case up front: topic, kind, anchor terms, query
+        embedding and which document ids are planted as relevant.
+
+        Returns:
+            (test_cases, plants) where plants maps doc_id -> list of
+            (test_case_index, strength) and strength 1.0 is the top result
+        """
+        rng = np.random.default_rng([self.seed, 1])
+        test_cases = []
+        plants: Dict[int, List[Tuple[int, float]]] = {}
+
+        for qi in range(self.num_queries):
+            topic = self.topics[rng.choice(len(self.topics), p=self.topic_weights)]
+            kind = TEST_CASE_KINDS[qi % len(TEST_CASE_KINDS)]
+            vocab = TOPICS[topic][1]
+            terms = list(rng.choice(vocab, size=2, replace=False))
+            anchors = [_pseudo_word(rng), _pseudo_word(rng)]
+
+            query_vec = _unit(self.centroids[topic] + 0.8 * _unit(rng.standard_normal(self.dim)))
+
+            relevant = sorted(
+                int(x) + 1 for x in rng.choice(self.num_docs, size=self.relevant_per_query, replace=False)
+            )
+            # Ranked order: planting strength decreases along a shuffled order
+            order = [relevant[i] for i in rng.permutation(len(relevant))]
+            for rank, doc_id in enumerate(order):
+                strength = 1.0 - rank / max(len(order), 1)
+                plants.setdefault(doc_id, []).append((qi, strength))
+
+            query_terms = anchors + terms if kind != 'semantic' else terms + [topic.replace('_', ' ')]
+            test_cases.append({
+                'query': ' '.join(query_terms),
+                'expected_docs': relevant,
+                'expected_order': order,
+                'category': kind,
+                'description': f'Synthetic {kind} query on {topic} ({len(relevant)} planted docs)',
+                'topic': topic,
+                'anchors': anchors if kind != 'semantic' else [],
+                'query_embedding': query_vec.astype(np.float32),
+            })
+
+        return test_cases, plants
+
+    def _length(self, rng, is_code: bool) -> int:
+        mu, sigma = CODE_LENGTH if is_code else PROSE_LENGTH
+        return int(np.clip(rng.lognormal(mu, sigma), 3, self.max_words))
+
+    def _prose(self, rng, topic: str, words: int) -> str:
+        vocab = TOPICS[topic][1]
+        n_topic = max(1, int(words * 0.35))
+        topic_terms = rng.choice(vocab, size=n_topic, p=self.term_weights[topic])
+        filler = rng.choice(FILLER, size=words - n_topic)
+        tokens = np.concatenate([topic_terms, filler])
+        rng.shuffle(tokens)
+
+        sentences = []
+        for start in range(0, len(tokens), 12):
+            chunk = ' '.join(tokens[start:start + 12])
+            sentences.append(chunk[:1].upper() + chunk[1:] + '.')
+        return ' '.join(sentences)
+
+    def _code(self, rng, topic: str, lines: int) -> str:
+        vocab = TOPICS[topic][1]
+        blocks = []
+        while sum(b.count('\n') for b in blocks) < lines:
+            a, b, c = rng.choice(vocab, size=3)
+            template = CODE_TEMPLATES[rng.integers(len(CODE_TEMPLATES))]
+            blocks.append(template.format(a=a, b=b, c=c, A=a.title(), B=b.title()))
+        return '\n'.join(blocks)
+
+    def document(self, doc_id: int) -> Dict:
+        """Generate one document; deterministic in (seed, doc_id)."""
+        rng = np.random.default_rng([self.seed, 2, doc_id])
+        plants = self.plants.get(doc_id, [])
+
+        if plants:
+            # Planted docs take the topic of their strongest test case
+            topic = self.test_cases[max(plants, key=lambda p: p[1])[0]]['topic']
+        else:
+            topic = self.topics[rng.choice(len(self.topics), p=self.topic_weights)]
+        secondary = self.topics[rng.choice(len(self.topics), p=self.topic_weights)]
+
+        is_code = rng.random() < self.code_ratio
+        size = self._length(rng, is_code)
+        content = self._code(rng, topic, size) if is_code else self._prose(rng, topic, size)
+
+        embedding = None
+        if self.with_embeddings:
+            vec = self.centroids[topic] + 0.3 * self.centroids[secondary] + 0.6 * _unit(rng.standard_normal(self.dim))
+
+        for qi, strength in plants:
+            case = self.test_cases[qi]
+            if case['anchors']:
+                repeats = 1 + int(round(strength * 3))
+                content += '\n' + ' '.join(case['anchors'] * repeats)
+            if self.with_embeddings and case['category'] != 'keyword_heavy':
+                vec = vec + (1.0 + 3.0 * strength) * case['query_embedding']
+
+        if self.with_embeddings:
+            embedding = _unit(vec).astype(np.float32)
+
+        title_terms = rng.choice(TOPICS[topic][1], size=3)
+        return {
+            'id': doc_id,
+            'title': f"{' '.join(t.title() for t in title_terms)} #{doc_id}",
+            'content': content,
+            'category': 'code_snippets' if is_code else TOPICS[topic][0],
+            'type': 'code' if is_code else 'prose',
+            'topic': topic,
+            'embedding': embedding,
+        }
+
+    def documents(self) -> Iterator[Dict]:
+        for doc_id in range(1, self.num_docs + 1):
+            yield self.document(doc_id)
+
+
+def _to_json(record: Dict) -> str:
+    out = {}
+    for key, value in record.items():
+        if isinstance(value, np.ndarray):
+            value = [round(float(x), 6) for x in value]
+        out[key] = value
+    return json.dumps(out)
+
+
+def write_corpus(generator: CorpusGenerator, out_dir: str, progress_every: int = 100000) -> Dict:
+    """Stream the corpus to out_dir and return the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    total_chars = 0
+    categories: Dict[str, int] = {}
+
+    with open(os.path.join(out_dir, 'documents.jsonl'), 'w', encoding='utf-8') as f:
+        for doc in generator.documents():
+            total_chars += len(doc['content'])
+            categories[doc['category']] = categories.get(doc['category'], 0) + 1
+            if doc['embedding'] is None:
+                doc.pop('embedding')
+            f.write(_to_json(doc) + '\n')
+
+            if progress_every and doc['id'] % progress_every == 0:
+                rate = doc['id'] / (time.perf_counter() - start)
+                print(f"  {doc['id']:,} documents ({rate:,.0f}/s)")
+
+    with open(os.path.join(out_dir, 'test_cases.jsonl'), 'w', encoding='utf-8') as f:
+        for case in generator.test_cases:
+            record = {k: v for k, v in case.items() if k not in ('topic', 'anchors')}
+            f.write(_to_json(record) + '\n')
+
+    manifest = {
+        'seed': generator.seed,
+        'documents': generator.num_docs,
+        'test_cases': len(generator.test_cases),
+        'dimension': generator.dim if generator.with_embeddings else None,
+        'code_ratio': generator.code_ratio,
+        'topic_mix': generator.topic_mix,
+        'relevant_per_query': generator.relevant_per_query,
+        'categories': categories,
+        'avg_content_chars': total_chars / max(generator.num_docs, 1),
+        'elapsed_s': time.perf_counter() - start,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def create_parser():
+    """Create and configure the argument parser."""
+    parser = argparse.ArgumentParser(description="Deterministic synthetic corpus generator")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+    gen = subparsers.add_parser("generate", help="Generate a corpus and matching test cases")
+    gen.add_argument("--docs", "-n", type=int, required=True, help="Number of documents")
+    gen.add_argument("--queries", "-q", type=int, default=100, help="Number of test cases (default: 100)")
+    gen.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    gen.add_argument("--out", "-o", required=True, help="Output directory")
+    gen.add_argument("--dim", type=int, default=DEFAULT_DIM, help=f"Embedding dimension (default: {DEFAULT_DIM})")
+    gen.add_argument("--code-ratio", type=float, default=0.3, help="Fraction of code documents (default: 0.3)")
+    gen.add_argument("--topic-mix", help="Topic weights, e.g. 'databases=3,python=2,history=1'")
+    gen.add_argument("--relevant-per-query", type=int, default=5, help="Planted relevant docs per query")
+    gen.add_argument("--max-words", type=int, default=20000, help="Cap on document length")
+    gen.add_argument("--no-embeddings", action="store_true", help="Omit document embeddings")
+    return parser
+
+
+def main():
+    """Main entry point for the generator CLI."""
+    args = create_parser().parse_args()
+
+    try:
+        generator = CorpusGenerator(
+            num_docs=args.docs,
+            num_queries=args.queries,
+            seed=args.seed,
+            dim=args.dim,
+            code_ratio=args.code_ratio,
+            topic_mix=parse_mix(args.topic_mix),
+            relevant_per_query=args.relevant_per_query,
+            max_words=args.max_words,
+            with_embeddings=not args.no_embeddings,
+        )
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Generating {args.docs:,} documents and {args.queries} test cases (seed {args.seed})...")
+    manifest = write_corpus(generator, args.out)
+
+    print(f"\n✓ Corpus written to {args.out}")
+    print(f"  Documents: {manifest['documents']:,}  Test cases: {manifest['test_cases']}")
+    print(f"  Avg content: {manifest['avg_content_chars']:,.0f} chars  Time: {manifest['elapsed_s']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
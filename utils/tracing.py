@@ -0,0 +1,122 @@
+"""
+Lightweight span tracing.
+
+Wrap interesting operations in span() (or decorate them with traced()) to
+get their duration recorded in the span_duration_seconds metric and, when
+TRACE_FILE is configured, appended to a local JSON-lines trace file:
+
+    {"trace_id": "...", "span_id": "...", "parent_id": null,
+     "name": "hybrid_search", "start": 1760000000.123, "duration_ms": 41.7,
+     "attrs": {"limit": 10}, "error": null, "pid": 1234}
+
+Nested spans share a trace_id and link to their parent through a
+contextvar, so spans opened in a request form a tree.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from utils.metrics import metrics
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+span_duration = metrics.histogram(
+    'span_duration_seconds',
+    'Duration of traced operations'
+)
+
+
+class Tracer:
+    """Flask extension that writes finished spans to a trace file."""
+
+    def __init__(self, app=None):
+        self.trace_file = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._active = {}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read TRACE_FILE from config; tracing to file is off when unset."""
+        self.trace_file = app.config.get('TRACE_FILE')
+        app.extensions['tracer'] = self
+
+    def active(self, name: str) -> int:
+        """Number of spans with this name currently open in this process."""
+        with self._lock:
+            return self._active.get(name, 0)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time a block as a span, nested under the current span if any."""
+        parent = _current_span.get()
+        record = {
+            'trace_id': parent['trace_id'] if parent else uuid.uuid4().hex,
+            'span_id': uuid.uuid4().hex[:16],
+            'parent_id': parent['span_id'] if parent else None,
+            'name': name,
+            'start': time.time(),
+            'attrs': attrs,
+            'error': None,
+        }
+        token = _current_span.set(record)
+        with self._lock:
+            self._active[name] = self._active.get(name, 0) + 1
+
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record['error'] = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            _current_span.reset(token)
+            with self._lock:
+                self._active[name] -= 1
+
+            record['duration_ms'] = round(duration_ms, 3)
+            span_duration.observe(duration_ms, {'name': name})
+            self._write(record)
+
+    def traced(self, name: Optional[str] = None):
+        """Decorator form of span(); defaults to the function name."""
+        def decorator(fn):
+            span_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _write(self, record):
+        if not self.trace_file:
+            return
+
+        record['pid'] = os.getpid()
+        line = json.dumps(record, default=str)
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.trace_file, 'a', buffering=1, encoding='utf-8')
+                self._file.write(line + '\n')
+            except OSError:
+                # Tracing is best-effort; never fail the traced operation
+                self._file = None
+
+
+# Shared instance, bound to the app in the factory
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced